@@ -1,53 +1,119 @@
 import os
-import psycopg2
-from flask import Flask, g
+import threading
+from flask import Flask, g, current_app
 from flask_cors import CORS
 from config import Config
-from app.services.s3_service import S3Service
+from app.lazy_imports import lazy_module
+
+# Imported on first use; see app/lazy_imports.py
+psycopg2 = lazy_module('psycopg2')
+psycopg2_pool = lazy_module('psycopg2.pool')
+
+# Process-wide resources. These are created lazily on first use and must
+# never be shared across a fork; see reset_process_resources().
+_db_pool = None
+_s3_service = None
+_resource_lock = threading.Lock()
+
+def get_db_pool():
+    """
+    Returns the process-wide database connection pool, creating it
+    on first use.
+    """
+    global _db_pool
+    if _db_pool is None:
+        with _resource_lock:
+            if _db_pool is None:
+                db_url = current_app.config.get('DATABASE_URL') or os.environ.get('DATABASE_URL')
+                if not db_url:
+                    raise ValueError("DATABASE_URL environment variable is not set.")
+                _db_pool = psycopg2_pool.ThreadedConnectionPool(
+                    current_app.config['DB_POOL_MIN_CONNECTIONS'],
+                    current_app.config['DB_POOL_MAX_CONNECTIONS'],
+                    db_url
+                )
+    return _db_pool
 
 def get_db():
     """
-    Opens a new database connection if there is none yet for the
-    current application context.
+    Checks out a database connection from the pool if there is none yet
+    for the current application context.
     """
     if 'db' not in g:
-        db_url = os.environ.get('DATABASE_URL')
-        if not db_url:
-            raise ValueError("DATABASE_URL environment variable is not set.")
-        g.db = psycopg2.connect(db_url)
+        g.db = get_db_pool().getconn()
     return g.db
 
 def close_db(e=None):
     """
-    Closes the database connection if it was opened. This function
-    is automatically called by Flask after each request.
+    Returns the database connection to the pool if it was checked out.
+    This function is automatically called by Flask after each request.
     """
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        if db.closed:
+            get_db_pool().putconn(db, close=True)
+            return
+        try:
+            # Never hand a connection with an open transaction to the next request
+            db.rollback()
+            get_db_pool().putconn(db)
+        except psycopg2.Error:
+            get_db_pool().putconn(db, close=True)
 
 def get_s3():
     """
-    Opens a new S3 service connection if there is none yet for the
-    current application context.
+    Returns the S3 service for the current application context. The
+    underlying client is shared by the whole process (boto3 clients are
+    thread-safe), so connection setup is paid once rather than per request.
     """
+    global _s3_service
     if 's3' not in g:
-        g.s3 = S3Service()
+        if _s3_service is None:
+            with _resource_lock:
+                if _s3_service is None:
+                    from app.services.s3_service import S3Service
+                    _s3_service = S3Service()
+        g.s3 = _s3_service
     return g.s3
 
+def reset_process_resources():
+    """
+    Closes the process-wide DB pool, drops the S3 client and forgets the
+    template metadata cache. Called in the server's master process before
+    forking workers, since sockets inherited across a fork must not be
+    shared between processes.
+    """
+    global _db_pool, _s3_service
+    with _resource_lock:
+        if _db_pool is not None:
+            try:
+                _db_pool.closeall()
+            except psycopg2_pool.PoolError:
+                pass
+        _db_pool = None
+        _s3_service = None
+
+    # The metadata cache's LISTEN thread does not survive a fork either
+    from app.services.metadata_cache import reset_metadata_cache
+    reset_metadata_cache()
+
 def create_app(config_class=Config):
     """
     Creates and configures a Flask application instance.
     """
     app = Flask(__name__)
     app.config.from_object(config_class)
-    
+
     # Initialize CORS with the list of origins from the config
     CORS(app, origins=app.config.get('CORS_ORIGINS'))
-    
+
     # Register the close_db function to be called on app teardown
     app.teardown_appcontext(close_db)
-    
+
+    # On-demand request profiling (no-op unless enabled in config)
+    from .services import profiling_service
+    profiling_service.init_app(app)
+
     frontend_url = app.config.get('FRONTEND_URL')
     if frontend_url:
         CORS(app, resources={r"/api/*": {"origins": frontend_url}})
@@ -61,4 +127,4 @@ def create_app(config_class=Config):
     def health_check():
         return "OK", 200
 
-    return app
\ No newline at end of file
+    return app
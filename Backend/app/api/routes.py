@@ -1,15 +1,34 @@
 import json
 import os 
 import re
-import psycopg2
-import requests
-from psycopg2.extras import Json
-from flask import jsonify, request, send_file, current_app
+import time
+from io import BytesIO
+from flask import jsonify, request, send_file, current_app, make_response
 
 from . import api_bp
 from app import get_db, get_s3
-from app.services import pptx_service
-from app.services.s3_service import S3Service, S3UploadError, S3Error
+from app.lazy_imports import lazy_module
+from app.services import profiling_service
+from app.services.s3_service import S3Service, S3UploadError, S3Error, S3NotFoundError
+from app.services.template_cache import get_template_cache
+from app.services.render_pool import get_render_pool, RenderQueueFull, RenderTimeout, RenderPoolError
+from app.services.admission import get_admission_controller, estimate_render_bytes, AdmissionRejected
+from app.services.metadata_cache import get_metadata_cache
+from app.services.usage_recorder import get_usage_recorder
+from app.services import template_import
+from app.services import image_derivatives
+from app.services import template_pipeline
+from app.services import template_stats
+from app.services import template_limits
+from app.services import remote_images
+from app.services import image_search_service
+from app.services.template_preview import get_preview_cache, render_preview
+
+# Heavy dependencies are imported on first use; see app/lazy_imports.py
+psycopg2 = lazy_module('psycopg2')
+psycopg2_extras = lazy_module('psycopg2.extras')
+pptx_service = lazy_module('app.services.pptx_service')
+text_fit = lazy_module('app.services.text_fit')
 
 #allowed image extensions for the asset uploader
 ALLOWED_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif'}
@@ -18,27 +37,90 @@ def sanitize_filename(filename):
     """Removes characters that are unsafe for file systems."""
     return re.sub(r'[^a-zA-Z0-9_.-]', '_', filename)
 
+def template_rejection(e):
+    """The response for a file rejected by template_limits: 413 over a limit, 400 if unreadable."""
+    status = 413 if isinstance(e, template_limits.TemplateLimitError) else 400
+    return jsonify({"error": str(e)}), status
+
 @api_bp.route('/templates', methods=['GET'])
 def get_templates():
     """
     Endpoint to retrieve a list of all templates.
     """
     try:
-        db = get_db()
-        cur = db.cursor()
-        
-        cur.execute("SELECT id, name, created_at, description FROM templates WHERE deleted_at IS NULL ORDER BY created_at DESC;")
-        
-        columns = [desc[0] for desc in cur.description]
-        templates = [dict(zip(columns, row)) for row in cur.fetchall()]
-        
-        cur.close()
+        rows = get_metadata_cache().listing()
+        templates = [
+            {"id": row['id'], "name": row['name'], "created_at": row['created_at'], "description": row['description'],
+             "has_thumbnail": row['thumbnail_key'] is not None}
+            for row in rows
+        ]
         return jsonify(templates), 200
 
     except (psycopg2.DatabaseError, ValueError) as e:
         print(e) 
         return jsonify({"error": "A database error occurred."}), 500
 
+@api_bp.route('/templates/search', methods=['GET'])
+def search_templates():
+    """
+    Endpoint to search active templates, ranked and paginated.
+
+    Query parameters:
+        q: Free text matched against name and description (full-text) and
+           against the name by trigram similarity, so typos and partial
+           words still match.
+        placeholder: Only return templates using this placeholder name;
+           may be repeated to require several.
+        page, pageSize: 1-based page number and page size (max 100).
+    """
+    query = (request.args.get('q') or '').strip()
+    placeholder_names = [name.strip() for name in request.args.getlist('placeholder') if name.strip()]
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        page_size = min(max(int(request.args.get('pageSize', 20)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "page and pageSize must be integers."}), 400
+
+    conditions = ["deleted_at IS NULL"]
+    params = {"q": query, "limit": page_size, "offset": (page - 1) * page_size}
+    if query:
+        # Uses the GIN indexes on search_vector and on name (gin_trgm_ops)
+        conditions.append("(search_vector @@ websearch_to_tsquery('english', %(q)s) "
+                          "OR name %% %(q)s OR name ILIKE '%%' || %(q)s || '%%')")
+    if placeholder_names:
+        # Containment is answered by the GIN index on placeholders
+        conditions.append("placeholders @> %(placeholders)s")
+        params["placeholders"] = psycopg2_extras.Json([{"name": name} for name in placeholder_names])
+
+    search_query = f"""
+        SELECT id, name, description, created_at,
+               CASE WHEN %(q)s = '' THEN 0
+                    ELSE ts_rank_cd(search_vector, websearch_to_tsquery('english', %(q)s)) + similarity(name, %(q)s)
+               END AS rank,
+               COUNT(*) OVER () AS total
+        FROM templates
+        WHERE {' AND '.join(conditions)}
+        ORDER BY rank DESC, created_at DESC
+        LIMIT %(limit)s OFFSET %(offset)s;
+    """
+
+    try:
+        db = get_db()
+        with db.cursor() as cur:
+            cur.execute(search_query, params)
+            rows = cur.fetchall()
+
+        total = rows[0][5] if rows else 0
+        results = [
+            {"id": row[0], "name": row[1], "description": row[2], "created_at": row[3], "rank": float(row[4])}
+            for row in rows
+        ]
+        return jsonify({"results": results, "page": page, "pageSize": page_size, "total": total}), 200
+
+    except psycopg2.DatabaseError as e:
+        print(f"Database error searching templates for '{query}': {e}")
+        return jsonify({"error": "A database error occurred."}), 500
+
 @api_bp.route('/upload', methods=['POST'])
 def upload_file():
     """
@@ -57,10 +139,17 @@ def upload_file():
     if not file.filename.endswith('.pptx'):
         return jsonify({"error": "Invalid file type. Please upload a .pptx file."}), 400
 
+    # Reject oversized or overly complex files before parsing them
+    try:
+        template_limits.check_template(file.stream, template_limits.limits_from_config(current_app.config))
+    except template_limits.InvalidTemplateError as e:
+        return template_rejection(e)
+
     # 2. Service Integration and Error Handling
     try:
         # Pass the file stream directly to the service
-        placeholders = pptx_service.extract_placeholders(file.stream)
+        with profiling_service.phase('extract_placeholders'):
+            placeholders = pptx_service.extract_placeholders(file.stream)
         
         # 3. Success Response
         return jsonify(placeholders), 200
@@ -110,7 +199,9 @@ def upload_asset():
 def save_template():
     """
     Endpoint to save a new template. Uploads the file to S3 and saves
-    its metadata to the database.
+    its metadata to the database. The optional 'compact' form field
+    ('true'/'false') overrides TEMPLATE_COMPACTION_ENABLED; a compacted
+    file is what gets stored and served.
     """
     # 1. Validation
     if 'file' not in request.files or 'templateName' not in request.form or 'placeholders' not in request.form:
@@ -126,44 +217,220 @@ def save_template():
     if not file.filename.endswith('.pptx'):
         return jsonify({"error": "Invalid file type. Please upload a .pptx file."}), 400
 
+    # Reject oversized or overly complex files before any processing
+    try:
+        template_limits.check_template(file.stream, template_limits.limits_from_config(current_app.config))
+    except template_limits.InvalidTemplateError as e:
+        return template_rejection(e)
+
     db = get_db()
     try:
+        # 2. Business Logic: Check for duplicate name. The transaction is
+        #    ended right away so no connection sits idle in it while the
+        #    file is processed and uploaded; the insert checks again.
         with db.cursor() as cur:
-            # 2. Business Logic: Check for duplicate name
             cur.execute("SELECT id FROM templates WHERE name = %s AND deleted_at IS NULL", (template_name,))
-            if cur.fetchone():
-                return jsonify({"error": "A template with this name already exists."}), 409
-
-            # 3. Business Logic: Upload to S3
-            s3 = get_s3()
-            s3_key = s3.upload_file(file.stream, file.filename)
-
-            # 4. Business Logic: Save to Database
-            placeholders = json.loads(placeholders_str)
-            
-            insert_query = """
-                INSERT INTO templates (name, s3_key, placeholders)
-                VALUES (%s, %s, %s)
-                RETURNING id, name, created_at, placeholders;
-            """
-            cur.execute(insert_query, (template_name, s3_key, Json(placeholders)))
-            
+            name_taken = cur.fetchone() is not None
+        db.rollback()
+        if name_taken:
+            return jsonify({"error": "A template with this name already exists."}), 409
+        placeholders = json.loads(placeholders_str)
+
+        # 3. Business Logic: Save-time processing (e.g. compaction)
+        compact = request.form.get('compact')
+        options = template_pipeline.pipeline_options(
+            current_app.config, None if compact is None else compact.lower() == 'true'
+        )
+        blob = file.read()
+        try:
+            prepared = template_pipeline.run_prepare(blob, options, get_render_pool(current_app))
+        except RenderPoolError as e:
+            current_app.logger.warning(f"Template processing failed, storing the original: {e}")
+            prepared = {"blob": blob, "report": {"original_bytes": len(blob), "stored_bytes": len(blob)}}
+        report = prepared['report']
+
+        # 4. Business Logic: Upload to S3, along with the embedded thumbnail
+        s3 = get_s3()
+        thumbnail_key = image_derivatives.store_template_thumbnail(s3, BytesIO(prepared['blob']))
+        s3_key = s3.upload_file(BytesIO(prepared['blob']), file.filename)
+
+        # 5. Business Logic: Save to Database, unless the name was taken meanwhile
+        stats = template_stats.save_stats(report, placeholders)
+        insert_query = """
+            INSERT INTO templates (name, s3_key, placeholders, thumbnail_key, original_size_bytes, stored_size_bytes, stats)
+            SELECT %s, %s, %s, %s, %s, %s, %s
+            WHERE NOT EXISTS (SELECT 1 FROM templates WHERE name = %s AND deleted_at IS NULL)
+            RETURNING id, name, created_at, placeholders, original_size_bytes, stored_size_bytes, stats;
+        """
+        with db.cursor() as cur:
+            cur.execute(insert_query, (template_name, s3_key, psycopg2_extras.Json(placeholders), thumbnail_key,
+                                       report['original_bytes'], report['stored_bytes'], psycopg2_extras.Json(stats),
+                                       template_name))
             new_template_record = cur.fetchone()
-            db.commit()
-
-            # Format the response
             columns = [desc[0] for desc in cur.description]
-            new_template = dict(zip(columns, new_template_record))
+        db.commit()
+
+        if new_template_record is None:
+            s3.delete_objects([key for key in (s3_key, thumbnail_key) if key])
+            return jsonify({"error": "A template with this name already exists."}), 409
+        # Other workers are invalidated by the templates NOTIFY trigger
+        get_metadata_cache().invalidate(new_template_record[0])
 
-        # 5. Success Response
+        # Format the response
+        new_template = dict(zip(columns, new_template_record))
+        for step in ('normalization', 'compaction'):
+            if step in report:
+                new_template[step] = report[step]
+
+        # 6. Success Response
         return jsonify(new_template), 201
 
-    except (S3UploadError, psycopg2.Error, json.JSONDecodeError) as e:
-        # 6. Error Handling
+    except (S3Error, psycopg2.Error, json.JSONDecodeError) as e:
+        # 7. Error Handling
         db.rollback()
         print(f"Error saving template: {e}")
         return jsonify({"error": "An internal error occurred while saving the template."}), 500
 
+@api_bp.route('/templates/import', methods=['POST'])
+def import_templates():
+    """
+    Endpoint to save many templates at once from a ZIP archive of .pptx
+    files. Each file becomes a template named after the file. Files are
+    analyzed across a worker pool and uploaded concurrently, and all rows
+    are inserted with one statement. A per-file report is returned; a file
+    that fails or whose name is taken does not abort the rest.
+    """
+    # 1. Validation
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part in the request"}), 400
+
+    archive = request.files['file']
+    if not archive.filename.lower().endswith('.zip'):
+        return jsonify({"error": "Invalid file type. Please upload a .zip archive of .pptx files."}), 400
+
+    config = current_app.config
+    try:
+        files, report = template_import.read_archive(
+            archive.stream, config['IMPORT_MAX_FILES'], config['IMPORT_MAX_UNCOMPRESSED_BYTES']
+        )
+    except template_import.ImportArchiveError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db = get_db()
+    try:
+        with db.cursor() as cur:
+            # 2. Name conflicts, within the archive and against existing templates
+            names = [template_import.template_name_for(filename) for filename, _ in files]
+            cur.execute(
+                "SELECT name FROM templates WHERE name = ANY(%s) AND deleted_at IS NULL",
+                (list(set(names)),)
+            )
+            taken = {row[0] for row in cur.fetchall()}
+            db.rollback()
+
+            candidates = []
+            limits = template_limits.limits_from_config(config)
+            for (filename, blob), name in zip(files, names):
+                if not name:
+                    report.append({"file": filename, "status": "invalid", "error": "Template name cannot be empty"})
+                elif name in taken:
+                    report.append({"file": filename, "name": name, "status": "conflict",
+                                   "error": "A template with this name already exists."})
+                else:
+                    try:
+                        template_limits.check_template(blob, limits)
+                    except template_limits.InvalidTemplateError as e:
+                        report.append({"file": filename, "name": name, "status": "invalid", "error": str(e)})
+                        continue
+                    taken.add(name)
+                    candidates.append((filename, name, blob))
+
+            # 3. Process and analyze every file across the worker pool
+            results = template_import.prepare_all(
+                [blob for _, _, blob in candidates],
+                template_pipeline.pipeline_options(config),
+                get_render_pool(current_app),
+                config['IMPORT_ANALYSIS_WORKERS'] or os.cpu_count() or 1,
+                config['RENDER_TASK_TIMEOUT_SECONDS'],
+                config['RENDER_POOL_TEMP_DIR']
+            )
+            analyzed = []
+            for (filename, name, _), prepared in zip(candidates, results):
+                if isinstance(prepared, Exception):
+                    report.append({"file": filename, "name": name, "status": "invalid", "error": str(prepared)})
+                else:
+                    analyzed.append((filename, name, prepared))
+
+            # 4. Upload the valid files concurrently
+            s3 = get_s3()
+            uploads = template_import.upload_all(
+                s3, [(filename, prepared['blob']) for filename, _, prepared in analyzed],
+                config['BULK_S3_CONCURRENCY']
+            )
+            rows, files_by_key, thumbnails_by_key, processing = [], {}, {}, {}
+            for (filename, name, prepared), upload in zip(analyzed, uploads):
+                if isinstance(upload, Exception):
+                    report.append({"file": filename, "name": name, "status": "failed", "error": str(upload)})
+                else:
+                    s3_key, thumbnail_key = upload
+                    processed = prepared['report']
+                    stats = template_stats.save_stats(processed, prepared['placeholders'])
+                    rows.append((name, s3_key, psycopg2_extras.Json(prepared['placeholders']), thumbnail_key,
+                                 processed['original_bytes'], processed['stored_bytes'], psycopg2_extras.Json(stats)))
+                    files_by_key[s3_key] = filename
+                    thumbnails_by_key[s3_key] = thumbnail_key
+                    processing[s3_key] = processed
+
+            # 5. Insert every row with one statement, skipping names another
+            #    request took meanwhile. If this fails the uploaded files are
+            #    left unreferenced (see database/reconcile_s3.py).
+            if rows:
+                inserted = psycopg2_extras.execute_values(
+                    cur,
+                    """
+                    INSERT INTO templates (name, s3_key, placeholders, thumbnail_key, original_size_bytes, stored_size_bytes, stats)
+                    SELECT v.* FROM (VALUES %s) AS v (name, s3_key, placeholders, thumbnail_key, original_size_bytes, stored_size_bytes, stats)
+                    WHERE NOT EXISTS (SELECT 1 FROM templates t WHERE t.name = v.name AND t.deleted_at IS NULL)
+                    RETURNING id, name, created_at, placeholders, s3_key, original_size_bytes, stored_size_bytes, stats;
+                    """,
+                    rows,
+                    template="(%s, %s, %s::jsonb, %s, %s::bigint, %s::bigint, %s::jsonb)",
+                    page_size=len(rows),
+                    fetch=True
+                )
+                db.commit()
+
+                inserted_keys = {row[4] for row in inserted}
+                lost = [(name, s3_key) for name, s3_key, *_ in rows if s3_key not in inserted_keys]
+                for name, s3_key in lost:
+                    report.append({"file": files_by_key[s3_key], "name": name, "status": "conflict",
+                                   "error": "A template with this name already exists."})
+                if lost:
+                    s3.delete_objects([key for _, s3_key in lost for key in (s3_key, thumbnails_by_key[s3_key]) if key])
+
+                cache = get_metadata_cache()
+                for template_id, name, created_at, placeholders, s3_key, original_size, stored_size, stats in inserted:
+                    cache.invalidate(template_id)
+                    entry = {"file": files_by_key[s3_key], "name": name, "status": "imported",
+                             "id": template_id, "created_at": created_at, "placeholders": placeholders,
+                             "original_size_bytes": original_size, "stored_size_bytes": stored_size,
+                             "stats": stats}
+                    entry.update((step, result) for step, result in processing[s3_key].items()
+                                 if step in ('normalization', 'compaction'))
+                    report.append(entry)
+
+        # 6. Report in archive order
+        order = {filename: index for index, (filename, _) in enumerate(files)}
+        report.sort(key=lambda entry: order.get(entry['file'], len(order)))
+        imported = sum(1 for entry in report if entry['status'] == 'imported')
+        failed = sum(1 for entry in report if entry['status'] not in ('imported', 'skipped'))
+        return jsonify({"results": report, "imported": imported, "failed": failed}), 200
+
+    except (S3Error, psycopg2.Error) as e:
+        db.rollback()
+        print(f"Error importing templates: {e}")
+        return jsonify({"error": "An internal error occurred while importing the templates."}), 500
+
 @api_bp.route('/templates/<int:template_id>', methods=['DELETE'])
 def delete_template(template_id):
     """
@@ -201,6 +468,7 @@ def delete_template(template_id):
             
             # Step 5: Commit Transaction
             db.commit()
+            get_metadata_cache().invalidate(template_id)
 
         # Success Response
         return jsonify({"message": "Template moved to trash. Files are permanently deleted after 30 days."}), 200
@@ -218,30 +486,119 @@ def get_template_details(template_id):
     including its list of placeholders.
     """
     try:
-        db = get_db()
-        cur = db.cursor()
-        
-        # Query for the specific template, including the placeholders JSON field
-        query = "SELECT id, name, created_at, placeholders FROM templates WHERE id = %s AND deleted_at IS NULL;"
-        cur.execute(query, (template_id,))
-        
-        record = cur.fetchone()
+        # Look up the specific template, including the placeholders JSON field
+        record = get_metadata_cache().get(template_id)
         
         # Handle case where the template does not exist
         if record is None:
             return jsonify({"error": "Template not found."}), 404
             
-        # Create a dictionary from the query result
-        columns = [desc[0] for desc in cur.description]
-        template = dict(zip(columns, record))
-        
-        cur.close()
+        template = {key: record[key] for key in ('id', 'name', 'created_at', 'placeholders')}
         return jsonify(template), 200
 
     except psycopg2.DatabaseError as e:
         print(f"Database error fetching template {template_id}: {e}")
         return jsonify({"error": "A database error occurred."}), 500
 
+@api_bp.route('/templates/<int:template_id>/preview', methods=['POST'])
+def preview_template(template_id):
+    """
+    Endpoint for the live preview of the form step.
+    Expects {"data": {...}} with any subset of the placeholders and returns,
+    per slide, the substituted text of each shape and the geometry of image
+    slots. No presentation is built, so it is cheap enough to call on
+    every keystroke.
+    """
+    # 1. Validate the request payload
+    payload = request.get_json(silent=True) or {}
+    data = payload.get('data', {})
+    if not isinstance(data, dict):
+        return jsonify({"error": "'data' must be an object."}), 400
+
+    try:
+        # 2. Fetch template metadata (served from the in-process cache when warm)
+        record = get_metadata_cache().get(template_id)
+        if record is None:
+            return jsonify({"error": "Template not found."}), 404
+
+        # 3. Apply the data to the template's cached preview model
+        model = get_preview_cache(current_app).get_model(
+            record['s3_key'], get_template_cache(current_app), get_s3()
+        )
+        return jsonify(render_preview(model, data)), 200
+
+    except S3Error as e:
+        print(f"S3 Error previewing template {template_id}: {e}")
+        return jsonify({"error": "An error occurred with the file storage service."}), 500
+    except psycopg2.DatabaseError as e:
+        print(f"Database error previewing template {template_id}: {e}")
+        return jsonify({"error": "A database error occurred."}), 500
+    except Exception as e:
+        print(f"Unexpected error previewing template {template_id}: {e}")
+        return jsonify({"error": "An internal error occurred while building the preview."}), 500
+
+@api_bp.route('/templates/<int:template_id>/stats', methods=['GET'])
+def get_template_stats(template_id):
+    """
+    Endpoint to retrieve a template's statistics: file statistics collected
+    when it was saved, rolling render latency and peak memory, and the
+    render memory admission control currently predicts for it.
+    """
+    try:
+        with get_db().cursor() as cur:
+            cur.execute(
+                """
+                SELECT id, name, stats, original_size_bytes, stored_size_bytes, generation_count,
+                       last_generated_at, render_samples, render_ms_avg, render_peak_bytes
+                FROM templates WHERE id = %s AND deleted_at IS NULL;
+                """,
+                (template_id,)
+            )
+            row = cur.fetchone()
+            if row is None:
+                return jsonify({"error": "Template not found."}), 404
+            columns = [desc[0] for desc in cur.description]
+        template = dict(zip(columns, row))
+
+        # This worker's own average is fresher than the last batch written
+        measured_peak = get_usage_recorder(current_app._get_current_object()).predicted_peak_bytes(template_id)
+        measured_peak = measured_peak or template['render_peak_bytes']
+        template['predicted_render_bytes'] = None
+        if template['stored_size_bytes'] is not None or measured_peak:
+            template['predicted_render_bytes'] = estimate_render_bytes(
+                template['stored_size_bytes'] or 0, current_app, measured_peak
+            )
+        return jsonify(template), 200
+
+    except psycopg2.DatabaseError as e:
+        print(f"Database error fetching statistics for template {template_id}: {e}")
+        return jsonify({"error": "A database error occurred."}), 500
+
+def busy_response(retry_after: int):
+    """Builds the 503 response returned when generation capacity is exhausted."""
+    response = jsonify({"error": "The server is busy generating other presentations. Please retry shortly."})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
+
+def find_missing_placeholder(required_placeholders, data):
+    """
+    Returns the name of the first required placeholder that `data` leaves
+    missing or empty, or None if every placeholder is provided.
+    """
+    # Fields supplied by {{repeat:...}} rows are filled per slide instead
+    repeat_names = [placeholder['name'] for placeholder in required_placeholders
+                    if placeholder.get('type') == 'repeat']
+    row_fields = pptx_service.repeat_row_fields(data, repeat_names)
+    for placeholder in required_placeholders:
+        ph_name = placeholder['name']
+        if ph_name in row_fields:
+            continue
+        if ph_name not in data or (data[ph_name] is None) or \
+           (isinstance(data[ph_name], str) and not data[ph_name].strip()):
+            if placeholder.get('type') != 'list': # Skip strict check for lists for now
+                return ph_name
+    return None
+
 @api_bp.route('/generate', methods=['POST'])
 def generate():
     """
@@ -254,47 +611,86 @@ def generate():
     if not payload or 'templateId' not in payload or 'data' not in payload:
         return jsonify({"error": "Missing templateId or data in request body"}), 400
 
-    template_id = payload['templateId']
+    template_id = parse_template_id(payload['templateId'])
+    if template_id is None:
+        return jsonify({"error": "'templateId' must be an integer."}), 400
     data = payload['data']
-    db = get_db()
+    list_items_per_slide, error_response = parse_list_items_per_slide(payload)
+    if error_response:
+        return error_response
 
     try:
-        with db.cursor() as cur:
-            # 2. Fetch template metadata from the database
-            query = "SELECT name, s3_key, placeholders FROM templates WHERE id = %s AND deleted_at IS NULL"
-            cur.execute(query, (template_id,))
-            record = cur.fetchone()
-            if record is None:
-                return jsonify({"error": "Template not found."}), 404
+        # 2. Fetch template metadata (served from the in-process cache when warm)
+        with profiling_service.phase('fetch_metadata'):
+            record = get_metadata_cache().get(template_id)
+        if record is None:
+            return jsonify({"error": "Template not found."}), 404
 
-            template_name, s3_key, required_placeholders = record
+        template_name, s3_key, required_placeholders = record['name'], record['s3_key'], record['placeholders']
 
-            # 3. Validate that the incoming data provides all required placeholders
-            for placeholder in required_placeholders:
-                ph_name = placeholder['name']
-                if ph_name not in data or (data[ph_name] is None) or \
-                   (isinstance(data[ph_name], str) and not data[ph_name].strip()):
-                    if placeholder.get('type') != 'list': # Skip strict check for lists for now
-                         return jsonify({"error": f"Missing or empty value for required placeholder: '{ph_name}'"}), 400
+        # 3. Validate that the incoming data provides all required placeholders
+        missing = find_missing_placeholder(required_placeholders, data)
+        if missing:
+            return jsonify({"error": f"Missing or empty value for required placeholder: '{missing}'"}), 400
 
-            # 4. Prepare for generation
-            s3 = get_s3()
-            template_stream = s3.download_file_as_stream(s3_key)
-            
+        # 4. Prepare for generation
+        s3 = get_s3()
+        with profiling_service.phase('download_template'):
+            template_stream = get_template_cache(current_app).get_stream(s3_key, s3)
+        # Templates stored before a limit was lowered are still rejected before parsing
+        template_limits.check_template(template_stream, template_limits.limits_from_config(current_app.config))
+        
+        # 5. Wait for a generation slot, sized by the template's estimated render memory
+        usage_recorder = get_usage_recorder(current_app._get_current_object())
+        measured_peak = usage_recorder.predicted_peak_bytes(template_id) or record.get('render_peak_bytes')
+        estimated_bytes = estimate_render_bytes(template_stream.getbuffer().nbytes, current_app, measured_peak)
+        with get_admission_controller(current_app).admit(estimated_bytes):
             # 6. Call the service to perform the generation
-            output_stream = pptx_service.generate_presentation(template_stream, data, s3)
-
-            # 7. Create a sensible download name and return the file
-            client_name = data.get('client_name', '').strip()
-            download_name = f"{client_name}.pptx" if client_name else f"{template_name}.pptx"
-            
-            return send_file(
-                output_stream,
-                mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation',
-                as_attachment=True,
-                download_name=sanitize_filename(download_name)
-            )
-
+            fit_text = text_fit.fit_options(current_app.config)
+            render_pool = get_render_pool(current_app)
+            render_started = time.perf_counter()
+            with profiling_service.phase('render'):
+                if render_pool is not None:
+                    output_stream, peak_bytes = render_pool.render(
+                        template_stream, data, list_items_per_slide, fit_text, peak_known=bool(measured_peak)
+                    )
+                else:
+                    # Memory is shared by every thread here, so it is not attributed
+                    peak_bytes = None
+                    output_stream = pptx_service.generate_presentation(
+                        template_stream, data, s3, list_items_per_slide=list_items_per_slide,
+                        fit_text=fit_text
+                    )
+
+        # Record usage so the most used templates are warmed at boot, and
+        # the render cost for admission and the template's statistics.
+        # Both are written in batches in the background.
+        usage_recorder.record([template_id])
+        usage_recorder.record_render(template_id, time.perf_counter() - render_started, peak_bytes)
+
+        # 7. Create a sensible download name and return the file
+        client_name = data.get('client_name', '').strip()
+        download_name = f"{client_name}.pptx" if client_name else f"{template_name}.pptx"
+        
+        return send_file(
+            output_stream,
+            mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation',
+            as_attachment=True,
+            download_name=sanitize_filename(download_name)
+        )
+
+    except template_limits.InvalidTemplateError as e:
+        current_app.logger.warning(f"Template {template_id} rejected before rendering: {e}")
+        return template_rejection(e)
+    except AdmissionRejected as e:
+        current_app.logger.warning(f"Generation rejected for template {template_id}: {e}")
+        return busy_response(e.retry_after)
+    except RenderQueueFull as e:
+        current_app.logger.warning(f"Render pool saturated for template {template_id}: {e}")
+        return busy_response(current_app.config['ADMISSION_RETRY_AFTER_SECONDS'])
+    except RenderTimeout as e:
+        print(f"Render timed out for template {template_id}: {e}")
+        return jsonify({"error": "Generating the presentation took too long."}), 504
     except S3Error as e:
         print(f"S3 Error generating presentation for template {template_id}: {e}")
         return jsonify({"error": "An error occurred with the file storage service."}), 500
@@ -306,65 +702,144 @@ def generate():
         print(f"Unexpected error generating presentation for template {template_id}: {e}")
         return jsonify({"error": "An internal error occurred while generating the presentation."}), 500
     
+@api_bp.route('/generate/deck', methods=['POST'])
+def generate_deck():
+    """
+    Endpoint to assemble one presentation from several templates.
+    Expects {"sections": [{"templateId": ..., "data": {...}}, ...], "fileName": optional}.
+    Each section is rendered like /generate and the results are joined in
+    order, with masters, layouts, themes and media that are identical across
+    sections stored only once.
+    """
+    # 1. Extract and validate the request payload
+    payload = request.get_json()
+    sections = payload.get('sections') if payload else None
+    if not isinstance(sections, list) or not sections:
+        return jsonify({"error": "Missing sections in request body"}), 400
+    if len(sections) > current_app.config['MAX_DECK_SECTIONS']:
+        return jsonify({"error": f"A deck can have at most {current_app.config['MAX_DECK_SECTIONS']} sections."}), 400
+    for index, section in enumerate(sections):
+        if not isinstance(section, dict) or 'templateId' not in section or not isinstance(section.get('data'), dict):
+            return jsonify({"error": f"Section {index} is missing templateId or data"}), 400
+    sections = [dict(section, templateId=parse_template_id(section['templateId'])) for section in sections]
+    for index, section in enumerate(sections):
+        if section['templateId'] is None:
+            return jsonify({"error": f"Section {index} has a templateId that is not an integer."}), 400
+    list_items_per_slide, error_response = parse_list_items_per_slide(payload)
+    if error_response:
+        return error_response
+
+    template_ids = list({section['templateId'] for section in sections})
+
+    try:
+        # 2. Fetch metadata for every distinct template (cached, or one query)
+        with profiling_service.phase('fetch_metadata'):
+            records = get_metadata_cache().get_many(template_ids)
+
+        # 3. Validate each section against its template's placeholders
+        for index, section in enumerate(sections):
+            record = records.get(section['templateId'])
+            if record is None:
+                return jsonify({"error": f"Template not found for section {index}."}), 404
+            missing = find_missing_placeholder(record['placeholders'], section['data'])
+            if missing:
+                return jsonify({"error": f"Missing or empty value for required placeholder '{missing}' in section {index}"}), 400
+
+        # 4. Load each template once, even if several sections use it
+        s3 = get_s3()
+        cache = get_template_cache(current_app)
+        with profiling_service.phase('download_template'):
+            template_bytes = {
+                template_id: cache.get_stream(record['s3_key'], s3).getvalue()
+                for template_id, record in records.items()
+            }
+        limits = template_limits.limits_from_config(current_app.config)
+        for blob in template_bytes.values():
+            template_limits.check_template(blob, limits)
+
+        # 5. Render every section and assemble the deck once a slot is free
+        usage_recorder = get_usage_recorder(current_app._get_current_object())
+        estimated_bytes = sum(
+            estimate_render_bytes(
+                len(template_bytes[section['templateId']]), current_app,
+                usage_recorder.predicted_peak_bytes(section['templateId'])
+                or records[section['templateId']].get('render_peak_bytes')
+            )
+            for section in sections
+        )
+        with get_admission_controller(current_app).admit(estimated_bytes):
+            with profiling_service.phase('render'):
+                output_stream = pptx_service.generate_deck(
+                    [(BytesIO(template_bytes[section['templateId']]), section['data']) for section in sections],
+                    s3, list_items_per_slide=list_items_per_slide,
+                    fit_text=text_fit.fit_options(current_app.config)
+                )
+
+        # Record usage so the most used templates are warmed at boot
+        usage_recorder.record(template_ids)
+
+        # 6. Name the file after the request or the first section's template
+        download_name = (payload.get('fileName') or '').strip() or records[sections[0]['templateId']]['name']
+        if not download_name.lower().endswith('.pptx'):
+            download_name += '.pptx'
+
+        return send_file(
+            output_stream,
+            mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation',
+            as_attachment=True,
+            download_name=sanitize_filename(download_name)
+        )
+
+    except template_limits.InvalidTemplateError as e:
+        current_app.logger.warning(f"Deck templates {template_ids} rejected before rendering: {e}")
+        return template_rejection(e)
+    except AdmissionRejected as e:
+        current_app.logger.warning(f"Deck generation rejected for templates {template_ids}: {e}")
+        return busy_response(e.retry_after)
+    except S3Error as e:
+        print(f"S3 Error assembling deck from templates {template_ids}: {e}")
+        return jsonify({"error": "An error occurred with the file storage service."}), 500
+    except psycopg2.Error as e:
+        print(f"Database Error assembling deck from templates {template_ids}: {e}")
+        return jsonify({"error": "An error occurred with the database."}), 500
+    except Exception as e:
+        print(f"Unexpected error assembling deck from templates {template_ids}: {e}")
+        return jsonify({"error": "An internal error occurred while generating the presentation."}), 500
+
 @api_bp.route('/images/search', methods=['GET'])
 def search_images():
     """
-    Endpoint to search for images from the Pexels API.
+    Endpoint to search for images across the configured providers
+    (IMAGE_SEARCH_PROVIDERS). The X-Image-Providers header reports whether
+    each provider answered ('ok'), failed ('error') or was dropped for
+    being too slow ('timeout').
     """
     query = request.args.get('q')
     if not query:
         return jsonify({"error": "A search query 'q' is required."}), 400
 
-    # 1. Get the API key securely from application config
-    #    (NEVER hardcode keys in your code)
-    api_key = current_app.config.get('PEXELS_API_KEY')
-    if not api_key:
+    # 1. Get the providers enabled in the application config
+    providers = image_search_service.get_image_providers(current_app._get_current_object())
+    if not providers:
         # Log this error for the developer
-        current_app.logger.error("PEXELS_API_KEY is not configured.")
+        current_app.logger.error("No image search provider is configured.")
         # Return a generic error to the user
         return jsonify({"error": "Image search service is not configured."}), 500
 
-    # 2. Prepare and make the API request
-    pexel_api_url = "https://api.pexels.com/v1/search"
-    headers = {
-        "Authorization": api_key
-    }
-    params = {
-        "query": query,
-        "per_page": 15  # Request a reasonable number of images
-    }
-
+    # 2. Query every provider at once; slow ones are dropped at the timeout
     try:
-        response = requests.get(pexel_api_url, headers=headers, params=params, timeout=10)
-        # Raise an exception for bad status codes (4xx or 5xx)
-        response.raise_for_status() 
-        
-        data = response.json()
-
-        # 3. Transform Pexels data to match your frontend's expected format
-        # Pexels returns photos in a 'photos' list.
-        # We map 'id', 'src.large', and 'alt' to your 'id', 'url', 'alt'.
-        formatted_results = [
-            {
-                "id": photo.get('id'),
-                "url": photo.get('src', {}).get('large', ''), # Safely access nested keys
-                "alt": photo.get('alt', 'Pexels image for ' + query) # Provide a fallback alt
-            }
-            for photo in data.get('photos', []) # Safely get the 'photos' list
-        ]
-        
-        return jsonify(formatted_results)
-
-    except requests.exceptions.HTTPError as http_err:
-        # Handle specific HTTP errors (like 401 Unauthorized, 429 Too Many Requests)
-        current_app.logger.error(f"Pexels API HTTP error: {http_err} - Response: {response.text}")
-        return jsonify({"error": f"Error communicating with image provider: {http_err}"}), response.status_code
-    
-    except requests.exceptions.RequestException as e:
-        # Handle network errors (timeout, connection error, etc.)
-        current_app.logger.error(f"Pexels API request failed: {e}")
+        results, statuses = image_search_service.search_images(
+            providers, query, current_app.config['IMAGE_SEARCH_RESULTS'],
+            current_app.config['IMAGE_SEARCH_TIMEOUT_SECONDS']
+        )
+    except image_search_service.ImageSearchError as e:
+        current_app.logger.error(f"Image search failed for every provider: {e}")
         return jsonify({"error": "Failed to fetch images from the external provider."}), 503 # 503 Service Unavailable
 
+    response = jsonify(results)
+    response.headers['X-Image-Providers'] = ', '.join(f"{name}={status}" for name, status in statuses.items())
+    return response
+
 @api_bp.route('/assets/upload_from_url', methods=['POST'])
 def upload_asset_from_url():
     """
@@ -388,6 +863,48 @@ def upload_asset_from_url():
         print(f"Unexpected error uploading from URL: {e}")
         return jsonify({"error": "An unexpected server error occurred."}), 500
 
+@api_bp.route('/assets/upload_from_urls', methods=['POST'])
+def upload_assets_from_urls():
+    """
+    Endpoint to import several images from URLs into S3 at once.
+    Expects {"urls": [...]}. Images are downloaded and uploaded
+    concurrently; the response lists, per URL, the new s3_key or an error.
+    """
+    # 1. Validate the request payload
+    payload = request.get_json(silent=True) or {}
+    urls = payload.get('urls')
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url for url in urls):
+        return jsonify({"error": "'urls' must be a non-empty list of URLs."}), 400
+    urls = list(dict.fromkeys(urls))
+
+    config = current_app.config
+    if len(urls) > config['REMOTE_IMAGE_MAX_URLS']:
+        return jsonify({"error": f"At most {config['REMOTE_IMAGE_MAX_URLS']} URLs can be imported at once."}), 400
+
+    try:
+        # 2. Fetch and upload every URL concurrently
+        outcomes = remote_images.import_images(
+            get_s3(), remote_images.get_http_session(config['REMOTE_IMAGE_CONCURRENCY']), urls,
+            config['REMOTE_IMAGE_MAX_BYTES'], config['REMOTE_IMAGE_TIMEOUT_SECONDS'],
+            config['REMOTE_IMAGE_CONCURRENCY']
+        )
+    except S3Error as e:
+        print(f"Error importing images from URLs: {e}")
+        return jsonify({"error": "An error occurred with the file storage service."}), 500
+
+    # 3. Report per URL, in request order
+    results = []
+    for url, outcome in zip(urls, outcomes):
+        if isinstance(outcome, (remote_images.RemoteImageError, S3UploadError)):
+            results.append({"url": url, "error": str(outcome)})
+        elif isinstance(outcome, Exception):
+            print(f"Unexpected error importing image from {url}: {outcome}")
+            results.append({"url": url, "error": "An unexpected server error occurred."})
+        else:
+            results.append({"url": url, "s3_key": outcome})
+    uploaded = sum(1 for result in results if 's3_key' in result)
+    return jsonify({"results": results, "uploaded": uploaded, "failed": len(results) - uploaded}), 200
+
 @api_bp.route('/templates/trash', methods=['GET'])
 def get_trashed_templates():
     """
@@ -446,6 +963,7 @@ def restore_template(template_id):
                 # Permanently delete the orphaned database record
                 cur.execute("DELETE FROM templates WHERE id = %s", (template_id,))
                 db.commit()
+                get_metadata_cache().invalidate(template_id)
                 
                 # Return '410 Gone' to inform the UI this is permanent.
                 return jsonify({
@@ -463,6 +981,7 @@ def restore_template(template_id):
             )
 
             db.commit()
+            get_metadata_cache().invalidate(template_id)
 
         return jsonify({"message": "Template restored successfully."}), 200
 
@@ -484,6 +1003,282 @@ def restore_template(template_id):
         current_app.logger.error(f"Unexpected error restoring template {template_id}: {e}")
         return jsonify({"error": "An unexpected server error occurred."}), 500
     
+def parse_bulk_ids(data):
+    """
+    Reads the 'ids' list of a bulk request body.
+
+    Returns:
+        A (ids, error_response) tuple; exactly one of the two is None.
+    """
+    ids = (data or {}).get('ids')
+    if not isinstance(ids, list) or not ids:
+        return None, (jsonify({"error": "'ids' must be a non-empty list of template ids."}), 400)
+    if not all(isinstance(template_id, int) and not isinstance(template_id, bool) for template_id in ids):
+        return None, (jsonify({"error": "Every entry in 'ids' must be an integer."}), 400)
+    max_ids = current_app.config['BULK_MAX_IDS']
+    if len(ids) > max_ids:
+        return None, (jsonify({"error": f"A bulk request accepts at most {max_ids} ids."}), 400)
+    return list(dict.fromkeys(ids)), None
+
+def parse_template_id(value):
+    """Returns a request body's templateId as an int (numeric strings included), or None if it is not one."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+def parse_list_items_per_slide(payload):
+    """
+    Reads the optional 'listItemsPerSlide' of a generation request,
+    defaulting to LIST_ITEMS_PER_SLIDE.
+
+    Returns:
+        A (items_per_slide, error_response) tuple; exactly one of the two is None.
+    """
+    value = payload.get('listItemsPerSlide')
+    if value is None:
+        return current_app.config['LIST_ITEMS_PER_SLIDE'], None
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+        return None, (jsonify({"error": "'listItemsPerSlide' must be a positive integer."}), 400)
+    return value, None
+
+def bulk_response(ids, outcomes, success_status):
+    """Builds the per-id result list returned by the bulk endpoints."""
+    results = [{"id": template_id, **outcomes[template_id]} for template_id in ids]
+    succeeded = sum(1 for result in results if result['status'] == success_status)
+    return jsonify({"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}), 200
+
+@api_bp.route('/templates/bulk/trash', methods=['POST'])
+def bulk_trash_templates():
+    """
+    Endpoint to move many templates to the trash at once.
+    S3 copies run concurrently, outside any transaction, and the database
+    is updated in one statement that skips rows changed in the meantime.
+    Returns an outcome per id: trashed, not_found or failed.
+    """
+    ids, error_response = parse_bulk_ids(request.get_json(silent=True))
+    if error_response:
+        return error_response
+
+    db = get_db()
+    outcomes = {template_id: {"status": "not_found"} for template_id in ids}
+    try:
+        # 1. Read the active rows; the transaction ends before any S3 call
+        with db.cursor() as cur:
+            cur.execute("SELECT id, s3_key FROM templates WHERE id = ANY(%s) AND deleted_at IS NULL", (ids,))
+            records = cur.fetchall()
+        db.rollback()
+        keys = {}
+        for template_id, s3_key in records:
+            if s3_key.startswith('trash/'):
+                outcomes[template_id] = {"status": "failed", "error": "Template already in trash."}
+            else:
+                keys[template_id] = s3_key
+
+        # 2. Copy every file into trash/ concurrently
+        s3 = get_s3()
+        copy_errors = s3.copy_objects(
+            ((s3_key, f"trash/{s3_key}") for s3_key in keys.values()),
+            max_workers=current_app.config['BULK_S3_CONCURRENCY']
+        )
+        for template_id, s3_key in list(keys.items()):
+            if s3_key in copy_errors:
+                outcomes[template_id] = {"status": "failed", "error": str(copy_errors.pop(s3_key))}
+                del keys[template_id]
+
+        # 3. Point every copied row at its trash key in a single statement,
+        #    unless it was trashed or changed since step 1. The copy of a
+        #    skipped row is left alone, as it may be another request's.
+        if keys:
+            with db.cursor() as cur:
+                cur.execute(
+                    """
+                    UPDATE templates t
+                    SET deleted_at = CURRENT_TIMESTAMP, s3_key = 'trash/' || t.s3_key
+                    FROM unnest(%s::int[], %s::text[]) AS v (id, s3_key)
+                    WHERE t.id = v.id AND t.s3_key = v.s3_key AND t.deleted_at IS NULL
+                    RETURNING t.id
+                    """,
+                    (list(keys), list(keys.values()))
+                )
+                updated = {row[0] for row in cur.fetchall()}
+            db.commit()
+            for template_id in set(keys) - updated:
+                outcomes[template_id] = {"status": "failed", "error": "Template changed while it was being trashed."}
+                del keys[template_id]
+
+        # 4. Remove the originals only once the database points at the copies;
+        #    an original that fails to delete is just an orphan
+        delete_errors = s3.delete_objects(keys.values())
+
+        cache = get_metadata_cache()
+        for template_id, s3_key in keys.items():
+            cache.invalidate(template_id)
+            outcomes[template_id] = {"status": "trashed"}
+            if s3_key in delete_errors:
+                outcomes[template_id]["warning"] = str(delete_errors[s3_key])
+        return bulk_response(ids, outcomes, "trashed")
+
+    except (S3Error, psycopg2.Error) as e:
+        db.rollback()
+        print(f"Error bulk deleting templates: {e}")
+        return jsonify({"error": "An internal error occurred while deleting the templates."}), 500
+
+@api_bp.route('/templates/bulk/restore', methods=['POST'])
+def bulk_restore_templates():
+    """
+    Endpoint to restore many templates from the trash at once.
+    Templates whose file is no longer in S3 are removed, as in the single
+    restore endpoint. S3 copies run outside any transaction, and rows
+    changed in the meantime are skipped. Returns an outcome per id:
+    restored, gone, not_found or failed.
+    """
+    ids, error_response = parse_bulk_ids(request.get_json(silent=True))
+    if error_response:
+        return error_response
+
+    db = get_db()
+    outcomes = {template_id: {"status": "not_found"} for template_id in ids}
+    try:
+        # 1. Read the trashed rows; the transaction ends before any S3 call
+        with db.cursor() as cur:
+            cur.execute("SELECT id, s3_key FROM templates WHERE id = ANY(%s) AND deleted_at IS NOT NULL", (ids,))
+            records = cur.fetchall()
+        db.rollback()
+        keys = {}
+        for template_id, s3_key in records:
+            if s3_key.startswith('trash/') and len(s3_key) > len('trash/'):
+                keys[template_id] = s3_key
+            else:
+                outcomes[template_id] = {"status": "failed", "error": f"Key '{s3_key}' does not appear to be in the trash directory."}
+
+        # 2. Copy every file back out of trash/ concurrently. A missing
+        #    source means the file was purged, so the row is an orphan.
+        s3 = get_s3()
+        copy_errors = s3.copy_objects(
+            ((s3_key, s3_key[len('trash/'):]) for s3_key in keys.values()),
+            max_workers=current_app.config['BULK_S3_CONCURRENCY']
+        )
+        gone = {}
+        for template_id, s3_key in list(keys.items()):
+            error = copy_errors.get(s3_key)
+            if error is None:
+                continue
+            del keys[template_id]
+            if isinstance(error, S3NotFoundError):
+                gone[template_id] = s3_key
+            else:
+                outcomes[template_id] = {"status": "failed", "error": str(error)}
+
+        # 3. Apply both kinds of change with one statement each, skipping
+        #    rows restored or changed since step 1
+        restored, deleted = set(), set()
+        if keys or gone:
+            with db.cursor() as cur:
+                if keys:
+                    cur.execute(
+                        """
+                        UPDATE templates t
+                        SET deleted_at = NULL, s3_key = substr(t.s3_key, %s)
+                        FROM unnest(%s::int[], %s::text[]) AS v (id, s3_key)
+                        WHERE t.id = v.id AND t.s3_key = v.s3_key AND t.deleted_at IS NOT NULL
+                        RETURNING t.id
+                        """,
+                        (len('trash/') + 1, list(keys), list(keys.values()))
+                    )
+                    restored = {row[0] for row in cur.fetchall()}
+                if gone:
+                    cur.execute(
+                        """
+                        DELETE FROM templates t
+                        USING unnest(%s::int[], %s::text[]) AS v (id, s3_key)
+                        WHERE t.id = v.id AND t.s3_key = v.s3_key AND t.deleted_at IS NOT NULL
+                        RETURNING t.id
+                        """,
+                        (list(gone), list(gone.values()))
+                    )
+                    deleted = {row[0] for row in cur.fetchall()}
+            db.commit()
+
+        for template_id in (set(keys) - restored) | (set(gone) - deleted):
+            outcomes[template_id] = {"status": "failed", "error": "Template changed while it was being restored."}
+        keys = {template_id: s3_key for template_id, s3_key in keys.items() if template_id in restored}
+        for template_id in deleted:
+            current_app.logger.warning(
+                f"Orphaned record found: Deleted template {template_id} (S3 key {gone[template_id]} not found)."
+            )
+            outcomes[template_id] = {"status": "gone", "error": "This template has been permanently deleted and can no longer be restored."}
+
+        # 4. Remove the trash copies once the database points at the restored files
+        delete_errors = s3.delete_objects(keys.values())
+
+        cache = get_metadata_cache()
+        for template_id, s3_key in keys.items():
+            outcomes[template_id] = {"status": "restored"}
+            if s3_key in delete_errors:
+                outcomes[template_id]["warning"] = str(delete_errors[s3_key])
+        for template_id in list(keys) + list(deleted):
+            cache.invalidate(template_id)
+        return bulk_response(ids, outcomes, "restored")
+
+    except (S3Error, psycopg2.Error) as e:
+        db.rollback()
+        current_app.logger.error(f"Error bulk restoring templates: {e}")
+        return jsonify({"error": "An internal error occurred while restoring the templates."}), 500
+
+@api_bp.route('/templates/bulk/purge', methods=['POST'])
+def bulk_purge_templates():
+    """
+    Endpoint to permanently delete trashed templates.
+    Files are removed with batched S3 deletes and the rows with a single
+    statement. Only templates already in the trash can be purged. Returns
+    an outcome per id: purged, not_found or failed.
+    """
+    ids, error_response = parse_bulk_ids(request.get_json(silent=True))
+    if error_response:
+        return error_response
+
+    db = get_db()
+    outcomes = {template_id: {"status": "not_found"} for template_id in ids}
+    try:
+        with db.cursor() as cur:
+            # 1. Lock the trashed rows
+            cur.execute(
+                "SELECT id, s3_key, thumbnail_key FROM templates WHERE id = ANY(%s) AND deleted_at IS NOT NULL FOR UPDATE",
+                (ids,)
+            )
+            records = cur.fetchall()
+            keys = {template_id: s3_key for template_id, s3_key, _ in records}
+            thumbnail_keys = [thumbnail_key for _, _, thumbnail_key in records if thumbnail_key]
+
+            # 2. Delete the files first; a row whose file could not be
+            #    deleted stays in the trash so the purge can be retried.
+            #    A thumbnail that fails to delete is just an orphan.
+            delete_errors = get_s3().delete_objects(list(keys.values()) + thumbnail_keys)
+            for template_id, s3_key in list(keys.items()):
+                if s3_key in delete_errors:
+                    outcomes[template_id] = {"status": "failed", "error": str(delete_errors[s3_key])}
+                    del keys[template_id]
+
+            # 3. Delete the rows in a single statement
+            if keys:
+                cur.execute("DELETE FROM templates WHERE id = ANY(%s)", (list(keys),))
+            db.commit()
+
+        cache = get_metadata_cache()
+        for template_id in keys:
+            cache.invalidate(template_id)
+            outcomes[template_id] = {"status": "purged"}
+        return bulk_response(ids, outcomes, "purged")
+
+    except (S3Error, psycopg2.Error) as e:
+        db.rollback()
+        current_app.logger.error(f"Error purging templates: {e}")
+        return jsonify({"error": "An internal error occurred while purging the templates."}), 500
+
 @api_bp.route('/assets/view-url', methods=['GET'])
 def get_asset_view_url():
     """
@@ -520,6 +1315,96 @@ def get_asset_view_url():
         current_app.logger.error(f"[GET /assets/view-url] Unexpected error for key {s3_key}: {e}")
         return jsonify({"error": "An unexpected server error occurred."}), 500
 
+def immutable_image_response(blob: bytes, mimetype: str, etag: str):
+    """Builds a response for image bytes that never change under `etag`."""
+    response = make_response(blob)
+    response.mimetype = mimetype
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@api_bp.route('/assets/thumbnail', methods=['GET'])
+def get_asset_thumbnail():
+    """
+    Serves a resized preview of a temporary asset from S3.
+    Query parameters: 'key' (a temp/ key), 'w' (maximum width, rounded up
+    to a supported size) and optionally 'format' ('webp' or 'jpeg'; by
+    default WebP when the browser accepts it). Derivatives are generated
+    once and cached, and the response may be cached by the browser forever.
+    """
+    # 1. Get and validate the parameters
+    s3_key = request.args.get('key')
+    if not s3_key:
+        return jsonify({"error": "Missing 'key' query parameter"}), 400
+
+    # 2. **Security Check**: Same rule as /assets/view-url
+    if not s3_key.startswith('temp/'):
+        current_app.logger.warning(f"[GET /assets/thumbnail] Access denied for non-temp key: {s3_key}")
+        return jsonify({"error": "Access denied"}), 403
+
+    width = image_derivatives.snap_width(request.args.get('w', image_derivatives.DEFAULT_DERIVATIVE_WIDTH))
+    image_format = request.args.get('format')
+    negotiated = image_format is None
+    if negotiated:
+        image_format = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+    elif image_format not in image_derivatives.FORMATS:
+        return jsonify({"error": f"Invalid format. Allowed formats are: {', '.join(image_derivatives.FORMATS)}"}), 400
+
+    # 3. Revalidation needs no work at all: the ETag only depends on the key
+    etag = image_derivatives.etag_for(image_derivatives.derivative_key(s3_key, width, image_format))
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+        response.set_etag(etag)
+    else:
+        try:
+            blob = image_derivatives.get_derivative(
+                get_s3(), image_derivatives.get_derivative_cache(current_app), s3_key, width, image_format
+            )
+        except S3NotFoundError:
+            return jsonify({"error": "Asset not found."}), 404
+        except image_derivatives.DerivativeError as e:
+            current_app.logger.warning(f"[GET /assets/thumbnail] {e} (key: {s3_key})")
+            return jsonify({"error": "The asset is not a supported image."}), 422
+        except S3Error as e:
+            current_app.logger.error(f"[GET /assets/thumbnail] S3Error for key {s3_key}: {e}")
+            return jsonify({"error": "Failed to load the asset preview."}), 500
+        response = immutable_image_response(blob, image_derivatives.FORMATS[image_format][1], etag)
+
+    if negotiated:
+        response.headers['Vary'] = 'Accept'
+    return response
+
+@api_bp.route('/templates/<int:template_id>/thumbnail', methods=['GET'])
+def get_template_thumbnail(template_id):
+    """
+    Serves the thumbnail image embedded in a template's .pptx, for
+    template cards. Returns 404 if the template has no thumbnail.
+    """
+    try:
+        record = get_metadata_cache().get(template_id)
+        if record is None or not record['thumbnail_key']:
+            return jsonify({"error": "Thumbnail not found."}), 404
+
+        thumbnail_key = record['thumbnail_key']
+        etag = image_derivatives.etag_for(thumbnail_key)
+        if etag in request.if_none_match:
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+
+        cache = image_derivatives.get_derivative_cache(current_app)
+        blob = cache.get(thumbnail_key)
+        if blob is None:
+            blob = get_s3().download_file_as_stream(thumbnail_key).getvalue()
+            cache.put(thumbnail_key, blob)
+        return immutable_image_response(blob, 'image/jpeg', etag)
+
+    except S3NotFoundError:
+        return jsonify({"error": "Thumbnail not found."}), 404
+    except (S3Error, psycopg2.DatabaseError) as e:
+        print(f"Error fetching thumbnail for template {template_id}: {e}")
+        return jsonify({"error": "Failed to load the template thumbnail."}), 500
+
 @api_bp.route('/templates/<int:template_id>', methods=['PUT'])
 def update_template(template_id):
     """
@@ -560,6 +1445,7 @@ def update_template(template_id):
                 return jsonify({"error": "Template not found."}), 404
 
             db.commit()
+            get_metadata_cache().invalidate(template_id)
 
             # Format the response
             columns = [desc[0] for desc in cur.description]
@@ -571,4 +1457,43 @@ def update_template(template_id):
         db.rollback()
         current_app.logger.error(f"Error updating template {template_id}: {e}")
         return jsonify({"error": "An internal error occurred while updating the template."}), 500
-    
+
+@api_bp.route('/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    Admin endpoint to fetch a stored request profile.
+    Use ?format=json (default), pstats or collapsed.
+    """
+    if not profiling_service.is_admin_request():
+        return jsonify({"error": "Access denied"}), 403
+
+    fmt = request.args.get('format', 'json')
+    try:
+        path = profiling_service.profile_artifact_path(profile_id, fmt)
+    except profiling_service.ProfilingError as e:
+        return jsonify({"error": str(e)}), 404
+
+    if fmt == 'json':
+        with open(path) as f:
+            return jsonify(json.load(f)), 200
+    return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=os.path.basename(path))
+
+@api_bp.route('/admin/generation-stats', methods=['GET'])
+def get_generation_stats():
+    """
+    Admin endpoint exposing this worker's generation capacity counters:
+    admission queue depth and rejections, render pool and template cache.
+    """
+    if not profiling_service.is_admin_request():
+        return jsonify({"error": "Access denied"}), 403
+
+    render_pool = get_render_pool(current_app)
+    return jsonify({
+        "pid": os.getpid(),
+        "admission": get_admission_controller(current_app).stats(),
+        "render_pool": render_pool.stats() if render_pool is not None else None,
+        "template_cache": get_template_cache(current_app).stats(),
+        "preview_cache": get_preview_cache(current_app).stats(),
+        "metadata_cache": get_metadata_cache().stats(),
+    }), 200
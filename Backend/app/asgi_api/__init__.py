@@ -0,0 +1,61 @@
+"""
+ASGI serving mode.
+
+`create_asgi_app` wraps the Flask app in a Starlette app. The I/O-bound
+endpoints in routes.py are served natively on the event loop, over the
+per-process async clients in resources.py; every other path falls through
+to the Flask app, which runs on a thread pool, so generation and the other
+CPU-bound endpoints behave exactly as under gunicorn.
+
+Usage: uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers N
+"""
+import asyncio
+import contextlib
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount
+
+from app.asgi_api import routes
+from app.asgi_api.resources import AsyncResources
+from app.services.warmup import warm_up, start_worker, stop_worker
+
+
+def create_asgi_app(flask_app) -> Starlette:
+    """
+    Creates the ASGI application for `flask_app`.
+    """
+    config = flask_app.config
+
+    @contextlib.asynccontextmanager
+    async def lifespan(asgi_app):
+        # uvicorn workers are not forked from a warmed master, so each one
+        # fills its own template cache before taking requests
+        await asyncio.to_thread(warm_up, flask_app)
+        await asyncio.to_thread(start_worker, flask_app)
+        try:
+            async with AsyncResources.open(config) as resources:
+                asgi_app.state.resources = resources
+                yield
+        finally:
+            await asyncio.to_thread(stop_worker)
+
+    # The same origins the Flask app allows (see create_app); Flask-CORS
+    # still answers for the paths that fall through to Flask
+    origins = list(config.get('CORS_ORIGINS') or [])
+    if config.get('FRONTEND_URL'):
+        origins.append(config['FRONTEND_URL'])
+
+    asgi_app = Starlette(
+        routes=routes.ROUTES + [
+            Mount('', app=WSGIMiddleware(flask_app, workers=config['ASGI_WSGI_THREADS'])),
+        ],
+        middleware=[
+            Middleware(CORSMiddleware, allow_origins=origins, allow_methods=['*'], allow_headers=['*']),
+        ],
+        lifespan=lifespan,
+    )
+    asgi_app.state.flask_app = flask_app
+    return asgi_app
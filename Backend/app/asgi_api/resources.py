@@ -0,0 +1,51 @@
+import contextlib
+import os
+
+from app.lazy_imports import lazy_module
+from app.services.s3_async import AsyncS3Service
+
+# Imported on first use; see app/lazy_imports.py
+asyncpg = lazy_module('asyncpg')
+httpx = lazy_module('httpx')
+
+
+class AsyncResources:
+    """
+    The clients the async endpoints share within one worker process: an
+    httpx client for outbound HTTP (image providers, URL imports), an
+    asyncpg pool and an aiobotocore S3 client. All of them pool their
+    connections, so concurrent requests wait on sockets, not on threads.
+    """
+    def __init__(self, http, db, s3):
+        self.http = http
+        self.db = db
+        self.s3 = s3
+
+    @classmethod
+    @contextlib.asynccontextmanager
+    async def open(cls, config):
+        """
+        Opens every client from an application config and closes them on exit.
+
+        Raises:
+            ValueError: If DATABASE_URL is not set.
+            S3ConfigError: If any required S3 configuration is missing.
+        """
+        db_url = config.get('DATABASE_URL') or os.environ.get('DATABASE_URL')
+        if not db_url:
+            raise ValueError("DATABASE_URL environment variable is not set.")
+
+        async with contextlib.AsyncExitStack() as stack:
+            http = await stack.enter_async_context(httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=config['ASYNC_HTTP_MAX_CONNECTIONS'],
+                    max_keepalive_connections=config['ASYNC_HTTP_MAX_CONNECTIONS'],
+                )
+            ))
+            db = await stack.enter_async_context(asyncpg.create_pool(
+                db_url,
+                min_size=config['ASYNC_DB_POOL_MIN_CONNECTIONS'],
+                max_size=config['ASYNC_DB_POOL_MAX_CONNECTIONS'],
+            ))
+            s3 = await stack.enter_async_context(AsyncS3Service.open(config))
+            yield cls(http, db, s3)
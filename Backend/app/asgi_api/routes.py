@@ -0,0 +1,287 @@
+"""
+Async versions of the I/O-bound endpoints in app/api/routes.py, with the
+same paths, payloads, status codes and messages. They share the service
+logic of the sync endpoints and only swap the transports: httpx instead of
+requests, asyncpg instead of psycopg2 and aiobotocore instead of boto3.
+"""
+import logging
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.lazy_imports import lazy_module
+from app.services.s3_service import S3Error, S3UploadError
+from app.services.metadata_cache import get_metadata_cache
+from app.services import image_search_service
+from app.services import remote_images
+
+# Imported on first use; see app/lazy_imports.py
+asyncpg = lazy_module('asyncpg')
+
+# A child of the Flask app's logger ('app'), so records go to the same handlers
+logger = logging.getLogger(__name__)
+
+
+def jsonify(request: Request, content, status_code: int = 200) -> Response:
+    """
+    Serializes with the Flask app's JSON provider, so dates and the like
+    come out exactly as from the sync endpoints.
+    """
+    body = request.app.state.flask_app.json.dumps(content)
+    return Response(body, status_code=status_code, media_type='application/json')
+
+
+async def get_json(request: Request):
+    """The request's JSON body, or None if it is missing or invalid."""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def search_images(request: Request):
+    """
+    Endpoint to search for images across the configured providers
+    (IMAGE_SEARCH_PROVIDERS); see the sync endpoint.
+    """
+    flask_app = request.app.state.flask_app
+    query = request.query_params.get('q')
+    if not query:
+        return jsonify(request, {"error": "A search query 'q' is required."}, 400)
+
+    # 1. Get the providers enabled in the application config
+    providers = image_search_service.get_image_providers(flask_app)
+    if not providers:
+        flask_app.logger.error("No image search provider is configured.")
+        return jsonify(request, {"error": "Image search service is not configured."}, 500)
+
+    # 2. Query every provider at once; slow ones are dropped at the timeout
+    try:
+        results, statuses = await image_search_service.search_images_async(
+            providers, request.app.state.resources.http, query,
+            flask_app.config['IMAGE_SEARCH_RESULTS'], flask_app.config['IMAGE_SEARCH_TIMEOUT_SECONDS']
+        )
+    except image_search_service.ImageSearchError as e:
+        flask_app.logger.error(f"Image search failed for every provider: {e}")
+        return jsonify(request, {"error": "Failed to fetch images from the external provider."}, 503)
+
+    response = jsonify(request, results)
+    response.headers['X-Image-Providers'] = ', '.join(f"{name}={status}" for name, status in statuses.items())
+    return response
+
+
+async def upload_asset_from_url(request: Request):
+    """
+    Endpoint to download an image from a URL and upload it to S3.
+    """
+    data = await get_json(request) or {}
+    image_url = data.get('url')
+    if not image_url:
+        return jsonify(request, {"error": "Image URL is required."}, 400)
+
+    config = request.app.state.flask_app.config
+    resources = request.app.state.resources
+    try:
+        s3_key = await remote_images.import_image_async(
+            resources.s3, resources.http, image_url,
+            config['REMOTE_IMAGE_MAX_BYTES'], config['REMOTE_IMAGE_TIMEOUT_SECONDS'], prefix="temp/"
+        )
+        return jsonify(request, {"s3_key": s3_key}, 201)
+
+    except (remote_images.RemoteImageError, S3UploadError) as e:
+        logger.error(f"S3 Upload from URL failed: {e}")
+        return jsonify(request, {"error": str(e)}, 500)
+    except Exception as e:
+        logger.exception(f"Unexpected error uploading from URL: {e}")
+        return jsonify(request, {"error": "An unexpected server error occurred."}, 500)
+
+
+async def upload_assets_from_urls(request: Request):
+    """
+    Endpoint to import several images from URLs into S3 at once; see the
+    sync endpoint.
+    """
+    # 1. Validate the request payload
+    payload = await get_json(request) or {}
+    urls = payload.get('urls')
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url for url in urls):
+        return jsonify(request, {"error": "'urls' must be a non-empty list of URLs."}, 400)
+    urls = list(dict.fromkeys(urls))
+
+    config = request.app.state.flask_app.config
+    if len(urls) > config['REMOTE_IMAGE_MAX_URLS']:
+        return jsonify(request, {"error": f"At most {config['REMOTE_IMAGE_MAX_URLS']} URLs can be imported at once."}, 400)
+
+    # 2. Fetch and upload every URL concurrently
+    resources = request.app.state.resources
+    outcomes = await remote_images.import_images_async(
+        resources.s3, resources.http, urls,
+        config['REMOTE_IMAGE_MAX_BYTES'], config['REMOTE_IMAGE_TIMEOUT_SECONDS'],
+        config['REMOTE_IMAGE_CONCURRENCY']
+    )
+
+    # 3. Report per URL, in request order
+    results = []
+    for url, outcome in zip(urls, outcomes):
+        if isinstance(outcome, (remote_images.RemoteImageError, S3UploadError)):
+            results.append({"url": url, "error": str(outcome)})
+        elif isinstance(outcome, Exception):
+            logger.error(f"Unexpected error importing image from {url}: {outcome!r}")
+            results.append({"url": url, "error": "An unexpected server error occurred."})
+        else:
+            results.append({"url": url, "s3_key": outcome})
+    uploaded = sum(1 for result in results if 's3_key' in result)
+    return jsonify(request, {"results": results, "uploaded": uploaded, "failed": len(results) - uploaded})
+
+
+async def get_asset_view_url(request: Request):
+    """
+    Generates a pre-signed URL for viewing a temporary asset from S3.
+    """
+    # 1. Get and validate the 'key' query parameter
+    s3_key = request.query_params.get('key')
+    if not s3_key:
+        logger.warning("[GET /assets/view-url] Missing 'key' query parameter.")
+        return jsonify(request, {"error": "Missing 'key' query parameter"}, 400)
+
+    # 2. Only allow generation for keys in the 'temp/' directory
+    if not s3_key.startswith('temp/'):
+        logger.warning(f"[GET /assets/view-url] Access denied for non-temp key: {s3_key}")
+        return jsonify(request, {"error": "Access denied"}, 403)
+
+    # 3. Generate the URL
+    try:
+        url = await request.app.state.resources.s3.create_presigned_url_for_download(s3_key)
+        return jsonify(request, {"url": url})
+    except S3Error as e:
+        logger.error(f"[GET /assets/view-url] S3Error for key {s3_key}: {e}")
+        return jsonify(request, {"error": "Failed to generate viewable URL."}, 500)
+    except Exception as e:
+        logger.error(f"[GET /assets/view-url] Unexpected error for key {s3_key}: {e}")
+        return jsonify(request, {"error": "An unexpected server error occurred."}, 500)
+
+
+async def get_trashed_templates(request: Request):
+    """
+    Endpoint to retrieve a list of all soft-deleted templates (in the trash).
+    """
+    try:
+        rows = await request.app.state.resources.db.fetch(
+            "SELECT id, name, created_at, deleted_at FROM templates WHERE deleted_at IS NOT NULL ORDER BY deleted_at DESC;"
+        )
+        return jsonify(request, [dict(row) for row in rows])
+    except asyncpg.PostgresError as e:
+        logger.error(f"Error fetching trashed templates: {e}")
+        return jsonify(request, {"error": "A database error occurred while fetching trashed items."}, 500)
+
+
+async def delete_template(request: Request):
+    """
+    Endpoint to delete a template. Moves the S3 file to a trash folder
+    and marks the record as deleted. Each statement takes a pooled
+    connection only for its own duration, not across the S3 calls.
+    """
+    template_id = request.path_params['template_id']
+    flask_app = request.app.state.flask_app
+    resources = request.app.state.resources
+    try:
+        # Step 1: Fetch the record to get the s3_key
+        record = await resources.db.fetchrow(
+            "SELECT s3_key FROM templates WHERE id = $1 AND deleted_at IS NULL", template_id
+        )
+
+        # Step 2: Handle Not Found
+        if record is None:
+            return jsonify(request, {"error": "Template not found."}, 404)
+
+        original_s3_key = record['s3_key']
+        if original_s3_key.startswith('trash/'):
+            flask_app.logger.warning(f"Attempted to delete template {template_id} which seems already in trash based on s3_key: {original_s3_key}")
+            return jsonify(request, {"error": "Template already in trash."}, 404)
+
+        # Step 3: Move S3 Object to Trash and capture the new key
+        new_s3_key_in_trash = await resources.s3.move_file_to_trash(original_s3_key)
+
+        # Step 4: Update the timestamp AND the s3_key in the database
+        await resources.db.execute(
+            "UPDATE templates SET deleted_at = CURRENT_TIMESTAMP, s3_key = $1 WHERE id = $2",
+            new_s3_key_in_trash, template_id
+        )
+        get_metadata_cache(flask_app).invalidate(template_id)
+
+        return jsonify(request, {"message": "Template moved to trash. Files are permanently deleted after 30 days."})
+
+    except (S3Error, asyncpg.PostgresError) as e:
+        logger.error(f"Error deleting template {template_id}: {e}")
+        return jsonify(request, {"error": "An internal error occurred while deleting the template."}, 500)
+
+
+async def restore_template(request: Request):
+    """
+    Endpoint to restore a soft-deleted template from the trash.
+    Moves the file from S3 trash back to root and updates the database record.
+    """
+    template_id = request.path_params['template_id']
+    flask_app = request.app.state.flask_app
+    resources = request.app.state.resources
+    s3_key_in_trash = None # Initialize variable to help with logging on failure
+
+    try:
+        # Step 1: Fetch the s3_key, ensuring the template is in the trash
+        record = await resources.db.fetchrow(
+            "SELECT id, s3_key FROM templates WHERE id = $1 AND deleted_at IS NOT NULL", template_id
+        )
+        if record is None:
+            return jsonify(request, {"error": "Template not found in trash."}, 404)
+        s3_key_in_trash = record['s3_key']
+
+        # Step 2: Restore the file from S3 trash BEFORE updating the database
+        if not await resources.s3.file_exists(s3_key_in_trash):
+            # The S3 file was permanently deleted, so the record is orphaned
+            flask_app.logger.warning(
+                f"Orphaned record found: Deleting template {template_id} "
+                f"(S3 key {s3_key_in_trash} not found)."
+            )
+            await resources.db.execute("DELETE FROM templates WHERE id = $1", template_id)
+            get_metadata_cache(flask_app).invalidate(template_id)
+            return jsonify(request, {
+                "error": "This template has been permanently deleted and can no longer be restored."
+            }, 410)
+
+        original_s3_key = await resources.s3.restore_file_from_trash(s3_key_in_trash)
+
+        # Step 3: Clear deleted_at and set s3_key back to the original key
+        await resources.db.execute(
+            "UPDATE templates SET deleted_at = NULL, s3_key = $1 WHERE id = $2",
+            original_s3_key, template_id
+        )
+        get_metadata_cache(flask_app).invalidate(template_id)
+
+        return jsonify(request, {"message": "Template restored successfully."})
+
+    except S3Error as e:
+        flask_app.logger.error(f"S3 Error restoring template {template_id} (key: {s3_key_in_trash}): {e}")
+        return jsonify(request, {"error": f"An error occurred with storage while restoring: {e}"}, 500)
+    except ValueError as e: # The key is not under 'trash/'
+        flask_app.logger.error(f"ValueError restoring template {template_id} (key: {s3_key_in_trash}): {e}")
+        return jsonify(request, {"error": str(e)}, 400)
+    except asyncpg.PostgresError as e:
+        flask_app.logger.error(f"Database Error restoring template {template_id}: {e}")
+        return jsonify(request, {"error": "An internal error occurred while restoring the template."}, 500)
+    except Exception as e:
+        flask_app.logger.error(f"Unexpected error restoring template {template_id}: {e}")
+        return jsonify(request, {"error": "An unexpected server error occurred."}, 500)
+
+
+# Matched before the Flask app; a path that matches here with another
+# method (e.g. GET /api/templates/<id>) still falls through to Flask
+ROUTES = [
+    Route('/api/images/search', search_images, methods=['GET']),
+    Route('/api/assets/upload_from_url', upload_asset_from_url, methods=['POST']),
+    Route('/api/assets/upload_from_urls', upload_assets_from_urls, methods=['POST']),
+    Route('/api/assets/view-url', get_asset_view_url, methods=['GET']),
+    Route('/api/templates/trash', get_trashed_templates, methods=['GET']),
+    Route('/api/templates/{template_id:int}', delete_template, methods=['DELETE']),
+    Route('/api/templates/{template_id:int}/restore', restore_template, methods=['POST']),
+]
@@ -38,6 +38,83 @@ def create_tables():
         ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE DEFAULT NULL;
         """
         cur.execute(alter_table_command)
+
+        # Usage counters, used to pick which templates to warm at boot
+        usage_columns_command = """
+        ALTER TABLE templates
+        ADD COLUMN IF NOT EXISTS generation_count INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS last_generated_at TIMESTAMP WITH TIME ZONE DEFAULT NULL;
+        """
+        cur.execute(usage_columns_command)
+
+        # Free-text description, edited through PUT /api/templates/<id>
+        cur.execute("ALTER TABLE templates ADD COLUMN IF NOT EXISTS description TEXT;")
+
+        # S3 key of the thumbnail embedded in the .pptx, shown on template cards
+        cur.execute("ALTER TABLE templates ADD COLUMN IF NOT EXISTS thumbnail_key VARCHAR(1024);")
+
+        # File size as uploaded and as stored (after optional compaction)
+        size_columns_command = """
+        ALTER TABLE templates
+        ADD COLUMN IF NOT EXISTS original_size_bytes BIGINT,
+        ADD COLUMN IF NOT EXISTS stored_size_bytes BIGINT;
+        """
+        cur.execute(size_columns_command)
+
+        # Per-template statistics: file statistics collected at save time,
+        # and rolling render latency and peak memory written in batches by
+        # the usage recorder (like the usage counters, not announced)
+        stats_columns_command = """
+        ALTER TABLE templates
+        ADD COLUMN IF NOT EXISTS stats JSONB,
+        ADD COLUMN IF NOT EXISTS render_samples INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS render_ms_avg DOUBLE PRECISION,
+        ADD COLUMN IF NOT EXISTS render_peak_bytes BIGINT;
+        """
+        cur.execute(stats_columns_command)
+
+        # Search support: ranked full-text search over name and description,
+        # fuzzy name matching (pg_trgm) and "templates using placeholder X"
+        # lookups on the placeholders JSONB
+        search_command = """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        ALTER TABLE templates
+        ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english'::regconfig, coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')
+        ) STORED;
+
+        CREATE INDEX IF NOT EXISTS templates_search_vector_idx ON templates USING GIN (search_vector);
+        CREATE INDEX IF NOT EXISTS templates_name_trgm_idx ON templates USING GIN (name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS templates_placeholders_idx ON templates USING GIN (placeholders jsonb_path_ops);
+        """
+        cur.execute(search_command)
+
+        # Announce metadata changes so every worker can drop its cached row.
+        # Usage counter updates are deliberately not announced.
+        notify_function_command = """
+        CREATE OR REPLACE FUNCTION notify_template_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('template_changes', OLD.id::text);
+            ELSE
+                PERFORM pg_notify('template_changes', NEW.id::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+        cur.execute(notify_function_command)
+
+        notify_trigger_command = """
+        DROP TRIGGER IF EXISTS templates_notify_change ON templates;
+        CREATE TRIGGER templates_notify_change
+        AFTER INSERT OR DELETE OR UPDATE OF name, s3_key, placeholders, description, thumbnail_key, deleted_at
+        ON templates
+        FOR EACH ROW EXECUTE FUNCTION notify_template_change();
+        """
+        cur.execute(notify_trigger_command)
         
         # Commit the changes
         conn.commit()
@@ -0,0 +1,193 @@
+"""
+Reconciles the S3 bucket with the templates table.
+
+Finds three kinds of drift:
+  * orphaned rows: templates whose s3_key no longer exists in the bucket,
+  * unreferenced objects: template files (root or trash/) no row points at,
+  * stale temp assets: uploads under temp/ older than --temp-max-age-hours.
+
+By default only a report is printed; pass --clean to delete what was found.
+Run from the Backend directory:
+
+    python -m app.database.reconcile_s3 [--clean] [--json]
+
+Set S3_ENDPOINT_URL to run against a local S3 stand-in such as MinIO.
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from app import create_app, get_db, get_s3
+from app.lazy_imports import lazy_module
+
+psycopg2_extras = lazy_module('psycopg2.extras')
+
+TRASH_PREFIX = 'trash/'
+TEMP_PREFIX = 'temp/'
+
+
+def list_bucket(s3) -> dict:
+    """
+    Lists the root, trash/ and temp/ prefixes concurrently.
+
+    The root is listed with a '/' delimiter, so objects under any other
+    prefix (e.g. derived assets) are never considered.
+
+    Returns:
+        A dict mapping 'root', 'trash' and 'temp' to lists of objects.
+    """
+    listings = {
+        'root': ('', '/'),
+        'trash': (TRASH_PREFIX, None),
+        'temp': (TEMP_PREFIX, None),
+    }
+    with ThreadPoolExecutor(max_workers=len(listings)) as executor:
+        futures = {name: executor.submit(s3.list_objects, prefix, delimiter)
+                   for name, (prefix, delimiter) in listings.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def find_discrepancies(rows, listings: dict, started_at: datetime,
+                       min_object_age: timedelta, temp_max_age: timedelta) -> dict:
+    """
+    Diffs the template rows against the bucket listing.
+
+    Objects newer than `min_object_age` (relative to `started_at`) are
+    never reported as unreferenced, since they may belong to a save or
+    restore that committed after the rows were read.
+
+    Args:
+        rows: (id, s3_key) tuples for every template, read BEFORE listing.
+        listings: The result of `list_bucket`.
+        started_at: When the rows were read.
+        min_object_age: Grace period for unreferenced objects.
+        temp_max_age: Age after which temp/ assets are stale.
+
+    Returns:
+        A dict with 'orphaned_rows' (list of (id, s3_key)),
+        'unreferenced_objects' and 'stale_temp_objects' (lists of keys).
+    """
+    existing = {obj['Key'] for name in ('root', 'trash') for obj in listings[name]}
+    referenced = {s3_key for _, s3_key in rows}
+
+    orphaned_rows = [(template_id, s3_key) for template_id, s3_key in rows if s3_key not in existing]
+    unreferenced_objects = [
+        obj['Key'] for name in ('root', 'trash') for obj in listings[name]
+        if obj['Key'] not in referenced and obj['LastModified'] < started_at - min_object_age
+    ]
+    stale_temp_objects = [
+        obj['Key'] for obj in listings['temp']
+        if obj['LastModified'] < started_at - temp_max_age
+    ]
+    return {
+        "orphaned_rows": orphaned_rows,
+        "unreferenced_objects": unreferenced_objects,
+        "stale_temp_objects": stale_temp_objects,
+    }
+
+
+def clean(db, s3, discrepancies: dict) -> dict:
+    """
+    Deletes the orphaned rows and the unreferenced and stale objects.
+
+    A row is only deleted if its s3_key is still the one found missing,
+    so a template moved to or from the trash in the meantime is kept.
+
+    Returns:
+        A dict with the number of rows deleted and of objects that could
+        not be deleted.
+    """
+    deleted_rows = 0
+    if discrepancies['orphaned_rows']:
+        with db.cursor() as cur:
+            psycopg2_extras.execute_values(
+                cur,
+                """
+                DELETE FROM templates AS t
+                USING (VALUES %s) AS v(id, s3_key)
+                WHERE t.id = v.id AND t.s3_key = v.s3_key
+                """,
+                discrepancies['orphaned_rows'],
+                page_size=1000
+            )
+            deleted_rows = cur.rowcount
+        db.commit()
+
+    failed = s3.delete_objects(discrepancies['unreferenced_objects'] + discrepancies['stale_temp_objects'])
+    return {"deleted_rows": deleted_rows, "failed_object_deletes": sorted(failed)}
+
+
+def reconcile(apply_changes: bool, min_object_age: timedelta, temp_max_age: timedelta) -> dict:
+    """Runs one reconciliation pass inside an application context."""
+    db = get_db()
+    s3 = get_s3()
+
+    # Rows are read before the bucket is listed: any committed row's file
+    # was written before its commit, so it must show up in the listing
+    started_at = datetime.now(timezone.utc)
+    with db.cursor() as cur:
+        cur.execute("SELECT id, s3_key FROM templates;")
+        rows = cur.fetchall()
+    db.rollback()
+
+    listings = list_bucket(s3)
+    discrepancies = find_discrepancies(rows, listings, started_at, min_object_age, temp_max_age)
+
+    report = {
+        "rows": len(rows),
+        "objects": {name: len(objects) for name, objects in listings.items()},
+        **discrepancies,
+    }
+    if apply_changes:
+        report.update(clean(db, s3, discrepancies))
+    return report
+
+
+def print_report(report: dict, apply_changes: bool):
+    print(f"Templates in database: {report['rows']}")
+    print("Objects in bucket: " + ", ".join(f"{name}={count}" for name, count in report['objects'].items()))
+    print(f"Orphaned rows (file missing): {len(report['orphaned_rows'])}")
+    for template_id, s3_key in report['orphaned_rows']:
+        print(f"  template {template_id}: {s3_key}")
+    print(f"Unreferenced objects: {len(report['unreferenced_objects'])}")
+    for key in report['unreferenced_objects']:
+        print(f"  {key}")
+    print(f"Stale temp assets: {len(report['stale_temp_objects'])}")
+    if apply_changes:
+        print(f"Deleted {report['deleted_rows']} rows.")
+        if report['failed_object_deletes']:
+            print(f"Could not delete {len(report['failed_object_deletes'])} objects.")
+    else:
+        print("Dry run; pass --clean to delete the items above.")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reconcile the S3 bucket with the templates table.")
+    parser.add_argument('--clean', action='store_true',
+                        help="Delete orphaned rows, unreferenced objects and stale temp assets.")
+    parser.add_argument('--temp-max-age-hours', type=float, default=24,
+                        help="Age after which temp/ assets are considered stale (default: 24).")
+    parser.add_argument('--min-object-age-minutes', type=float, default=60,
+                        help="Grace period before an unreferenced object is reported (default: 60).")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        report = reconcile(
+            apply_changes=args.clean,
+            min_object_age=timedelta(minutes=args.min_object_age_minutes),
+            temp_max_age=timedelta(hours=args.temp_max_age_hours),
+        )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args.clean)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
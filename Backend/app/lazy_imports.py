@@ -0,0 +1,56 @@
+import importlib
+
+
+class LazyModule:
+    """
+    A stand-in for a module that is only imported on first attribute access.
+
+    Heavy dependencies (boto3, pptx, psycopg2, requests) are only needed by
+    some endpoints, so importing them eagerly slows down worker boot and
+    every CLI entry point. Binding them through a LazyModule keeps the usual
+    `module.attribute` call sites (including `except module.Error:` clauses)
+    while deferring the import cost until the code path actually runs.
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            # import_module holds the per-module import lock, so concurrent
+            # first accesses from several threads are safe.
+            module = self._module = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    """Returns a lazily imported handle for the module `name`."""
+    return LazyModule(name)
+
+
+# Modules that the server should import up front in the master process
+# when preloading, so forked workers share them instead of each paying
+# the import cost on their first request.
+PRELOAD_MODULES = (
+    'psycopg2',
+    'psycopg2.pool',
+    'psycopg2.extras',
+    'boto3',
+    'botocore.exceptions',
+    'requests',
+    'app.services.pptx_service',
+)
+
+
+def preload_heavy_modules():
+    """Eagerly imports every module in PRELOAD_MODULES."""
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
@@ -0,0 +1,159 @@
+"""
+Admission control for generation endpoints.
+
+Each render is admitted against two budgets: concurrent jobs and estimated
+bytes in flight (derived from template size). A request that does not fit
+waits in a short queue; when the queue is full, or the wait runs out, it is
+rejected so the client can retry instead of slowing every render down.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be admitted; carries the suggested retry delay."""
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    A bounded concurrency limiter with a short FIFO-ish wait queue.
+
+    Jobs larger than `max_bytes` are clamped to it, so an oversized job is
+    still admitted once it has the server to itself.
+    """
+    def __init__(self, max_jobs: int, max_bytes: int, queue_size: int,
+                 max_wait_seconds: float, retry_after_seconds: int):
+        self.max_jobs = max_jobs
+        self.max_bytes = max_bytes
+        self.queue_size = queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self._condition = threading.Condition()
+
+        self.jobs_in_flight = 0
+        self.bytes_in_flight = 0
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def _fits(self, estimated_bytes: int) -> bool:
+        return (self.jobs_in_flight < self.max_jobs and
+                self.bytes_in_flight + estimated_bytes <= self.max_bytes)
+
+    def _reject(self, reason: str):
+        raise AdmissionRejected(reason, self.retry_after_seconds)
+
+    def acquire(self, estimated_bytes: int) -> int:
+        """
+        Blocks until the job fits, up to `max_wait_seconds`.
+
+        Returns:
+            The (clamped) number of bytes reserved; pass it to `release`.
+
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait times out.
+        """
+        estimated_bytes = min(max(estimated_bytes, 0), self.max_bytes)
+        with self._condition:
+            if self._fits(estimated_bytes) and self.queue_depth == 0:
+                return self._admit(estimated_bytes)
+
+            if self.queue_depth >= self.queue_size:
+                self.rejected_queue_full += 1
+                self._reject("Generation queue is full.")
+
+            self.queue_depth += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+            deadline = time.monotonic() + self.max_wait_seconds
+            try:
+                while not self._fits(estimated_bytes):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        self._reject("Timed out waiting for a generation slot.")
+                    self._condition.wait(remaining)
+            finally:
+                self.queue_depth -= 1
+            return self._admit(estimated_bytes)
+
+    def _admit(self, estimated_bytes: int) -> int:
+        self.jobs_in_flight += 1
+        self.bytes_in_flight += estimated_bytes
+        self.admitted += 1
+        return estimated_bytes
+
+    def release(self, reserved_bytes: int):
+        with self._condition:
+            self.jobs_in_flight -= 1
+            self.bytes_in_flight -= reserved_bytes
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, estimated_bytes: int):
+        """Context manager form of `acquire`/`release`."""
+        reserved = self.acquire(estimated_bytes)
+        try:
+            yield
+        finally:
+            self.release(reserved)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "max_jobs": self.max_jobs,
+                "max_bytes": self.max_bytes,
+                "queue_size": self.queue_size,
+                "jobs_in_flight": self.jobs_in_flight,
+                "bytes_in_flight": self.bytes_in_flight,
+                "queue_depth": self.queue_depth,
+                "peak_queue_depth": self.peak_queue_depth,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+            }
+
+
+def estimate_render_bytes(template_size: int, app, measured_peak_bytes: int = None) -> int:
+    """
+    Estimates peak render memory for a template from the size of the .pptx.
+    Once renders of it have been measured, its rolling peak (plus
+    ADMISSION_MEASURED_HEADROOM) is used instead if that is larger. A
+    measurement never lowers the size-based estimate, because it can
+    under-count.
+    """
+    size_estimate = int(template_size * app.config['ADMISSION_MEMORY_FACTOR'])
+    if measured_peak_bytes:
+        return max(int(measured_peak_bytes * app.config['ADMISSION_MEASURED_HEADROOM']), size_estimate)
+    return size_estimate
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+def get_admission_controller(app) -> AdmissionController:
+    """Returns the process-wide admission controller, creating it on first use."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                max_jobs = app.config['ADMISSION_MAX_JOBS']
+                if not max_jobs:
+                    # Renders hold the GIL in thread mode, so a couple of
+                    # concurrent jobs already saturate the process
+                    from app.services.render_pool import get_render_pool
+                    render_pool = get_render_pool(app)
+                    max_jobs = render_pool.workers if render_pool is not None else 2
+                _controller = AdmissionController(
+                    max_jobs=max_jobs,
+                    max_bytes=app.config['ADMISSION_MAX_BYTES_IN_FLIGHT'],
+                    queue_size=app.config['ADMISSION_QUEUE_SIZE'],
+                    max_wait_seconds=app.config['ADMISSION_MAX_WAIT_SECONDS'],
+                    retry_after_seconds=app.config['ADMISSION_RETRY_AFTER_SECONDS'],
+                )
+    return _controller
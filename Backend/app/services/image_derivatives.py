@@ -0,0 +1,198 @@
+"""
+Resized derivatives of uploaded images, and embedded template thumbnails.
+
+Asset previews are served as width-bounded WebP/JPEG derivatives instead of
+full-size originals. A derivative is generated once, stored in S3 under
+DERIVATIVES_PREFIX and kept in a per-worker LRU. Source keys are unique per
+upload and never rewritten, so a derivative never goes stale and can be
+cached by browsers indefinitely.
+"""
+import hashlib
+import threading
+import zipfile
+from io import BytesIO
+
+from app.lazy_imports import lazy_module
+from app.services.s3_service import S3NotFoundError
+from app.services.template_cache import TemplateCache
+
+# Imported on first use; see app/lazy_imports.py
+Image = lazy_module('PIL.Image')
+ImageOps = lazy_module('PIL.ImageOps')
+
+DERIVATIVES_PREFIX = 'derivatives/'
+TEMPLATE_THUMBNAILS_PREFIX = DERIVATIVES_PREFIX + 'templates/'
+
+# Requested widths are rounded up to one of these, so each source has a
+# handful of derivatives rather than one per pixel width
+DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+DEFAULT_DERIVATIVE_WIDTH = 320
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Concurrent requests for the same derivative generate it once; keys are
+# spread over a fixed set of locks so the lock table never grows
+_generation_locks = [threading.Lock() for _ in range(64)]
+
+
+class DerivativeError(ValueError):
+    """Raised when the source asset cannot be decoded as an image."""
+    pass
+
+
+def snap_width(requested) -> int:
+    """Rounds a requested width up to the nearest supported derivative width."""
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        return DEFAULT_DERIVATIVE_WIDTH
+    for width in DERIVATIVE_WIDTHS:
+        if requested <= width:
+            return width
+    return DERIVATIVE_WIDTHS[-1]
+
+
+def derivative_key(source_key: str, width: int, image_format: str) -> str:
+    """The S3 key under which a derivative of `source_key` is stored."""
+    return f"{DERIVATIVES_PREFIX}{source_key}/w{width}.{image_format}"
+
+
+def etag_for(key: str) -> str:
+    """A strong ETag for an immutable object, derived from its key."""
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def resize_image(blob: bytes, width: int, image_format: str) -> bytes:
+    """
+    Scales an image down to at most `width` pixels wide and encodes it.
+
+    Images narrower than `width` are re-encoded but never enlarged.
+
+    Raises:
+        DerivativeError: If `blob` is not a decodable image.
+    """
+    pil_format, _ = FORMATS[image_format]
+    try:
+        with Image.open(BytesIO(blob)) as img:
+            # Let the JPEG decoder downscale by 1/2..1/8 while decoding,
+            # which is far cheaper than decoding at full size first
+            orientation = img.getexif().get(0x0112)
+            if orientation in _TRANSPOSED_ORIENTATIONS:
+                img.draft(img.mode, (1, width))
+            else:
+                img.draft(img.mode, (width, 1))
+
+            img = ImageOps.exif_transpose(img)
+            if img.width > width:
+                img.thumbnail((width, img.height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+            has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+            if pil_format == 'JPEG' or not has_alpha:
+                if has_alpha:
+                    # JPEG has no alpha channel; flatten onto white
+                    img = img.convert('RGBA')
+                    background = Image.new('RGB', img.size, (255, 255, 255))
+                    background.paste(img, mask=img.getchannel('A'))
+                    img = background
+                elif img.mode != 'RGB':
+                    img = img.convert('RGB')
+            elif img.mode != 'RGBA':
+                img = img.convert('RGBA')
+
+            output = BytesIO()
+            if pil_format == 'JPEG':
+                img.save(output, 'JPEG', quality=80, optimize=True, progressive=True)
+            else:
+                img.save(output, 'WEBP', quality=80, method=4)
+            return output.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise DerivativeError(f"The asset could not be read as an image: {e}")
+
+
+def get_derivative(s3_service, cache: TemplateCache, source_key: str, width: int, image_format: str) -> bytes:
+    """
+    Returns the bytes of a derivative, generating and storing it on first use.
+
+    Lookup order: the local LRU, then the derivatives prefix in S3, then
+    the original (which is resized and written back to both caches).
+
+    Raises:
+        S3NotFoundError: If the source asset does not exist.
+        DerivativeError: If the source asset is not a decodable image.
+        S3Error: If S3 cannot be read or written.
+    """
+    key = derivative_key(source_key, width, image_format)
+    blob = cache.get(key)
+    if blob is not None:
+        return blob
+
+    with _generation_locks[hash(key) % len(_generation_locks)]:
+        # Another thread may have generated it while we waited
+        blob = cache.get(key)
+        if blob is not None:
+            return blob
+        try:
+            blob = s3_service.download_file_as_stream(key).getvalue()
+        except S3NotFoundError:
+            original = s3_service.download_file_as_stream(source_key).getvalue()
+            blob = resize_image(original, width, image_format)
+            s3_service.upload_bytes(blob, key, FORMATS[image_format][1])
+        cache.put(key, blob)
+        return blob
+
+
+def extract_template_thumbnail(template_stream):
+    """
+    Returns the JPEG thumbnail PowerPoint embeds in a .pptx (usually
+    docProps/thumbnail.jpeg), or None if there is none. The stream is
+    rewound afterwards.
+    """
+    try:
+        with zipfile.ZipFile(template_stream) as package:
+            names = set(package.namelist())
+            for name in ('docProps/thumbnail.jpeg', 'docProps/thumbnail.jpg'):
+                if name in names:
+                    return package.read(name)
+            return None
+    except (zipfile.BadZipFile, OSError):
+        return None
+    finally:
+        template_stream.seek(0)
+
+
+def store_template_thumbnail(s3_service, template_stream):
+    """
+    Uploads a template's embedded thumbnail under TEMPLATE_THUMBNAILS_PREFIX.
+
+    Thumbnails are a nicety, so failures are logged rather than raised.
+
+    Returns:
+        The thumbnail's S3 key, or None if the template has none.
+    """
+    thumbnail = extract_template_thumbnail(template_stream)
+    if thumbnail is None:
+        return None
+    try:
+        return s3_service.upload_file(BytesIO(thumbnail), 'thumbnail.jpeg', prefix=TEMPLATE_THUMBNAILS_PREFIX)
+    except Exception as e:
+        print(f"Could not store template thumbnail: {e}")
+        return None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_derivative_cache(app) -> TemplateCache:
+    """Returns the process-wide LRU of derivative bytes, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TemplateCache(app.config['DERIVATIVE_CACHE_MAX_BYTES'])
+    return _cache
@@ -1,55 +1,364 @@
 # app/services/image_search_service.py
+"""
+Image search across pluggable providers.
+
+A provider turns a query into a list of results in the format the frontend
+expects ({'id', 'url', 'thumbnail', 'alt', 'provider'}). `search_images`
+sends a query to every enabled provider at once and waits at most the
+search timeout: providers that have not answered by then, or that fail,
+are dropped from the response instead of holding it up. Results are
+interleaved across providers and deduplicated by URL.
+
+Providers are enabled by name in IMAGE_SEARCH_PROVIDERS (see
+`build_providers`); `StubProvider` returns canned results and needs no
+network, for offline development and tests. `search_images_async` is the
+event-loop version used by the ASGI serving mode (see app/asgi_api); HTTP
+providers build their request and parse their response the same way for
+both.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from app.lazy_imports import lazy_module
+
+# Imported on first use; see app/lazy_imports.py
+requests = lazy_module('requests')
+httpx = lazy_module('httpx')
 
-import requests
 
 class ImageSearchError(Exception):
     """Custom exception for image search failures."""
     pass
 
-def search_images(query: str, count: int = 12):
+
+# --- Providers ---
+
+class ImageProvider:
+    """Base class for image search providers."""
+    name = None
+
+    def search(self, query: str, count: int) -> list:
+        """
+        Returns up to `count` results for `query`.
+
+        Raises:
+            ImageSearchError: If the provider cannot be reached or fails.
+        """
+        raise NotImplementedError
+
+    async def search_async(self, client, query: str, count: int) -> list:
+        """
+        `search` for the ASGI serving mode, with `client` an
+        httpx.AsyncClient. Providers that make no HTTP calls run their
+        `search` on a worker thread.
+        """
+        return await asyncio.to_thread(self.search, query, count)
+
+    def _result(self, image_id, url: str, thumbnail: str, alt: str) -> dict:
+        return {"id": image_id, "url": url, "thumbnail": thumbnail or url, "alt": alt, "provider": self.name}
+
+
+class HttpImageProvider(ImageProvider):
+    """
+    A provider backed by one JSON API call. Subclasses describe the call
+    (`_request`) and read its response (`_parse`); the same code then serves
+    the sync requests session and the async httpx client.
     """
-    Searches for images using an external API.
+    def __init__(self, session, timeout: float):
+        self.session = session
+        self.timeout = timeout
+
+    def _request(self, query: str, count: int) -> tuple:
+        """Returns the (url, params, headers) of the API call."""
+        raise NotImplementedError
+
+    def _parse(self, payload, query: str) -> list:
+        """Turns the decoded JSON response into results."""
+        raise NotImplementedError
+
+    def search(self, query: str, count: int) -> list:
+        url, params, headers = self._request(query, count)
+        try:
+            response = self.session.get(url, headers=headers, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise ImageSearchError(f"{self.name} request failed: {e}")
+        return self._parse(payload, query)
+
+    async def search_async(self, client, query: str, count: int) -> list:
+        url, params, headers = self._request(query, count)
+        try:
+            response = await client.get(url, headers=headers, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise ImageSearchError(f"{self.name} request failed: {e}")
+        return self._parse(payload, query)
+
+
+class PexelsProvider(HttpImageProvider):
+    """Stock photos from the Pexels search API."""
+    name = 'pexels'
+    API_URL = "https://api.pexels.com/v1/search"
+
+    def __init__(self, api_key: str, session, timeout: float):
+        super().__init__(session, timeout)
+        self.api_key = api_key
+
+    def _request(self, query: str, count: int) -> tuple:
+        return self.API_URL, {"query": query, "per_page": count}, {"Authorization": self.api_key}
+
+    def _parse(self, payload, query: str) -> list:
+        return [
+            self._result(photo.get('id'), photo.get('src', {}).get('large', ''),
+                         photo.get('src', {}).get('medium'), photo.get('alt') or f"Pexels image for {query}")
+            for photo in payload.get('photos', [])
+        ]
+
+
+class PicsumProvider(HttpImageProvider):
+    """
+    Random photos from picsum.photos. The query is ignored; this stands in
+    for a real search API during development.
+    """
+    name = 'picsum'
+    API_URL = "https://picsum.photos/v2/list"
+
+    def _request(self, query: str, count: int) -> tuple:
+        return self.API_URL, {"page": 1, "limit": count}, None
+
+    def _parse(self, payload, query: str) -> list:
+        return [
+            self._result(item['id'], item['download_url'], f"https://picsum.photos/id/{item['id']}/200/200",
+                         f"Photo by {item.get('author', 'unknown')}")
+            for item in payload
+        ]
+
+
+class AssetLibraryProvider(ImageProvider):
+    """
+    The internal asset library: images stored under a prefix of the S3
+    bucket, matched by words in their key. The object listing is cached
+    for `listing_ttl` seconds; result URLs are pre-signed.
+    """
+    name = 'library'
+    IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+
+    def __init__(self, s3_factory, prefix: str, listing_ttl: float):
+        self.s3_factory = s3_factory
+        self.prefix = prefix
+        self.listing_ttl = listing_ttl
+        self._listing = None
+        self._listed_at = 0.0
+        self._lock = threading.Lock()
+
+    def _keys(self, s3) -> list:
+        with self._lock:
+            if self._listing is None or time.monotonic() - self._listed_at > self.listing_ttl:
+                self._listing = [
+                    obj['Key'] for obj in s3.list_objects(self.prefix)
+                    if obj['Key'].lower().endswith(self.IMAGE_EXTENSIONS)
+                ]
+                self._listed_at = time.monotonic()
+            return self._listing
+
+    def search(self, query: str, count: int) -> list:
+        words = query.lower().split()
+        try:
+            s3 = self.s3_factory()
+            matches = [key for key in self._keys(s3) if all(word in key.lower() for word in words)][:count]
+            results = []
+            for key in matches:
+                url = s3.create_presigned_url_for_download(key)
+                alt = key[len(self.prefix):].rsplit('.', 1)[0].replace('-', ' ').replace('_', ' ')
+                results.append(self._result(key, url, url, alt))
+            return results
+        except Exception as e:
+            raise ImageSearchError(f"Asset library search failed: {e}")
+
+
+class StubProvider(ImageProvider):
+    """Returns canned results (after an optional delay) or raises `error`; needs no network."""
+    def __init__(self, name: str = 'stub', results: list = None, delay: float = 0, error: Exception = None):
+        self.name = name
+        self.results = results
+        self.delay = delay
+        self.error = error
 
-    NOTE: This implementation uses a free placeholder API (picsum.photos) for demonstration.
-    In a real production environment, you would replace this with a robust image search API
-    like Google Custom Search JSON API, Bing Image Search API, or a stock photo service API.
-    These services would require API keys stored securely in your .env file.
+    def search(self, query: str, count: int) -> list:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._canned(query, count)
+
+    async def search_async(self, client, query: str, count: int) -> list:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._canned(query, count)
+
+    def _canned(self, query: str, count: int) -> list:
+        if self.error is not None:
+            raise self.error
+        if self.results is not None:
+            return self.results[:count]
+        return [
+            self._result(f"{self.name}-{i}", f"https://example.com/{self.name}/{query}/{i}.jpg", None,
+                         f"{query} {i}")
+            for i in range(count)
+        ]
+
+
+def build_providers(config, session, s3_factory) -> list:
+    """
+    Creates the providers named in IMAGE_SEARCH_PROVIDERS, in that order.
+    Pexels is skipped when PEXELS_API_KEY is not set.
+    """
+    timeout = config['IMAGE_SEARCH_TIMEOUT_SECONDS']
+    providers = []
+    for name in config['IMAGE_SEARCH_PROVIDERS']:
+        if name == 'pexels':
+            if config.get('PEXELS_API_KEY'):
+                providers.append(PexelsProvider(config['PEXELS_API_KEY'], session, timeout))
+            else:
+                print("PEXELS_API_KEY is not configured; the Pexels image provider is disabled.")
+        elif name == 'picsum':
+            providers.append(PicsumProvider(session, timeout))
+        elif name == 'library':
+            providers.append(AssetLibraryProvider(
+                s3_factory, config['ASSET_LIBRARY_PREFIX'], config['ASSET_LIBRARY_LISTING_TTL_SECONDS']
+            ))
+        elif name == 'stub':
+            providers.append(StubProvider())
+        else:
+            print(f"Unknown image search provider '{name}' ignored.")
+    return providers
+
+
+_providers = None
+_providers_lock = threading.Lock()
+
+def get_image_providers(app) -> list:
+    """Returns the process-wide providers configured for `app`, creating them on first use."""
+    global _providers
+    if _providers is None:
+        with _providers_lock:
+            if _providers is None:
+                from app import get_s3
+                from app.services.remote_images import get_http_session
+
+                def s3_factory():
+                    # Providers run on the search pool, outside any request
+                    with app.app_context():
+                        return get_s3()
+
+                _providers = build_providers(
+                    app.config, get_http_session(app.config['REMOTE_IMAGE_CONCURRENCY']), s3_factory
+                )
+    return _providers
+
+
+# --- Fan-out ---
+
+# Shared across requests and never joined per request, so a provider that
+# overruns the timeout finishes in the background without holding anyone up
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-search')
+    return _executor
+
+
+def _dedupe_key(url: str) -> str:
+    # The same photo is often offered with different sizing parameters
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}".lower()
+
+
+def merge_results(result_lists: list, count: int) -> list:
+    """Interleaves the providers' result lists (in order) and drops repeated URLs."""
+    merged, seen = [], set()
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results) or not results[rank].get('url'):
+                continue
+            key = _dedupe_key(results[rank]['url'])
+            if key not in seen:
+                seen.add(key)
+                merged.append(results[rank])
+                if len(merged) == count:
+                    return merged
+    return merged
+
+
+def search_images(providers: list, query: str, count: int, timeout: float, max_workers: int = 16) -> tuple:
+    """
+    Searches every provider concurrently.
 
     Args:
-        query (str): The search term. For this placeholder service, the query is ignored.
-        count (int): The number of images to return.
+        providers: The providers to query, in merge order.
+        query: The search term.
+        count: Maximum number of merged results.
+        timeout: Seconds to wait for providers; later answers are dropped.
+        max_workers: Size of the shared search thread pool.
 
     Returns:
-        list: A list of dictionaries, where each dictionary contains image URLs.
-              Example: [{'thumbnail': '...', 'original': '...'}]
+        A (results, statuses) tuple: the merged results and, per provider
+        name, 'ok', 'error' or 'timeout'.
 
     Raises:
-        ImageSearchError: If the API request fails.
-    """
-    try:
-        # Using picsum.photos to get a list of random images as a placeholder
-        # The 'page' and 'limit' parameters help get different sets of images
-        api_url = f"https://picsum.photos/v2/list?page=1&limit={count}"
-        
-        response = requests.get(api_url, timeout=10)
-        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-        
-        results = response.json()
-        
-        # Format the results to match what our frontend will expect
-        formatted_results = [
-            {
-                "thumbnail": f"https://picsum.photos/id/{item['id']}/200/200", # Smaller thumbnail
-                "original": item['download_url'] # Full-size image URL
-            }
-            for item in results
-        ]
-        
-        return formatted_results
-
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching images from external API: {e}")
-        raise ImageSearchError("Failed to connect to the image search service.")
-    except Exception as e:
-        print(f"An unexpected error occurred during image search: {e}")
-        raise ImageSearchError("An unexpected error occurred while searching for images.")
\ No newline at end of file
+        ImageSearchError: If no provider returned results in time.
+    """
+    if not providers:
+        raise ImageSearchError("No image search provider is configured.")
+
+    executor = _get_executor(max_workers)
+    futures = [executor.submit(provider.search, query, count) for provider in providers]
+    wait(futures, timeout=timeout)
+    return _merge_outcomes(providers, futures, count)
+
+
+async def search_images_async(providers: list, client, query: str, count: int, timeout: float) -> tuple:
+    """
+    `search_images` on the event loop, for the ASGI serving mode: each
+    provider's `search_async` runs as a task and tasks still pending at the
+    timeout are cancelled.
+    """
+    if not providers:
+        raise ImageSearchError("No image search provider is configured.")
+
+    tasks = [asyncio.ensure_future(provider.search_async(client, query, count)) for provider in providers]
+    await asyncio.wait(tasks, timeout=timeout)
+    return _merge_outcomes(providers, tasks, count)
+
+
+def _merge_outcomes(providers: list, futures: list, count: int) -> tuple:
+    """
+    Reads the providers' futures (concurrent or asyncio) once the wait is
+    over, cancelling unfinished ones, and merges the results.
+
+    Raises:
+        ImageSearchError: If no provider returned results in time.
+    """
+    result_lists, statuses = [], {}
+    for provider, future in zip(providers, futures):
+        if not future.done():
+            future.cancel()
+            statuses[provider.name] = 'timeout'
+        elif future.exception() is not None:
+            print(f"Image provider '{provider.name}' failed: {future.exception()}")
+            statuses[provider.name] = 'error'
+        else:
+            statuses[provider.name] = 'ok'
+            result_lists.append(future.result())
+
+    if not result_lists:
+        raise ImageSearchError("Failed to fetch images from the image providers.")
+    return merge_results(result_lists, count), statuses
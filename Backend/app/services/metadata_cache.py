@@ -0,0 +1,204 @@
+"""
+In-process cache of template metadata rows (name, s3_key, placeholders, ...).
+
+Rows change rarely, so each worker keeps them in memory and a background
+listener drops entries when Postgres announces a change on the
+`template_changes` channel (see the trigger in database/db_setup.py). While
+the listener is not connected the cache is bypassed, so a worker never
+serves rows it could have missed an invalidation for.
+"""
+import os
+import select
+import threading
+import time
+from flask import current_app
+
+from app import get_db
+from app.lazy_imports import lazy_module
+
+# Imported on first use; see app/lazy_imports.py
+psycopg2 = lazy_module('psycopg2')
+
+NOTIFY_CHANNEL = 'template_changes'
+
+# Columns cached for every active (not trashed) template. render_peak_bytes
+# changes are not announced, so a cached value is only a starting estimate
+_COLUMNS = ('id', 'name', 's3_key', 'placeholders', 'created_at', 'description', 'thumbnail_key',
+            'render_peak_bytes')
+_SELECT_ACTIVE = f"SELECT {', '.join(_COLUMNS)} FROM templates WHERE deleted_at IS NULL"
+
+# How long the listener waits for notifications before checking that its
+# connection is still alive, and how long it backs off after a failure
+_LISTEN_POLL_SECONDS = 30
+_RECONNECT_DELAY_SECONDS = 5
+
+
+class TemplateMetadataCache:
+    """
+    Caches active template rows by id, plus the full listing.
+
+    Every invalidation bumps a version counter; a row loaded from the
+    database is only stored if no invalidation happened while it was being
+    read, so a concurrent update can never leave a stale row behind.
+    """
+    def __init__(self, db_url: str, max_entries: int):
+        self.db_url = db_url
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._listing = None
+        self._version = 0
+        self._listener = None
+        self.listening = False
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # --- Invalidation ---
+
+    def invalidate(self, template_id: int = None):
+        """Drops one template (and the listing), or everything if no id is given."""
+        with self._lock:
+            self._version += 1
+            self._listing = None
+            if template_id is None:
+                self._rows.clear()
+            else:
+                self._rows.pop(template_id, None)
+            self.invalidations += 1
+
+    def start_listener(self):
+        """Starts the LISTEN thread for this process if it is not running."""
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen_forever, name='template-metadata-listener', daemon=True)
+            self._listener.start()
+
+    def _listen_forever(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.db_url)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {NOTIFY_CHANNEL};")
+                # Changes made before LISTEN took effect were never announced
+                self.invalidate()
+                self.listening = True
+                self._drain(conn)
+            except Exception as e:
+                print(f"Template metadata listener error, cache bypassed until reconnected: {e}")
+            finally:
+                self.listening = False
+                self.invalidate()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            time.sleep(_RECONNECT_DELAY_SECONDS)
+
+    def _drain(self, conn):
+        """Applies notifications until the connection fails."""
+        while True:
+            readable, _, _ = select.select([conn], [], [], _LISTEN_POLL_SECONDS)
+            if not readable:
+                # A silently dropped connection would otherwise never wake us
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1;")
+                continue
+            conn.poll()
+            while conn.notifies:
+                payload = conn.notifies.pop(0).payload
+                self.invalidate(int(payload) if payload.isdigit() else None)
+
+    # --- Reads ---
+
+    def _query(self, sql: str, params=None) -> list:
+        with get_db().cursor() as cur:
+            cur.execute(sql, params)
+            return [dict(zip(_COLUMNS, row)) for row in cur.fetchall()]
+
+    def get_many(self, template_ids) -> dict:
+        """Returns {id: row} for the active templates among `template_ids`."""
+        template_ids = list(dict.fromkeys(template_ids))
+        if not self.listening:
+            return {row['id']: row for row in self._query(_SELECT_ACTIVE + " AND id = ANY(%s);", (template_ids,))}
+
+        with self._lock:
+            found = {tid: self._rows[tid] for tid in template_ids if tid in self._rows}
+            version = self._version
+        missing = [tid for tid in template_ids if tid not in found]
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            rows = self._query(_SELECT_ACTIVE + " AND id = ANY(%s);", (missing,))
+            with self._lock:
+                if self._version == version:
+                    if len(self._rows) + len(rows) > self.max_entries:
+                        self._rows.clear()
+                    self._rows.update((row['id'], row) for row in rows)
+            found.update((row['id'], row) for row in rows)
+        return found
+
+    def get(self, template_id: int):
+        """Returns the row of an active template, or None."""
+        return self.get_many([template_id]).get(template_id)
+
+    def listing(self) -> list:
+        """Returns every active template row, newest first."""
+        if self.listening:
+            with self._lock:
+                if self._listing is not None:
+                    self.hits += 1
+                    return self._listing
+                version = self._version
+        self.misses += 1
+        rows = self._query(_SELECT_ACTIVE + " ORDER BY created_at DESC;")
+        if self.listening:
+            with self._lock:
+                if self._version == version:
+                    self._listing = rows
+        return rows
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "listening": self.listening,
+                "entries": len(self._rows),
+                "listing_cached": self._listing is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_metadata_cache(app=None) -> TemplateMetadataCache:
+    """
+    Returns the process-wide metadata cache, starting its listener on first
+    use. With TEMPLATE_METADATA_CACHE_ENABLED off the listener is never
+    started, so every read goes to the database.
+    """
+    global _cache
+    app = app or current_app
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TemplateMetadataCache(
+                    db_url=app.config.get('DATABASE_URL') or os.environ.get('DATABASE_URL'),
+                    max_entries=app.config['TEMPLATE_METADATA_CACHE_MAX_ENTRIES'],
+                )
+    if app.config['TEMPLATE_METADATA_CACHE_ENABLED']:
+        _cache.start_listener()
+    return _cache
+
+
+def reset_metadata_cache():
+    """Forgets the process-wide cache; its listener thread does not survive a fork."""
+    global _cache
+    with _cache_lock:
+        _cache = None
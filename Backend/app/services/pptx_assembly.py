@@ -0,0 +1,196 @@
+"""
+Assembles several rendered presentations into a single deck.
+
+Sections made from the same template family carry byte-identical masters,
+layouts, themes and media. Parts are imported through a content-hash index,
+so an identical part already present in the target deck is reused instead of
+being copied once per section.
+"""
+import hashlib
+from pptx.opc.constants import CONTENT_TYPE as CT
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.oxml.ns import qn
+from app.services import pptx_xml
+
+# Parts that are safe to share between sections when their content matches
+_SHARED_CONTENT_TYPES = {CT.PML_SLIDE_MASTER, CT.PML_SLIDE_LAYOUT, CT.OFC_THEME, CT.X_FONTDATA, CT.X_FONT_TTF}
+_SHARED_MEDIA_PREFIXES = ('image/', 'video/', 'audio/')
+
+# Slide and master IDs live in this range (ECMA-376 ST_SlideMasterId)
+_MIN_MASTER_ID = 2147483648
+
+
+def _is_shared(part) -> bool:
+    content_type = part.content_type
+    return content_type in _SHARED_CONTENT_TYPES or content_type.startswith(_SHARED_MEDIA_PREFIXES)
+
+
+class _PartImporter:
+    """
+    Copies parts from other packages into `target`'s package, reusing
+    shareable parts whose content hash matches one that is already there.
+    """
+    def __init__(self, target):
+        self.target = target
+        self.package = target.part.package
+        # Source part -> part in the target package
+        self._imported = {}
+        # Content digest -> shareable part in the target package
+        self._by_digest = {}
+        self._digests = {}
+        self._partnames = set()
+
+        for part in self.package.iter_parts():
+            self._partnames.add(str(part.partname))
+            if _is_shared(part):
+                self._by_digest.setdefault(self.digest(part), part)
+
+    def digest(self, part) -> str:
+        """
+        Returns a hash of `part`'s content and of everything it relates to.
+
+        A master's layouts are hashed by their XML only, while a layout
+        hashes its master in full, which breaks the master/layout cycle and
+        still makes a layout's identity depend on the master it inherits from.
+        """
+        cached = self._digests.get(part)
+        if cached is not None:
+            return cached
+
+        sha = hashlib.sha1(part.blob)
+        for rId, rel in sorted(part.rels.items()):
+            sha.update(f'|{rId}|{rel.reltype}|'.encode())
+            if rel.is_external:
+                sha.update(rel.target_ref.encode())
+            elif rel.reltype == RT.SLIDE_LAYOUT:
+                sha.update(hashlib.sha1(rel.target_part.blob).digest())
+            else:
+                sha.update(self.digest(rel.target_part).encode())
+
+        digest = self._digests[part] = sha.hexdigest()
+        return digest
+
+    def _next_partname(self, partname) -> PackURI:
+        # Package.next_partname() only sees parts reachable from the root,
+        # which misses parts created earlier in the same import
+        template = pptx_xml.partname_template(partname)
+        index = 1
+        while template % index in self._partnames:
+            index += 1
+        name = template % index
+        self._partnames.add(name)
+        return PackURI(name)
+
+    def import_part(self, part):
+        """
+        Returns the target-package counterpart of `part`, copying it (and
+        whatever it relates to) unless an identical shareable part exists.
+        """
+        existing = self._imported.get(part)
+        if existing is not None:
+            return existing
+
+        shared = _is_shared(part)
+        if shared:
+            digest = self.digest(part)
+            existing = self._by_digest.get(digest)
+            if existing is not None:
+                self._imported[part] = existing
+                return existing
+
+        new_part = type(part).load(self._next_partname(part.partname), part.content_type,
+                                   self.package, part.blob)
+        # Registered before recursing so the master/layout cycle resolves
+        self._imported[part] = new_part
+        if shared:
+            self._by_digest[digest] = new_part
+        if part.content_type == CT.PML_SLIDE_MASTER:
+            self._register_master(new_part)
+
+        rid_map = {}
+        for rId, rel in part.rels.items():
+            if rel.is_external:
+                rid_map[rId] = new_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            else:
+                rid_map[rId] = new_part.relate_to(self.import_part(rel.target_part), rel.reltype)
+
+        element = getattr(new_part, '_element', None)
+        if element is not None:
+            pptx_xml.remap_relationship_ids(element, rid_map)
+        return new_part
+
+    def _register_master(self, master_part):
+        """Adds a newly imported master to the presentation with fresh, unique IDs."""
+        prs_element = self.target.part._element
+        master_id_list = prs_element.get_or_add_sldMasterIdLst()
+
+        used_ids = [int(entry.get('id', 0)) for entry in master_id_list]
+        for rel in self.target.part.rels.values():
+            if rel.reltype == RT.SLIDE_MASTER:
+                used_ids.extend(int(entry.get('id', 0)) for entry in rel.target_part._element.iter(qn('p:sldLayoutId')))
+        next_id = max([_MIN_MASTER_ID - 1] + used_ids) + 1
+
+        rId = self.target.part.relate_to(master_part, RT.SLIDE_MASTER)
+        entry = master_id_list.makeelement(qn('p:sldMasterId'), {'id': str(next_id), qn('r:id'): rId})
+        master_id_list.append(entry)
+
+        # Layout IDs share the ID space with masters
+        for offset, layout_entry in enumerate(master_part._element.iter(qn('p:sldLayoutId')), start=1):
+            layout_entry.set('id', str(next_id + offset))
+
+
+def append_presentation(target, source, importer: _PartImporter = None):
+    """
+    Appends every slide of `source` to the end of `target`.
+
+    Slide XML is copied, related parts go through the content-hash importer,
+    and links between slides of `source` are pointed at their copies. Speaker
+    notes are not carried over, and the target's slide size is kept.
+    """
+    importer = importer or _PartImporter(target)
+    slide_id_list = target.part._element.get_or_add_sldIdLst()
+
+    # 1. Create all slides first, so links to later slides can be resolved
+    source_slides = []
+    slide_map = {}
+    for entry in source.part._element.get_or_add_sldIdLst():
+        source_slide = source.part.related_part(entry.rId).slide
+        layout_part = importer.import_part(source_slide.part.part_related_by(RT.SLIDE_LAYOUT))
+        rId, new_slide = target.part.add_slide(layout_part.slide_layout)
+        slide_id_list.add_sldId(rId)
+        source_slides.append((source_slide, new_slide))
+        slide_map[source_slide.part] = new_slide.part
+
+    # 2. Re-create each slide's relationships and copy its content
+    for source_slide, new_slide in source_slides:
+        rid_map = {}
+        for rId, rel in source_slide.part.rels.items():
+            if rel.reltype in (RT.SLIDE_LAYOUT, RT.NOTES_SLIDE):
+                continue
+            if rel.is_external:
+                new_rId = new_slide.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            elif rel.reltype == RT.SLIDE:
+                linked = slide_map.get(rel.target_part, new_slide.part)
+                new_rId = new_slide.part.relate_to(linked, rel.reltype)
+            else:
+                new_rId = new_slide.part.relate_to(importer.import_part(rel.target_part), rel.reltype)
+            rid_map[rId] = new_rId
+        pptx_xml.copy_slide_content(new_slide, source_slide, rid_map)
+
+
+def assemble_presentations(presentations: list):
+    """
+    Joins `presentations` in order into the first one and returns it.
+
+    Raises:
+        ValueError: If `presentations` is empty.
+    """
+    if not presentations:
+        raise ValueError("At least one presentation is required.")
+
+    target = presentations[0]
+    importer = _PartImporter(target)
+    for source in presentations[1:]:
+        append_presentation(target, source, importer)
+    return target
@@ -0,0 +1,170 @@
+"""
+Template compaction: drops what a template carries but never renders.
+
+Uploaded templates often ship dozens of unused slide layouts (each with its
+own images), relationships to media nothing references any more, and
+camera-resolution photos. All of it is paid for on every download and every
+parse in /api/generate. Compaction removes unused layouts and masters and
+unreferenced media relationships (python-pptx only saves parts that are
+still reachable, so the parts themselves disappear on save), and
+re-encodes oversized JPEG/PNG media.
+"""
+from io import BytesIO
+
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+
+from app.lazy_imports import lazy_module
+from app.services.pptx_xml import referenced_relationship_ids
+
+# Imported on first use; see app/lazy_imports.py
+Image = lazy_module('PIL.Image')
+
+# Relationships that only exist to be referenced from the part's XML; one
+# whose rId appears nowhere in the XML is dead weight
+_MEDIA_RELTYPES = {
+    RT.IMAGE, RT.MEDIA, RT.VIDEO, RT.AUDIO,
+    'http://schemas.microsoft.com/office/2007/relationships/hdphoto',
+    'http://schemas.microsoft.com/office/2007/relationships/media',
+}
+
+# Formats that are re-encoded in the same format, so partnames and content
+# types stay valid
+_RECOMPRESSIBLE = {'image/jpeg': 'JPEG', 'image/png': 'PNG'}
+
+
+def remove_unused_layouts(prs) -> tuple:
+    """
+    Removes the slide layouts no slide is based on, and the masters left
+    with no used layout. At least one master with one layout is kept.
+
+    Returns:
+        A (layouts_removed, masters_removed) tuple.
+    """
+    used_layouts = {slide.part.slide_layout.part for slide in prs.slides}
+    master_id_list = prs.part._element.find(qn('p:sldMasterIdLst'))
+    master_entries = list(master_id_list) if master_id_list is not None else []
+
+    masters = []
+    for master_entry in master_entries:
+        master_part = prs.part.related_part(master_entry.get(qn('r:id')))
+        layout_id_list = master_part._element.find(qn('p:sldLayoutIdLst'))
+        layout_entries = list(layout_id_list) if layout_id_list is not None else []
+        used = [entry for entry in layout_entries
+                if master_part.related_part(entry.get(qn('r:id'))) in used_layouts]
+        masters.append((master_entry, master_part, layout_id_list, layout_entries, used))
+
+    # A deck with no slides uses no master; keep the first one with its
+    # first layout so the file stays valid
+    fallback = master_entries[0] if master_entries and not used_layouts else None
+
+    layouts_removed = masters_removed = 0
+    for master_entry, master_part, layout_id_list, layout_entries, used in masters:
+        if not used and master_entry is not fallback:
+            # Dropping the relationship drops the master, its layouts and
+            # its theme from the saved package
+            master_id_list.remove(master_entry)
+            prs.part.rels.pop(master_entry.get(qn('r:id')))
+            masters_removed += 1
+            layouts_removed += len(layout_entries)
+            continue
+        keep = used or layout_entries[:1]
+        for entry in layout_entries:
+            if entry not in keep:
+                layout_id_list.remove(entry)
+                master_part.rels.pop(entry.get(qn('r:id')))
+                layouts_removed += 1
+    return layouts_removed, masters_removed
+
+
+def remove_unreferenced_media(package) -> int:
+    """
+    Drops media relationships whose rId is not referenced from the owning
+    part's XML. Returns the number of relationships removed.
+    """
+    removed = 0
+    for part in list(package.iter_parts()):
+        element = getattr(part, '_element', None)
+        if element is None:
+            continue
+        referenced = None
+        for rid, rel in list(part.rels.items()):
+            if rel.reltype not in _MEDIA_RELTYPES:
+                continue
+            if referenced is None:
+                referenced = referenced_relationship_ids(element)
+            if rid not in referenced:
+                part.rels.pop(rid)
+                removed += 1
+    return removed
+
+
+def recompress_image(blob: bytes, content_type: str, max_dimension: int, jpeg_quality: int):
+    """
+    Downscales an image to `max_dimension` on its longer side and re-encodes
+    it in its own format. Returns the new bytes, or None if the image could
+    not be read.
+    """
+    try:
+        with Image.open(BytesIO(blob)) as img:
+            if getattr(img, 'is_animated', False):
+                return None
+            info = img.info
+            if max(img.size) > max_dimension:
+                img.draft(img.mode, (max_dimension, max_dimension))
+                img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            output = BytesIO()
+            pil_format = _RECOMPRESSIBLE[content_type]
+            extra = {key: info[key] for key in ('icc_profile', 'exif', 'dpi') if key in info}
+            if pil_format == 'JPEG':
+                img.save(output, 'JPEG', quality=jpeg_quality, optimize=True, **extra)
+            else:
+                img.save(output, 'PNG', optimize=True, **extra)
+            return output.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def recompress_media(package, min_bytes: int, max_dimension: int, jpeg_quality: int) -> tuple:
+    """
+    Re-encodes JPEG/PNG parts of at least `min_bytes`, keeping a result only
+    if it is smaller.
+
+    Returns:
+        A (parts_recompressed, bytes_saved) tuple.
+    """
+    recompressed = saved = 0
+    for part in package.iter_parts():
+        if part.content_type not in _RECOMPRESSIBLE or len(part.blob) < min_bytes:
+            continue
+        blob = recompress_image(part.blob, part.content_type, max_dimension, jpeg_quality)
+        if blob is not None and len(blob) < len(part.blob):
+            saved += len(part.blob) - len(blob)
+            recompressed += 1
+            part._blob = blob
+    return recompressed, saved
+
+
+def compact_presentation(prs, media_min_bytes: int, media_max_dimension: int, jpeg_quality: int) -> dict:
+    """
+    Compacts `prs` in place. Slides and their content are never changed.
+
+    Returns:
+        A report dict with the number of layouts, masters, media
+        relationships and parts removed, and of media parts recompressed.
+    """
+    package = prs.part.package
+    parts_before = sum(1 for _ in package.iter_parts())
+    layouts_removed, masters_removed = remove_unused_layouts(prs)
+    media_rels_removed = remove_unreferenced_media(package)
+    media_recompressed, media_bytes_saved = recompress_media(
+        package, media_min_bytes, media_max_dimension, jpeg_quality
+    )
+    return {
+        "layouts_removed": layouts_removed,
+        "masters_removed": masters_removed,
+        "media_relationships_removed": media_rels_removed,
+        "parts_removed": parts_before - sum(1 for _ in package.iter_parts()),
+        "media_recompressed": media_recompressed,
+        "media_bytes_saved": media_bytes_saved,
+    }
@@ -0,0 +1,176 @@
+"""
+Run normalization for template text.
+
+PowerPoint freely splits text into runs with identical formatting (after
+spell-checking, undo, or editing in the middle of a word), so a tag such as
+{{client}} often ends up spread over several <a:r> elements. Generation
+replaces tags run by run, which only works when each tag sits in one run.
+
+`normalize_presentation` runs at save time: it merges adjacent runs whose
+formatting is the same, then moves every tag that still spans runs into
+the run holding its first character. `coalesce_split_tags` is also used
+at render time to repair templates saved before normalization existed.
+"""
+import re
+from copy import deepcopy
+
+from lxml import etree
+from pptx.oxml.ns import qn
+
+# Any {{...}} tag, typed or not
+TAG_PATTERN = re.compile(r'\{\{(?:\w+:)?\w+\}\}')
+
+# Run properties that only carry editor state (spell-check and "needs
+# re-layout" flags), so runs differing only in these look identical
+_IGNORED_RPR_ATTRIBUTES = ('dirty', 'err', 'noProof', 'smtClean', 'smtId')
+
+_R = qn('a:r')
+_RPR = qn('a:rPr')
+_T = qn('a:t')
+
+
+def _run_groups(p_element) -> list:
+    """
+    Splits the runs of a paragraph into groups of directly adjacent runs;
+    line breaks and fields end a group.
+    """
+    groups, current = [], []
+    for child in p_element:
+        if child.tag == _R:
+            current.append(child)
+        elif current:
+            groups.append(current)
+            current = []
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _run_text(r_element) -> str:
+    t = r_element.find(_T)
+    return (t.text or '') if t is not None else ''
+
+
+def _set_run_text(r_element, text: str):
+    t = r_element.find(_T)
+    if t is None:
+        t = etree.SubElement(r_element, _T)
+    t.text = text
+
+
+def _formatting_key(r_element) -> bytes:
+    """A comparable form of a run's <a:rPr>, ignoring editor-state attributes."""
+    rpr = r_element.find(_RPR)
+    if rpr is None:
+        return b''
+    if any(attr in rpr.attrib for attr in _IGNORED_RPR_ATTRIBUTES):
+        rpr = deepcopy(rpr)
+        for attr in _IGNORED_RPR_ATTRIBUTES:
+            rpr.attrib.pop(attr, None)
+    if not len(rpr) and not rpr.attrib:
+        return b''
+    return etree.tostring(rpr, method='c14n')
+
+
+def merge_adjacent_runs(p_element) -> int:
+    """
+    Merges directly adjacent runs with the same formatting into the first
+    of them. Returns the number of runs removed.
+    """
+    merged = 0
+    for group in _run_groups(p_element):
+        keep, keep_key, texts = group[0], _formatting_key(group[0]), [_run_text(group[0])]
+        for r_element in group[1:]:
+            key = _formatting_key(r_element)
+            if key == keep_key:
+                texts.append(_run_text(r_element))
+                p_element.remove(r_element)
+                merged += 1
+                continue
+            if len(texts) > 1:
+                _set_run_text(keep, ''.join(texts))
+            keep, keep_key, texts = r_element, key, [_run_text(r_element)]
+        if len(texts) > 1:
+            _set_run_text(keep, ''.join(texts))
+    return merged
+
+
+def coalesce_split_tags(p_element) -> int:
+    """
+    Moves every tag spanning several runs into the run that holds its first
+    character (so it takes that run's formatting). Runs emptied by the move
+    are removed. Returns the number of tags repaired.
+    """
+    repaired = 0
+    for group in _run_groups(p_element):
+        texts = [_run_text(r_element) for r_element in group]
+        starts, offset = [], 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text)
+        full_text = ''.join(texts)
+        if '{{' not in full_text:
+            continue
+
+        def run_at(position):
+            index = 0
+            while index + 1 < len(starts) and starts[index + 1] <= position:
+                index += 1
+            return index
+
+        emptied, group_repaired = set(), 0
+        # Right to left, so edits never shift the offsets still to be used
+        for match in reversed(list(TAG_PATTERN.finditer(full_text))):
+            first, last = run_at(match.start()), run_at(match.end() - 1)
+            if first == last:
+                continue
+            texts[first] = texts[first][:match.start() - starts[first]] + match.group(0)
+            for index in range(first + 1, last):
+                texts[index] = ''
+                emptied.add(index)
+            texts[last] = texts[last][match.end() - starts[last]:]
+            if not texts[last]:
+                emptied.add(last)
+            group_repaired += 1
+
+        if group_repaired:
+            for index, (r_element, text) in enumerate(zip(group, texts)):
+                if index in emptied and not text:
+                    p_element.remove(r_element)
+                else:
+                    _set_run_text(r_element, text)
+            repaired += group_repaired
+    return repaired
+
+
+def count_split_tags(prs) -> int:
+    """Counts the tags on `prs`'s slides whose text spans more than one run."""
+    split = 0
+    for slide in prs.slides:
+        for p_element in slide._element.iter(qn('a:p')):
+            for group in _run_groups(p_element):
+                if len(group) < 2:
+                    continue
+                texts = [_run_text(r_element) for r_element in group]
+                whole = len(TAG_PATTERN.findall(''.join(texts)))
+                if whole:
+                    split += whole - sum(len(TAG_PATTERN.findall(text)) for text in texts)
+    return split
+
+
+def normalize_presentation(prs) -> dict:
+    """
+    Normalizes the runs of every paragraph on every slide of `prs`, in place.
+
+    Returns:
+        A report dict with the number of runs merged and of tags that were
+        split across runs and have been repaired.
+    """
+    runs_merged = tags_repaired = 0
+    for slide in prs.slides:
+        for p_element in list(slide._element.iter(qn('a:p'))):
+            if len(p_element) < 2:
+                continue
+            runs_merged += merge_adjacent_runs(p_element)
+            tags_repaired += coalesce_split_tags(p_element)
+    return {"runs_merged": runs_merged, "tags_repaired": tags_repaired}
@@ -1,46 +1,36 @@
 import re
+import math
+import itertools
 from io import BytesIO
-from copy import deepcopy
 from pptx import Presentation
 from pptx.enum.text import MSO_AUTO_SIZE
-from pptx.enum.dml import MSO_COLOR_TYPE
 from pptx.util import Inches
+from app.services import pptx_xml
+from app.services import pptx_charts
+from app.services import pptx_assembly
+from app.services import pptx_normalize
+from app.services import text_fit
 
-def _transfer_font_properties(source_font, target_font):
-    """
-    A helper function to manually copy key font properties from one
-    run to another. This is a robust way to preserve styling.
-    """
-    target_font.name = source_font.name
-    target_font.size = source_font.size
-    target_font.bold = source_font.bold
-    target_font.italic = source_font.italic
-    target_font.underline = source_font.underline
-    # Handle all common color types, not just RGB.
-    
-    # Get the color object from the source font
-    source_color = source_font.color
-    
-    # Case 1: RGB Color (e.g., "Red" from standard colors)
-    if source_color.type == MSO_COLOR_TYPE.RGB:
-        target_font.color.rgb = source_color.rgb
-        
-    # Case 2: Theme Color (e.g., "White, Background 1" or "Blue, Accent 1")
-    elif source_color.type == MSO_COLOR_TYPE.SCHEME:
-        target_font.color.theme_color = source_color.theme_color
-        # Also copy brightness adjustments (tint/shade)
-        target_font.color.brightness = source_color.brightness
-        
-    # Case 3: Preset Color (less common, but good to handle)
-    elif source_color.type == MSO_COLOR_TYPE.PRESET:
-        target_font.color.preset_color = source_color.preset_color
+# Regex to find list placeholders specifically
+LIST_PATTERN = re.compile(r'\{\{list:(\w+)\}\}')
+# Regex to find image placeholders specifically
+IMAGE_PATTERN = re.compile(r'\{\{image:(\w+)\}\}')
+# Regex to find the slide repeat directive
+REPEAT_PATTERN = re.compile(r'\{\{repeat:(\w+)\}\}')
+# Regex to find table placeholders, which mark a table's template row
+TABLE_PATTERN = re.compile(r'\{\{table:(\w+)\}\}')
+# Regex for simple text placeholders (including explicitly typed text ones)
+TEXT_PATTERN = re.compile(r'\{\{(?:text:|choice:)?(\w+)\}\}')
 
 def extract_placeholders(file_stream: BytesIO) -> list:
     """
     [cite_start]Parses a .pptx file stream to find unique placeholders[cite: 296].
 
-    This function is used by the /api/upload endpoint to analyze a template
-    [cite_start]without needing to search inside complex elements like tables or charts[cite: 299, 300].
+    This function is used by the /api/upload endpoint to analyze a template.
+    Text shapes and table cells are searched; a table bound with
+    {{table:name}} is reported with the column schema of its header row.
+    Charts bound with {{chart:name}} (in the chart's name, alt text or
+    title) are reported with the names of their current series.
 
     Args:
         [cite_start]file_stream: A file-like object representing the .pptx file[cite: 296].
@@ -48,29 +38,54 @@ def extract_placeholders(file_stream: BytesIO) -> list:
     Returns:
         A list of unique dictionaries, where each dictionary represents a
         [cite_start]placeholder with its "name" and "type"[cite: 305, 306].
-        Example: [{"name": "client", "type": "text"}, {"name": "logo", "type": "image"}]
+        Example: [{"name": "client", "type": "text"}, {"name": "logo", "type": "image"},
+                  {"name": "sales", "type": "table", "columns": ["Region", "Q1", "Q2"]},
+                  {"name": "trend", "type": "chart", "series": ["Revenue", "Cost"]}]
     """
     # [cite_start]Regex to find placeholders in two formats: {{name}} and {{type:name}}[cite: 302].
     pattern = re.compile(r'\{\{(?:(\w+):)?(\w+)\}\}')
     
     # [cite_start]Use a set to store unique (name, type) tuples to handle duplicates[cite: 307].
     found_placeholders = set()
+    # Column schemas of bound tables, keyed by table name
+    table_schemas = {}
+    # Series names of bound charts, keyed by chart name
+    chart_series = {}
+
+    def collect(text_frame):
+        for paragraph in text_frame.paragraphs:
+            # Find all matches in the paragraph's text
+            matches = pattern.findall(paragraph.text)
+            for ph_type, ph_name in matches:
+                # [cite_start]Default to "text" if the type is not specified[cite: 304].
+                final_type = ph_type if ph_type else "text"
+                found_placeholders.add((ph_name, final_type))
 
     try:
         prs = Presentation(file_stream)
         
         for slide in prs.slides:
             for shape in slide.shapes:
+                if shape.has_table:
+                    found = find_table_template_row(shape.table)
+                    if found is not None:
+                        row_idx, name = found
+                        table_schemas[name] = table_columns(shape.table, row_idx)
+                    for cell in shape.table.iter_cells():
+                        collect(cell.text_frame)
+                    continue
+
+                if shape.has_chart:
+                    name = pptx_charts.chart_placeholder_name(shape)
+                    if name:
+                        found_placeholders.add((name, "chart"))
+                        chart_series[name] = pptx_charts.chart_series_names(shape.chart)
+                    continue
+
                 if not shape.has_text_frame:
                     continue
                 
-                for paragraph in shape.text_frame.paragraphs:
-                    # Find all matches in the paragraph's text
-                    matches = pattern.findall(paragraph.text)
-                    for ph_type, ph_name in matches:
-                        # [cite_start]Default to "text" if the type is not specified[cite: 304].
-                        final_type = ph_type if ph_type else "text"
-                        found_placeholders.add((ph_name, final_type))
+                collect(shape.text_frame)
 
     except Exception as e:
         print(f"Error extracting placeholders: {e}")
@@ -78,27 +93,367 @@ def extract_placeholders(file_stream: BytesIO) -> list:
         raise ValueError("Could not process the presentation file.")
 
     # Convert the set of tuples to a sorted list of dictionaries for consistent output.
-    return sorted(
-        [{"name": name, "type": type_} for name, type_ in found_placeholders],
-        key=lambda x: x['name']
-    )
+    placeholders = []
+    for name, type_ in found_placeholders:
+        placeholder = {"name": name, "type": type_}
+        if type_ == "table":
+            placeholder["columns"] = table_schemas.get(name, [])
+        elif type_ == "chart":
+            placeholder["series"] = chart_series.get(name, [])
+        placeholders.append(placeholder)
+    return sorted(placeholders, key=lambda x: x['name'])
     
-def generate_presentation(template_stream: BytesIO, data: dict, s3_service) -> BytesIO:
+def valid_list_items(items) -> list:
+    """Returns the non-empty items of a list placeholder value as strings."""
+    if not items or not isinstance(items, list):
+        return []
+    return [str(item) for item in items if str(item).strip()]
+
+def _render_list_items(paragraph, items: list):
+    """
+    Replaces the list placeholder `paragraph` with one paragraph per item.
+
+    Works at the XML level: a single-run prototype is built once from the
+    placeholder paragraph (keeping its <a:pPr> and copying the first run's
+    <a:rPr> wholesale), then deep-copied per item and spliced into the text
+    body in one operation. This keeps rendering linear and cheap even for
+    lists with thousands of items.
+    """
+    p_element = paragraph._p
+    prototype = pptx_xml.build_paragraph_prototype(p_element)
+    new_paragraphs = pptx_xml.fill_paragraph_prototype(prototype, items)
+
+    parent = p_element.getparent()
+    index = parent.index(p_element)
+    parent[index:index + 1] = new_paragraphs
+
+def _list_placeholder_names(slide) -> list:
+    """Returns the list placeholder rendered for each shape on `slide`."""
+    names = []
+    for shape in slide.shapes:
+        if not shape.has_text_frame:
+            continue
+        # Only the first list placeholder in a shape is rendered
+        match = LIST_PATTERN.search(shape.text_frame.text)
+        if match:
+            names.append(match.group(1))
+    return names
+
+def _find_repeat_marker(slide):
+    """Returns (shape, list name) for the first {{repeat:...}} marker on `slide`, or None."""
+    for shape in slide.shapes:
+        if not shape.has_text_frame:
+            continue
+        match = REPEAT_PATTERN.search(shape.text_frame.text)
+        if match:
+            return shape, match.group(1)
+    return None
+
+def _strip_repeat_marker(shape):
+    """Removes the repeat marker text, and the whole shape if nothing else is left in it."""
+    for para in shape.text_frame.paragraphs:
+        for run in para.runs:
+            if '{{repeat:' in run.text:
+                run.text = REPEAT_PATTERN.sub('', run.text)
+    if not shape.text_frame.text.strip():
+        sp_element = shape.element
+        sp_element.getparent().remove(sp_element)
+
+def row_context(data: dict, row) -> dict:
+    """
+    Builds the substitution data for one repeated slide. Keys of a dict row
+    override the top-level data; any other value is exposed as 'item'.
+    """
+    context = dict(data)
+    if isinstance(row, dict):
+        context.update(row)
+    else:
+        context['item'] = row
+    return context
+
+def repeat_row_fields(data: dict, repeat_names) -> set:
+    """
+    Returns every key supplied by the rows of the repeat lists named in
+    `repeat_names` (the template's {{repeat:name}} markers), i.e.
+    placeholders that are filled per repeated slide rather than from the
+    top-level data. A row that is not a dict supplies 'item' (see
+    `row_context`). Other lists in `data`, such as table rows, are ignored.
+    """
+    fields = set()
+    for name in repeat_names:
+        rows = data.get(name)
+        if isinstance(rows, list):
+            for row in rows:
+                if isinstance(row, dict):
+                    fields.update(row.keys())
+                else:
+                    fields.add('item')
+    return fields
+
+def _expand_repeated_slides(ppt, data: dict) -> dict:
+    """
+    Expands every slide marked with {{repeat:name}} into one slide per
+    element of data[name]. The marked slide is used for the first row and
+    clones for the rest are inserted directly after it, sharing images and
+    other media with it. A marked slide with no rows is removed.
+
+    Returns:
+        A dict mapping slide parts to the substitution data for that slide.
+    """
+    contexts = {}
+    for slide in list(ppt.slides):
+        found = _find_repeat_marker(slide)
+        if found is None:
+            continue
+        shape, name = found
+        # Strip the marker first so the clones don't carry it
+        _strip_repeat_marker(shape)
+
+        rows = data.get(name)
+        if not isinstance(rows, list) or not rows:
+            pptx_xml.delete_slide(ppt, slide)
+            continue
+
+        contexts[slide.part] = row_context(data, rows[0])
+        anchor = slide
+        for row in rows[1:]:
+            anchor = pptx_xml.duplicate_slide(ppt, slide, insert_after=anchor)
+            contexts[anchor.part] = row_context(data, row)
+    return contexts
+
+def _paginate_list_overflow(ppt, data: dict, contexts: dict, items_per_slide: int) -> dict:
+    """
+    Duplicates every slide whose list placeholders hold more than
+    `items_per_slide` items, once per extra page of items. Continuation
+    slides are inserted directly after the original and inherit its entry
+    in `contexts`.
+
+    Returns:
+        A dict mapping slide parts to the zero-based page of list items that
+        slide should render. Slides not in the dict render page 0.
+    """
+    # A page holds at least one item, whatever the caller passed
+    items_per_slide = max(1, int(items_per_slide))
+    pages = {}
+    for slide in list(ppt.slides):
+        names = _list_placeholder_names(slide)
+        if not names:
+            continue
+
+        slide_data = contexts.get(slide.part, data)
+        page_count = max(
+            math.ceil(len(valid_list_items(slide_data.get(name))) / items_per_slide)
+            for name in names
+        )
+        anchor = slide
+        for page in range(1, page_count):
+            anchor = pptx_xml.duplicate_slide(ppt, slide, insert_after=anchor)
+            pages[anchor.part] = page
+            if slide.part in contexts:
+                contexts[anchor.part] = slide_data
+    return pages
+
+def _replace_in_runs(para, data: dict) -> bool:
+    """
+    Replaces the text placeholders that sit entirely inside one run of
+    `para`, keeping each run's formatting. Returns True if any was replaced.
+    """
+    was_run_replacement_made = False
+    for run in para.runs:
+        if '{{' not in run.text:
+            continue
+        
+        matches = TEXT_PATTERN.findall(run.text)
+        if not matches:
+            continue
+
+        modified_text = run.text
+        for ph_name in matches:
+            replacement_value = str(data.get(ph_name, ""))
+            
+            placeholder_tag_text = f"{{{{text:{ph_name}}}}}"
+            placeholder_tag_choice = f"{{{{choice:{ph_name}}}}}"
+            placeholder_tag_simple = f"{{{{{ph_name}}}}}"
+            
+            modified_text = modified_text.replace(placeholder_tag_text, replacement_value)
+            modified_text = modified_text.replace(placeholder_tag_choice, replacement_value)
+            modified_text = modified_text.replace(placeholder_tag_simple, replacement_value)
+        
+        if modified_text != run.text:
+            run.text = modified_text
+            was_run_replacement_made = True
+    return was_run_replacement_made
+
+def _replace_text_placeholders(text_frame, data: dict) -> bool:
+    """
+    Replaces text placeholders in every paragraph of `text_frame`,
+    preserving run formatting. Returns True if any was replaced.
+    """
+    replaced = False
+    for para in text_frame.paragraphs:
+        # Optimization: Skip paragraphs that don't contain any placeholders
+        if '{{' not in para.text:
+            continue
+
+        # --- Run-by-Run Replacement (Preserves Formatting) ---
+        replaced = _replace_in_runs(para, data) or replaced
+
+        # --- Split-Run Placeholders ---
+        # Templates are normalized at save time (see pptx_normalize.py), so
+        # this only triggers for templates saved before that: move each
+        # split tag into one run, then replace run by run again.
+        if '{{' in para.text and TEXT_PATTERN.search(para.text):
+            if pptx_normalize.coalesce_split_tags(para._p):
+                replaced = _replace_in_runs(para, data) or replaced
+    return replaced
+
+def find_table_template_row(table):
+    """
+    Returns (row index, table name) of the row holding a {{table:name}}
+    marker, or None if the table is not bound to data.
     """
-    Generates a presentation by manually replacing placeholders in a template stream.
+    for row_idx, row in enumerate(table.rows):
+        for cell in row.cells:
+            match = TABLE_PATTERN.search(cell.text)
+            if match:
+                return row_idx, match.group(1)
+    return None
+
+def table_columns(table, template_row_idx: int) -> list:
+    """
+    Returns the column schema of a bound table: the texts of the header row
+    directly above the template row, or column_1..column_n where a header
+    cell is blank or there is no header row.
+    """
+    if template_row_idx > 0:
+        names = [cell.text.strip() for cell in table.rows[template_row_idx - 1].cells]
+    else:
+        names = [''] * len(table.columns)
+    return [name or f"column_{i + 1}" for i, name in enumerate(names)]
+
+def _as_list(values) -> list:
+    # NumPy arrays and pandas Series convert far faster through tolist()
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+def _cell_text(value) -> str:
+    return '' if value is None else str(value)
+
+def normalize_table_rows(value, columns: list) -> list:
+    """
+    Converts table data into a list of rows of cell strings, one per column.
+
+    Accepts a list of rows (each a list, positional, or a dict keyed by
+    column name) or a dict of column arrays keyed by column name.
+    """
+    width = len(columns)
+    if isinstance(value, dict):
+        arrays = [_as_list(value.get(column, [])) for column in columns]
+        return [
+            [_cell_text(cell) for cell in row]
+            for row in itertools.zip_longest(*arrays, fillvalue=None)
+        ]
+
+    if not isinstance(value, list):
+        return []
+
+    rows = []
+    for row in value:
+        if isinstance(row, dict):
+            cells = [row.get(column) for column in columns]
+        else:
+            cells = _as_list(row)[:width]
+            cells += [None] * (width - len(cells))
+        rows.append([_cell_text(cell) for cell in cells])
+    return rows
+
+def _render_table(table, data: dict):
+    """
+    Fills a table from data. A row containing {{table:name}} is the
+    template row: it is cloned at the XML level once per data row, keeping
+    all cell styling. Text placeholders in the remaining cells are replaced
+    as usual.
+    """
+    found = find_table_template_row(table)
+    template_row_idx = found[0] if found is not None else None
+
+    # Replace text placeholders first, while the table still has only its
+    # template rows; rendered data rows never need this pass
+    for row_idx, row in enumerate(table.rows):
+        if row_idx == template_row_idx:
+            continue
+        for cell in row.cells:
+            if '{{' in cell.text:
+                _replace_text_placeholders(cell.text_frame, data)
+
+    if found is None:
+        return
+
+    row_idx, name = found
+    columns = table_columns(table, row_idx)
+    rows = normalize_table_rows(data.get(name), columns) or [[''] * len(columns)]
+
+    tr = table._tbl.tr_lst[row_idx]
+    prototype = pptx_xml.build_row_prototype(tr)
+    parent = tr.getparent()
+    index = parent.index(tr)
+    parent[index:index + 1] = pptx_xml.fill_row_prototype(prototype, rows)
+
+def render_presentation(template_stream: BytesIO, data: dict, s3_service,
+                        list_items_per_slide: int = None, image_blobs: dict = None,
+                        fit_text: dict = None):
+    """
+    Renders a template with `data` and returns the in-memory Presentation.
     This function uses the base python-pptx library for all manipulations.
+
+    Slides marked with {{repeat:name}} are repeated once per row of
+    data[name], with each row's keys available to that slide's placeholders.
+    If `list_items_per_slide` is set, list placeholders with more items than
+    that are split across duplicated continuation slides. Charts bound with
+    {{chart:name}} take their categories and series from data[name].
+    `image_blobs` caches downloaded images by S3 key and may be shared
+    between calls. If `fit_text` options are given (see
+    `text_fit.fit_options`), text frames that received substituted text
+    are shrunk to fit their shapes.
     """
     ppt = Presentation(template_stream)
-    # Regex to find list placeholders specifically
-    list_pattern = re.compile(r'\{\{list:(\w+)\}\}')
-    # Regex to find image placeholders specifically
-    image_pattern = re.compile(r'\{\{image:(\w+)\}\}')
-    # Regex for simple text placeholders (including explicitly typed text ones)
-    text_pattern = re.compile(r'\{\{(?:text:|choice:)?(\w+)\}\}')
+
+    # Per-slide substitution data for slides produced by {{repeat:...}}
+    slide_contexts = _expand_repeated_slides(ppt, data)
+
+    list_pages = {}
+    if list_items_per_slide:
+        list_items_per_slide = max(1, int(list_items_per_slide))
+        list_pages = _paginate_list_overflow(ppt, data, slide_contexts, list_items_per_slide)
+
+    # Downloaded image bytes, so slides duplicated for list overflow
+    # don't download the same image again
+    if image_blobs is None:
+        image_blobs = {}
+    # Theme fonts per slide master, for text fitting
+    theme_fonts = {}
 
     for slide in ppt.slides:
         shapes_to_delete = []
+        list_page = list_pages.get(slide.part, 0)
+        slide_data = slide_contexts.get(slide.part, data)
         for shape in list(slide.shapes): # Use list() to allow safe deletion
+            # --- Table Logic ---
+            if shape.has_table:
+                _render_table(shape.table, slide_data)
+                continue
+
+            # --- Chart Logic ---
+            if shape.has_chart:
+                ph_name = pptx_charts.chart_placeholder_name(shape)
+                if ph_name:
+                    pptx_charts.strip_chart_title_tag(shape.chart)
+                    if ph_name in slide_data:
+                        try:
+                            pptx_charts.replace_chart_data(shape.chart, slide_data[ph_name])
+                        except pptx_charts.ChartDataError as e:
+                            print(f"ERROR: Could not bind chart '{ph_name}'. Details: {e}")
+                continue
+
             if not shape.has_text_frame:
                 continue
             
@@ -106,17 +461,18 @@ def generate_presentation(template_stream: BytesIO, data: dict, s3_service) -> B
             shape_text = shape.text_frame.text
 
             # --- Image Replacement Logic ---
-            if '{{image:' in shape.text_frame.text:
-                match = re.search(r'\{\{image:(\w+)\}\}', shape.text_frame.text)
+            if '{{image:' in shape_text:
+                match = IMAGE_PATTERN.search(shape_text)
                 if match:
                     ph_name = match.group(1)
-                    s3_key = data.get(ph_name)
+                    s3_key = slide_data.get(ph_name)
                     
                     if s3_key:
                         try:
-                            image_stream = s3_service.download_file_as_stream(s3_key)
+                            if s3_key not in image_blobs:
+                                image_blobs[s3_key] = s3_service.download_file_as_stream(s3_key).getvalue()
                             slide.shapes.add_picture(
-                                image_stream, shape.left, shape.top, 
+                                BytesIO(image_blobs[s3_key]), shape.left, shape.top, 
                                 width=shape.width, height=shape.height
                             )
                             shapes_to_delete.append(shape)
@@ -128,168 +484,78 @@ def generate_presentation(template_stream: BytesIO, data: dict, s3_service) -> B
                     continue # Skip other replacements for this shape
 
             # --- List Replacement Logic ---
-            found_list_in_shape = False
-            target_para_idx = -1
-            source_font = None
-            list_ph_name = None
-            target_para_obj = None # Store the paragraph object itself
-
-            # Find the paragraph containing the list placeholder first
-            for para_idx, para in enumerate(shape.text_frame.paragraphs):
-                list_match = list_pattern.search(para.text)
-                if list_match:
-                    if para.runs:
-                        source_font = para.runs[0].font # Store font from the first run
-                    else:
-                        source_font = None
-                    target_para_idx = para_idx
-                    target_para_obj = para # Keep the paragraph object
-                    list_ph_name = list_match.group(1)
-                    break # Found the paragraph, stop searching
-
-            # Process the list if a placeholder paragraph was found
-            if target_para_idx != -1 and list_ph_name is not None and target_para_obj is not None:
-                items = data.get(list_ph_name, []) # Expect data[list_ph_name] to be a list
-                tf = shape.text_frame # Get the text frame
-                
-                # We will re-use the original placeholder paragraph for the first item.
-                # This preserves all paragraph formatting (bullets, indentation, etc.).
-                p = target_para_obj 
-                
-                if items and isinstance(items, list) and any(str(item).strip() for item in items):
-                    # Filter out any empty strings
-                    valid_items = [str(item) for item in items if str(item).strip()]
-                    
-                    # 1. Set the text for the first item (in the existing paragraph)
-                    p.clear() # Clear existing runs (like '{{list:name}}')
-                    run = p.add_run()
-                    run.text = valid_items[0]
-                    if source_font:
-                        _transfer_font_properties(source_font, run.font)
-                    
-                    # 2. Add subsequent items as new paragraphs
-                    for item_text in valid_items[1:]:
-                        # Add a new paragraph element
-                        new_p = tf.add_paragraph()
-
-                       
-                        # Get the <a:pPr> (paragraph properties) element from the original paragraph
-                        pPr_to_copy = p._element.pPr
-
-                        # Only proceed if the original paragraph *has* properties to copy
-                        if pPr_to_copy is not None:
-                            # Get the <a:pPr> element of the new paragraph,
-                            # CREATING IT if it doesn't exist. This is the fix.
-                            new_pPr = new_p._element.get_or_add_pPr()
-                            
-                            # Clear any default properties that might be on the new pPr
-                            new_pPr.clear()
-                            
-                            # Copy all XML attributes (like 'lvl', 'marL', etc.)
-                            new_pPr.attrib.update(pPr_to_copy.attrib)
-                            
-                            # Copy all child elements (like <a:buFont>, <a:buChar>, etc.)
-                            for child in pPr_to_copy:
-                                new_pPr.append(deepcopy(child))
-                        
-                        
-                        # Add the text with the original font style
-                        run = new_p.add_run()
-                        run.text = item_text
-                        if source_font:
-                            _transfer_font_properties(source_font, run.font)
-                            
-                else: # Handle empty list or invalid data type
-                    # Set the original paragraph text to "None"
-                    p.clear()
-                    run = p.add_run()
-                    run.text = "None"
-                    if source_font:
-                        _transfer_font_properties(source_font, run.font)
-
-                # --- Text Frame Properties ---
-                tf.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
-                tf.word_wrap = True
-
-                found_list_in_shape = True # Mark that we handled a list in this shape
-
-            if found_list_in_shape:
-                continue # Skip standard text replacement for this shape
+            if '{{list:' in shape_text:
+                tf = shape.text_frame
+                # Find the paragraph containing the list placeholder
+                for para in tf.paragraphs:
+                    list_match = LIST_PATTERN.search(para.text)
+                    if list_match:
+                        break
+                else:
+                    para = None
 
-            # --- Text Replacement Logic (preserving formatting) ---
-                        # --- Text Replacement Logic (preserving formatting) ---
-            for para in shape.text_frame.paragraphs:
-                # Optimization: Skip paragraphs that don't contain any placeholders
-                if '{{' not in para.text:
-                    continue
+                if para is not None:
+                    items = valid_list_items(slide_data.get(list_match.group(1), []))
+                    if list_items_per_slide:
+                        start = list_page * list_items_per_slide
+                        items = items[start:start + list_items_per_slide]
 
-                # --- Attempt 1: Run-by-Run Replacement (Preserves Formatting) ---
-                was_run_replacement_made = False
-                for run in para.runs:
-                    if '{{' not in run.text:
-                        continue
-                    
-                    matches = text_pattern.findall(run.text)
-                    if not matches:
-                        continue
-
-                    modified_text = run.text
-                    for ph_name in matches:
-                        replacement_value = str(data.get(ph_name, ""))
-                        
-                        placeholder_tag_text = f"{{{{text:{ph_name}}}}}"
-                        placeholder_tag_choice = f"{{{{choice:{ph_name}}}}}"
-                        placeholder_tag_simple = f"{{{{{ph_name}}}}}"
-                        
-                        modified_text = modified_text.replace(placeholder_tag_text, replacement_value)
-                        modified_text = modified_text.replace(placeholder_tag_choice, replacement_value)
-                        modified_text = modified_text.replace(placeholder_tag_simple, replacement_value)
-                    
-                    if modified_text != run.text:
-                        run.text = modified_text
-                        was_run_replacement_made = True
-
-                # --- Attempt 2: Fallback for Split-Run Placeholders ---
-                # If no runs were replaced, but the paragraph *still* has a
-                # placeholder, it must be split across runs.
-                if not was_run_replacement_made and '{{' in para.text:
-                    
-                    # We must use the "whole paragraph" method.
-                    full_text_from_runs = "".join(run.text for run in para.runs)
-                    matches = text_pattern.findall(full_text_from_runs)
+                    if not items:
+                        # Empty list on the first page shows "None"; a continuation
+                        # page where this list has run out is left blank
+                        items = ["None"] if list_page == 0 else [""]
+                    _render_list_items(para, items)
 
-                    if not matches:
-                        continue # Should be rare, but a safe check
+                    # --- Text Frame Properties ---
+                    tf.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
+                    tf.word_wrap = True
+                    # Autofit only applies when PowerPoint opens the file;
+                    # shrinking here keeps other viewers from overflowing
+                    if fit_text:
+                        text_fit.fit_text_frame(shape, fit_text, theme_fonts)
+                    continue # Skip standard text replacement for this shape
+
+            # --- Text Replacement Logic (preserving formatting) ---
+            if _replace_text_placeholders(shape.text_frame, slide_data) and fit_text:
+                text_fit.fit_text_frame(shape, fit_text, theme_fonts)
 
-                    source_font = para.runs[0].font if para.runs else None
-                    modified_full_text = full_text_from_runs
-                    
-                    for ph_name in matches:
-                        replacement_value = str(data.get(ph_name, ""))
-                        
-                        placeholder_tag_text = f"{{{{text:{ph_name}}}}}"
-                        placeholder_tag_choice = f"{{{{choice:{ph_name}}}}}"
-                        placeholder_tag_simple = f"{{{{{ph_name}}}}}"
-                        
-                        modified_full_text = modified_full_text.replace(placeholder_tag_text, replacement_value)
-                        modified_full_text = modified_full_text.replace(placeholder_tag_choice, replacement_value)
-                        modified_full_text = modified_full_text.replace(placeholder_tag_simple, replacement_value)
-                    
-                    para.clear()
-                    new_run = para.add_run()
-                    new_run.text = modified_full_text
-                    
-                    if source_font:
-                        _transfer_font_properties(source_font, new_run.font)
-                        
         # After iterating all shapes, delete the placeholder shapes
         for shape in shapes_to_delete:
             sp_element = shape.element
             sp_element.getparent().remove(sp_element)
 
+    return ppt
+
+def _save_to_stream(ppt) -> BytesIO:
     # Save the final presentation to a new in-memory stream
     output_stream = BytesIO()
     ppt.save(output_stream)
     output_stream.seek(0)
     
     return output_stream
+
+def generate_presentation(template_stream: BytesIO, data: dict, s3_service,
+                          list_items_per_slide: int = None, fit_text: dict = None) -> BytesIO:
+    """
+    Generates a presentation by replacing placeholders in a template stream
+    (see `render_presentation`) and returns it as a .pptx stream.
+    """
+    ppt = render_presentation(template_stream, data, s3_service, list_items_per_slide, fit_text=fit_text)
+    return _save_to_stream(ppt)
+
+def generate_deck(sections: list, s3_service, list_items_per_slide: int = None,
+                  fit_text: dict = None) -> BytesIO:
+    """
+    Renders each (template_stream, data) pair in `sections` and joins the
+    results, in order, into a single .pptx stream.
+
+    Masters, layouts, themes and media that are identical across sections
+    are stored once, so the output grows with the number of slides rather
+    than with the number of sections.
+    """
+    image_blobs = {}
+    presentations = [
+        render_presentation(template_stream, data, s3_service, list_items_per_slide, image_blobs, fit_text)
+        for template_stream, data in sections
+    ]
+    return _save_to_stream(pptx_assembly.assemble_presentations(presentations))
@@ -0,0 +1,260 @@
+"""
+Low-level helpers that work directly on the presentation's XML and package
+parts. python-pptx has no public API for these operations, and going through
+its property layer element-by-element is too slow for bulk rendering.
+"""
+import re
+from copy import deepcopy
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+from pptx.oxml.text import CT_RegularTextRun
+
+# Namespace of relationship-id attributes such as r:embed, r:id and r:link
+_R_NAMESPACE = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+# Relationships that belong to the slide itself rather than its content
+_SLIDE_OWN_RELTYPES = {RT.SLIDE_LAYOUT, RT.NOTES_SLIDE}
+
+# Related parts that are edited per slide (chart data), so a duplicated
+# slide needs its own copy rather than a shared reference
+_COPIED_RELTYPES = {RT.CHART}
+
+
+def escape_text(text: str) -> str:
+    """Escapes control characters that are not allowed in an <a:t> element."""
+    return CT_RegularTextRun._escape_ctrl_chars(text)
+
+
+def remap_relationship_ids(element, rid_map: dict):
+    """Rewrites every r:* attribute under `element` according to `rid_map`."""
+    for node in element.iter():
+        for attr, value in node.attrib.items():
+            if attr.startswith(_R_NAMESPACE) and value in rid_map:
+                node.set(attr, rid_map[value])
+
+
+def referenced_relationship_ids(element) -> set:
+    """Returns every rId referenced by an r:* attribute under `element`."""
+    return {
+        value
+        for node in element.iter()
+        for attr, value in node.attrib.items()
+        if attr.startswith(_R_NAMESPACE)
+    }
+
+
+def partname_template(partname) -> str:
+    """'/ppt/charts/chart3.xml' -> '/ppt/charts/chart%d.xml'"""
+    return re.sub(r'\d*(\.\w+)$', r'%d\1', str(partname))
+
+
+def copy_part(part):
+    """
+    Returns a copy of `part` added to the same package under a fresh
+    partname, together with copies of every part it relates to (e.g. a
+    chart's embedded workbook and style parts).
+    """
+    package = part.package
+    template = partname_template(part.partname)
+    new_part = type(part).load(package.next_partname(template), part.content_type, package, part.blob)
+
+    rid_map = {}
+    for rId, rel in part.rels.items():
+        if rel.is_external:
+            new_rId = new_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        else:
+            new_rId = new_part.relate_to(copy_part(rel.target_part), rel.reltype)
+        rid_map[rId] = new_rId
+
+    element = getattr(new_part, '_element', None)
+    if element is not None:
+        remap_relationship_ids(element, rid_map)
+    return new_part
+
+
+def _slide_id_list(prs):
+    # Accessing `prs.slides` renames every slide part, which makes repeated
+    # lookups quadratic; go to the <p:sldIdLst> element directly instead.
+    return prs.part._element.get_or_add_sldIdLst()
+
+
+def _slide_id_entry(prs, slide):
+    """Returns the <p:sldId> element that references `slide`."""
+    for rId, rel in prs.part.rels.items():
+        if not rel.is_external and rel.target_part is slide.part:
+            matches = _slide_id_list(prs).xpath(f'./p:sldId[@r:id="{rId}"]')
+            if matches:
+                return matches[0]
+    return None
+
+
+def copy_slide_content(target, source, rid_map: dict):
+    """
+    Replaces the content of slide `target` (shape tree, background, color
+    map override, transitions, timing) with a copy of `source`'s, rewriting
+    relationship ids through `rid_map`.
+    """
+    new_sld = target._element
+    # python-pptx caches the slide's <p:spTree> behind `slide.shapes`, so
+    # that element object is kept and refilled rather than replaced
+    sp_tree = new_sld.cSld.spTree
+    for child in list(new_sld):
+        new_sld.remove(child)
+    for child in source._element:
+        new_sld.append(deepcopy(child))
+
+    copied_sp_tree = new_sld.cSld.spTree
+    for child in list(sp_tree):
+        sp_tree.remove(child)
+    sp_tree.extend(list(copied_sp_tree))
+    copied_sp_tree.getparent().replace(copied_sp_tree, sp_tree)
+    remap_relationship_ids(new_sld, rid_map)
+
+
+def duplicate_slide(prs, source, insert_after=None):
+    """
+    Appends a copy of `source` to `prs`, placed immediately after
+    `insert_after` (defaults to `source` itself).
+
+    The slide XML is deep-copied, but related parts (images, media,
+    hyperlinks) are shared with the source by relationship rather than
+    copied, so duplicating a slide costs the same regardless of how much
+    media it carries. Charts are the exception: their data is filled per
+    slide, so each duplicate gets its own chart part. Speaker notes are not
+    carried over.
+
+    Returns:
+        The new slide.
+    """
+    # Bypasses Slides.add_slide(), which would clone the layout placeholders
+    # only for them to be replaced below
+    rId, new_slide = prs.part.add_slide(source.slide_layout)
+    new_entry = _slide_id_list(prs).add_sldId(rId)
+
+    # 1. Re-create the source's relationships on the new slide part
+    rid_map = {}
+    for source_rId, rel in source.part.rels.items():
+        if rel.reltype in _SLIDE_OWN_RELTYPES:
+            continue
+        if rel.is_external:
+            new_rId = new_slide.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        elif rel.reltype in _COPIED_RELTYPES:
+            new_rId = new_slide.part.relate_to(copy_part(rel.target_part), rel.reltype)
+        else:
+            new_rId = new_slide.part.relate_to(rel.target_part, rel.reltype)
+        rid_map[source_rId] = new_rId
+
+    # 2. Replace the new slide's content with a copy of the source's
+    copy_slide_content(new_slide, source, rid_map)
+
+    # 3. Move the new slide from the end of the deck to its position
+    anchor_entry = _slide_id_entry(prs, insert_after if insert_after is not None else source)
+    if anchor_entry is not None:
+        anchor_entry.addnext(new_entry)
+    return new_slide
+
+
+def move_slide_after(prs, slide, anchor):
+    """Reorders `slide` so that it directly follows `anchor` in the deck."""
+    slide_entry = _slide_id_entry(prs, slide)
+    anchor_entry = _slide_id_entry(prs, anchor)
+    if slide_entry is None or anchor_entry is None:
+        return
+    anchor_entry.addnext(slide_entry)
+
+
+def delete_slide(prs, slide):
+    """Removes `slide` from the deck and drops its relationship."""
+    entry = _slide_id_entry(prs, slide)
+    if entry is None:
+        return
+    rId = entry.rId
+    entry.getparent().remove(entry)
+    prs.part.drop_rel(rId)
+
+
+def build_paragraph_prototype(p_element):
+    """
+    Builds a reusable single-run paragraph from `p_element`.
+
+    The prototype keeps the paragraph properties (<a:pPr>: bullets, level,
+    indentation) and the end-of-paragraph run properties, and carries one
+    run whose <a:rPr> is copied wholesale from the first run of the source.
+    Cloning it is a single lxml deepcopy per item.
+
+    Returns:
+        The prototype <a:p> element; use `fill_paragraph_prototype` to
+        produce filled copies of it.
+    """
+    prototype = deepcopy(p_element)
+    first_run_rPr = None
+    for child in list(prototype):
+        if child.tag == qn('a:r') and first_run_rPr is None:
+            first_run_rPr = child.find(qn('a:rPr'))
+        if child.tag in (qn('a:r'), qn('a:br'), qn('a:fld')):
+            prototype.remove(child)
+
+    end_para_rPr = prototype.find(qn('a:endParaRPr'))
+    if first_run_rPr is None and end_para_rPr is not None:
+        # An empty paragraph (e.g. a blank table cell) only carries its
+        # formatting on the end-of-paragraph properties
+        first_run_rPr = deepcopy(end_para_rPr)
+        first_run_rPr.tag = qn('a:rPr')
+
+    run = prototype.makeelement(qn('a:r'), {})
+    if first_run_rPr is not None:
+        run.append(first_run_rPr)
+    text = run.makeelement(qn('a:t'), {})
+    run.append(text)
+
+    # Runs must come after <a:pPr> and before <a:endParaRPr>
+    if end_para_rPr is not None:
+        end_para_rPr.addprevious(run)
+    else:
+        prototype.append(run)
+    return prototype
+
+
+def fill_paragraph_prototype(prototype, texts):
+    """Returns one deep copy of `prototype` per string in `texts`, with the text set."""
+    t_tag = qn('a:t')
+    paragraphs = []
+    for text in texts:
+        paragraph = deepcopy(prototype)
+        next(paragraph.iter(t_tag)).text = escape_text(text)
+        paragraphs.append(paragraph)
+    return paragraphs
+
+
+def build_row_prototype(tr_element):
+    """
+    Builds a reusable table row from the template row `tr_element`.
+
+    Every cell keeps its <a:tcPr> (borders, fill, margins) and is reduced to
+    a single prototype paragraph (see `build_paragraph_prototype`), so each
+    cell holds exactly one <a:t> in document order.
+    """
+    prototype = deepcopy(tr_element)
+    for tc in prototype.iter(qn('a:tc')):
+        tx_body = tc.find(qn('a:txBody'))
+        paragraphs = tx_body.findall(qn('a:p'))
+        cell_paragraph = build_paragraph_prototype(paragraphs[0])
+        for paragraph in paragraphs:
+            tx_body.remove(paragraph)
+        tx_body.append(cell_paragraph)
+    return prototype
+
+
+def fill_row_prototype(prototype, rows):
+    """
+    Returns one deep copy of the row `prototype` per sequence in `rows`,
+    with the cell texts set positionally.
+    """
+    t_tag = qn('a:t')
+    new_rows = []
+    for values in rows:
+        tr = deepcopy(prototype)
+        for t, value in zip(tr.iter(t_tag), values):
+            t.text = escape_text(value)
+        new_rows.append(tr)
+    return new_rows
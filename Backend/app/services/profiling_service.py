@@ -0,0 +1,419 @@
+import os
+import sys
+import json
+import hmac
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from io import StringIO
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from flask import g, request, current_app
+
+# Header or query flag that asks for the current request to be profiled.
+# The value selects the profiler: 'cprofile' (deterministic) or 'sample'.
+PROFILE_HEADER = 'X-Profile-Request'
+PROFILE_QUERY_ARG = 'profile'
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+PROFILE_MODES = {'cprofile', 'sample'}
+
+_NULL_PHASE = nullcontext()
+
+
+# --- Custom Exception Classes ---
+
+class ProfilingError(Exception):
+    """Base exception for profiling failures."""
+    pass
+
+
+# --- Rate Limiting ---
+
+class _ProfileRateLimiter:
+    """
+    Allows at most one profiled request at a time, and no more than one
+    every `min_interval` seconds. Profilers and tracemalloc are process-wide,
+    so overlapping sessions would corrupt each other's numbers.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = False
+        self._last_started = 0.0
+
+    def try_acquire(self, min_interval: float) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self._active or (now - self._last_started) < min_interval:
+                return False
+            self._active = True
+            self._last_started = now
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = False
+
+
+_rate_limiter = _ProfileRateLimiter()
+
+
+# --- Sampling Profiler ---
+
+class _StackSampler(threading.Thread):
+    """
+    A minimal wall-clock sampling profiler. It periodically snapshots the
+    stack of a single target thread and aggregates the samples into
+    collapsed-stack form (one 'frame;frame;frame count' line per stack),
+    which can be fed directly to flamegraph tooling.
+    """
+    def __init__(self, target_ident: int, interval: float):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+# --- Profile Session ---
+
+class ProfileSession:
+    """
+    Profiles a single request. Tracks wall time and tracemalloc allocation
+    peaks per named phase, and runs either cProfile or the stack sampler
+    over the whole request.
+    """
+    def __init__(self, mode: str, sample_interval: float):
+        self.profile_id = uuid.uuid4().hex
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self.phases = []
+        self._profiler = None
+        self._sampler = None
+        self._started_tracemalloc = False
+        self._started_at = None
+        self.total_seconds = None
+        self.peak_bytes = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        # Through the memory reporter, so it knows its window was cut short
+        _memory_reporter.reset_peak()
+        self._started_at = time.perf_counter()
+
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+            self._sampler.start()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Records wall time and the allocation peak of the wrapped block."""
+        _, overall_peak = tracemalloc.get_traced_memory()
+        _memory_reporter.reset_peak()
+        start_current, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            self.phases.append({
+                "name": name,
+                "seconds": round(time.perf_counter() - started, 6),
+                "peak_bytes": max(peak - start_current, 0),
+                "retained_bytes": current - start_current,
+            })
+            # Keep the request-wide peak meaningful across phases
+            self.peak_bytes = max(self.peak_bytes or 0, overall_peak, peak)
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+
+        self.total_seconds = round(time.perf_counter() - self._started_at, 6)
+        _, peak = tracemalloc.get_traced_memory()
+        self.peak_bytes = max(self.peak_bytes or 0, peak)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def summary(self, top: int = 25) -> dict:
+        summary = {
+            "profile_id": self.profile_id,
+            "mode": self.mode,
+            "total_seconds": self.total_seconds,
+            "peak_bytes": self.peak_bytes,
+            "phases": self.phases,
+        }
+        if self._profiler is not None:
+            out = StringIO()
+            stats = pstats.Stats(self._profiler, stream=out)
+            stats.sort_stats('cumulative').print_stats(top)
+            summary["top_functions"] = out.getvalue()
+        if self._sampler is not None:
+            summary["sample_count"] = sum(self._sampler.samples.values())
+        return summary
+
+    def save(self, output_dir: str) -> dict:
+        """
+        Writes the profile artifacts to `output_dir`.
+
+        Returns:
+            A dict mapping artifact format ('json', 'pstats', 'collapsed')
+            to the path it was written to.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        base = os.path.join(output_dir, self.profile_id)
+        paths = {"json": f"{base}.json"}
+
+        with open(paths["json"], 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+        if self._profiler is not None:
+            paths["pstats"] = f"{base}.pstats"
+            self._profiler.dump_stats(paths["pstats"])
+        if self._sampler is not None:
+            paths["collapsed"] = f"{base}.collapsed"
+            with open(paths["collapsed"], 'w') as f:
+                f.write(self._sampler.collapsed())
+        return paths
+
+
+# --- Memory Reporting ---
+
+class _MemoryReporter:
+    """
+    Reports the tracemalloc peak of every request. tracemalloc is
+    process-wide, so requests that overlap share one measurement window,
+    opened (and its peak reset) when the first of them started; their
+    peaks are reported with scope 'shared' as an upper bound, and only a
+    request that ran alone gets scope 'request'. A window that is
+    `max_window_seconds` old is replaced by a new one at the next request
+    even if others are still running, so steady traffic does not pin the
+    peak at its all-time high. A request whose window was replaced while it
+    ran, or whose peak a profile session reset, gets scope 'unreliable'.
+    Renders in the process pool run in other processes and are not included.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._shared = False
+        self._window = 0
+        self._window_started = 0.0
+
+    def _open_window(self):
+        tracemalloc.reset_peak()
+        self._window += 1
+        self._window_started = time.monotonic()
+        self._shared = self._in_flight > 0
+
+    def begin(self, max_window_seconds: float) -> tuple:
+        """Returns (the traced memory at the start of the request, its window)."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            expired = max_window_seconds and time.monotonic() - self._window_started >= max_window_seconds
+            if self._in_flight == 0 or expired:
+                self._open_window()
+            else:
+                self._shared = True
+            self._in_flight += 1
+            current, _ = tracemalloc.get_traced_memory()
+            return current, self._window
+
+    def reset_peak(self):
+        """Resets the tracemalloc peak for someone else, e.g. a profile session."""
+        with self._lock:
+            self._open_window()
+
+    def peak(self, start_current: int, window: int) -> tuple:
+        """Returns (peak bytes above the start, scope) for a request still in flight."""
+        with self._lock:
+            _, peak = tracemalloc.get_traced_memory()
+            if window != self._window:
+                scope = 'unreliable'
+            else:
+                scope = 'shared' if self._shared else 'request'
+            return max(peak - start_current, 0), scope
+
+    def end(self):
+        with self._lock:
+            self._in_flight -= 1
+
+
+_memory_reporter = _MemoryReporter()
+
+
+# --- Public Helpers ---
+
+def is_admin_request() -> bool:
+    """Checks the admin token header against the configured token."""
+    expected = current_app.config.get('PROFILING_ADMIN_TOKEN')
+    provided = request.headers.get(ADMIN_TOKEN_HEADER, '')
+    if not expected or not provided:
+        return False
+    return hmac.compare_digest(expected.encode(), provided.encode())
+
+
+def phase(name: str):
+    """
+    Marks a named phase of the current request for the profiler.
+
+    Returns a no-op context manager unless the request is being profiled,
+    so it is safe (and effectively free) to leave in hot paths.
+    """
+    session = g.get('profile_session')
+    if session is None:
+        return _NULL_PHASE
+    return session.phase(name)
+
+
+def profile_artifact_path(profile_id: str, fmt: str) -> str:
+    """
+    Resolves the on-disk path of a stored profile artifact.
+
+    Raises:
+        ProfilingError: If the id or format is invalid, or the file does not exist.
+    """
+    if fmt not in ('json', 'pstats', 'collapsed'):
+        raise ProfilingError(f"Unknown profile format '{fmt}'.")
+    # Profile ids are uuid4 hex strings; anything else could be a path traversal
+    if len(profile_id) != 32 or not all(c in '0123456789abcdef' for c in profile_id):
+        raise ProfilingError("Invalid profile id.")
+
+    path = os.path.join(current_app.config['PROFILING_OUTPUT_DIR'], f"{profile_id}.{fmt}")
+    if not os.path.exists(path):
+        raise ProfilingError(f"Profile '{profile_id}' has no '{fmt}' artifact.")
+    return path
+
+
+# --- Request Hooks ---
+
+def _requested_mode():
+    return request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_ARG)
+
+
+def _start_profiling():
+    mode = _requested_mode()
+    if not mode:
+        return
+    mode = mode.lower()
+    if mode not in PROFILE_MODES or not is_admin_request():
+        return
+
+    config = current_app.config
+    if not _rate_limiter.try_acquire(config['PROFILING_MIN_INTERVAL_SECONDS']):
+        current_app.logger.warning(f"[profiling] Rate limited profile request for {request.path}")
+        g.profile_rate_limited = True
+        return
+
+    session = ProfileSession(mode, config['PROFILING_SAMPLE_INTERVAL_MS'] / 1000.0)
+    g.profile_session = session
+    session.start()
+
+
+def _finish_profiling(response):
+    if g.get('profile_rate_limited'):
+        response.headers['X-Profile-Status'] = 'rate-limited'
+        return response
+
+    session = g.pop('profile_session', None)
+    if session is None:
+        return response
+
+    try:
+        session.stop()
+        session.save(current_app.config['PROFILING_OUTPUT_DIR'])
+        response.headers['X-Profile-Id'] = session.profile_id
+        response.headers['X-Profile-Status'] = 'captured'
+        current_app.logger.info(
+            f"[profiling] Captured {session.mode} profile {session.profile_id} "
+            f"for {request.path} ({session.total_seconds}s, peak {session.peak_bytes} bytes)"
+        )
+    except Exception as e:
+        current_app.logger.error(f"[profiling] Failed to store profile: {e}")
+    finally:
+        _rate_limiter.release()
+    return response
+
+
+def _abandon_profiling(e=None):
+    # Covers requests that raised before after_request could run
+    session = g.pop('profile_session', None)
+    if session is not None:
+        try:
+            session.stop()
+        finally:
+            _rate_limiter.release()
+
+
+def _begin_memory_report():
+    g.memory_start = _memory_reporter.begin(current_app.config['MEMORY_REPORT_WINDOW_SECONDS'])
+
+
+def _report_memory(response):
+    memory_start = g.get('memory_start')
+    if memory_start is None:
+        return response
+    peak_bytes, scope = _memory_reporter.peak(*memory_start)
+    response.headers['X-Memory-Peak-Bytes'] = str(peak_bytes)
+    response.headers['X-Memory-Peak-Scope'] = scope
+    log_bytes = current_app.config['MEMORY_REPORT_LOG_BYTES']
+    if log_bytes and peak_bytes >= log_bytes:
+        current_app.logger.warning(
+            f"[memory] {request.method} {request.path} peaked at {peak_bytes} bytes ({scope})"
+        )
+    return response
+
+
+def _end_memory_report(e=None):
+    if g.pop('memory_start', None) is not None:
+        _memory_reporter.end()
+
+
+def init_app(app):
+    """
+    Registers the profiling and memory reporting request hooks. Nothing is
+    registered for a feature that is disabled, so there is no per-request
+    cost in that case.
+    """
+    if app.config.get('MEMORY_REPORT_ENABLED'):
+        app.before_request(_begin_memory_report)
+        app.after_request(_report_memory)
+        app.teardown_request(_end_memory_report)
+
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+    if not app.config.get('PROFILING_ADMIN_TOKEN'):
+        app.logger.warning("[profiling] PROFILING_ENABLED is set but PROFILING_ADMIN_TOKEN is not; profiling stays off.")
+        return
+
+    app.before_request(_start_profiling)
+    app.after_request(_finish_profiling)
+    app.teardown_request(_abandon_profiling)
@@ -0,0 +1,192 @@
+"""
+Importing images from remote URLs (e.g. Pexels picks) into S3.
+
+Downloads go through one pooled HTTP session per process, are streamed with
+a hard byte ceiling, and are typed from their leading magic bytes rather
+than the URL or the server's Content-Type. `import_images` fetches and
+uploads several URLs concurrently, each URL in its own task, so importing a
+selection takes about as long as its slowest image. The *_async variants
+do the same on an event loop for the ASGI serving mode.
+"""
+import asyncio
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from app.lazy_imports import lazy_module
+
+# Imported on first use; see app/lazy_imports.py
+requests = lazy_module('requests')
+requests_adapters = lazy_module('requests.adapters')
+httpx = lazy_module('httpx')
+
+_CHUNK_SIZE = 64 * 1024
+
+# (magic prefix, extension, content type) for the image formats accepted
+# as assets; python-pptx cannot place WebP, so it is not among them
+_SIGNATURES = (
+    (b'\xff\xd8\xff', '.jpg', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', '.png', 'image/png'),
+    (b'GIF87a', '.gif', 'image/gif'),
+    (b'GIF89a', '.gif', 'image/gif'),
+)
+
+
+class RemoteImageError(Exception):
+    """Raised when a URL cannot be imported; the message is safe to show to users."""
+    pass
+
+
+def sniff_image_type(head: bytes):
+    """Returns (extension, content type) for the image format `head` starts with, or None."""
+    for signature, extension, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return extension, content_type
+    return None
+
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session(pool_size: int):
+    """Returns the process-wide HTTP session, with connections kept alive per host."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests_adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+class _ImageDownload:
+    """
+    The checks shared by the sync and async downloads: URL scheme, declared
+    and received size against the ceiling, and the type of the first chunk.
+    """
+    def __init__(self, url: str, max_bytes: int):
+        if urlparse(url).scheme not in ('http', 'https'):
+            raise RemoteImageError("Only http(s) URLs can be imported.")
+        self.max_bytes = max_bytes
+        self.chunks = []
+        self.received = 0
+        self.image_type = None
+
+    def check_headers(self, headers):
+        declared = headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > self.max_bytes:
+            raise RemoteImageError(f"The image is larger than {self.max_bytes} bytes.")
+
+    def add(self, chunk: bytes):
+        if not chunk:
+            return
+        if self.image_type is None:
+            self.image_type = sniff_image_type(chunk)
+            if self.image_type is None:
+                raise RemoteImageError("The URL does not point to a JPEG, PNG or GIF image.")
+        self.received += len(chunk)
+        if self.received > self.max_bytes:
+            raise RemoteImageError(f"The image is larger than {self.max_bytes} bytes.")
+        self.chunks.append(chunk)
+
+    def result(self) -> tuple:
+        if self.image_type is None:
+            raise RemoteImageError("The URL returned an empty response.")
+        return b''.join(self.chunks), self.image_type[0], self.image_type[1]
+
+
+def fetch_image(session, url: str, max_bytes: int, timeout: float) -> tuple:
+    """
+    Downloads an image, stopping as soon as it exceeds `max_bytes`.
+
+    Returns:
+        A (data, extension, content_type) tuple.
+
+    Raises:
+        RemoteImageError: If the URL is invalid, the download fails or is
+            too large, or the content is not a supported image.
+    """
+    download = _ImageDownload(url, max_bytes)
+    try:
+        with session.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            download.check_headers(response.headers)
+            for chunk in response.iter_content(_CHUNK_SIZE):
+                download.add(chunk)
+    except requests.exceptions.RequestException as e:
+        print(f"Image download error from URL {url}: {e}")
+        raise RemoteImageError("Failed to download image from the provided URL.")
+    return download.result()
+
+
+def import_image(s3, session, url: str, max_bytes: int, timeout: float, prefix: str = 'temp/') -> str:
+    """
+    Downloads one image and uploads it to S3 under a new key.
+
+    Returns:
+        The new s3_key.
+
+    Raises:
+        RemoteImageError: If the download is rejected (see `fetch_image`).
+        S3UploadError: If the upload fails.
+    """
+    data, extension, content_type = fetch_image(session, url, max_bytes, timeout)
+    return s3.upload_bytes(data, f"{prefix}{uuid.uuid4()}{extension}", content_type)
+
+
+def import_images(s3, session, urls: list, max_bytes: int, timeout: float, max_workers: int) -> list:
+    """
+    Imports several URLs concurrently; one failing URL never affects the rest.
+
+    Returns:
+        A list with, per URL, either the new s3_key or the Exception raised.
+    """
+    def run(url):
+        try:
+            return import_image(s3, session, url, max_bytes, timeout)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as executor:
+        return list(executor.map(run, urls))
+
+
+# --- asyncio variants (ASGI serving mode, see app/asgi_api) ---
+
+async def fetch_image_async(client, url: str, max_bytes: int, timeout: float) -> tuple:
+    """`fetch_image` over an httpx.AsyncClient."""
+    download = _ImageDownload(url, max_bytes)
+    try:
+        async with client.stream('GET', url, timeout=timeout, follow_redirects=True) as response:
+            response.raise_for_status()
+            download.check_headers(response.headers)
+            async for chunk in response.aiter_bytes(_CHUNK_SIZE):
+                download.add(chunk)
+    except httpx.HTTPError as e:
+        print(f"Image download error from URL {url}: {e}")
+        raise RemoteImageError("Failed to download image from the provided URL.")
+    return download.result()
+
+
+async def import_image_async(s3, client, url: str, max_bytes: int, timeout: float, prefix: str = 'temp/') -> str:
+    """`import_image` with an AsyncS3Service and an httpx.AsyncClient."""
+    data, extension, content_type = await fetch_image_async(client, url, max_bytes, timeout)
+    return await s3.upload_bytes(data, f"{prefix}{uuid.uuid4()}{extension}", content_type)
+
+
+async def import_images_async(s3, client, urls: list, max_bytes: int, timeout: float, max_concurrency: int) -> list:
+    """`import_images` as tasks on the event loop, at most `max_concurrency` at once."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(url):
+        async with semaphore:
+            try:
+                return await import_image_async(s3, client, url, max_bytes, timeout)
+            except Exception as e:
+                return e
+
+    return list(await asyncio.gather(*(run(url) for url in urls)))
@@ -0,0 +1,420 @@
+"""
+Process-pool execution for presentation rendering.
+
+Rendering is CPU-bound lxml/python-pptx work that holds the GIL, so with
+threaded workers concurrent generations run one at a time per process. In
+'process' render mode each server worker hands renders to its own pool of
+child processes instead.
+
+Template and output bytes travel through files in a tmpfs directory
+(/dev/shm when available) rather than being pickled through the pool's
+pipes; only the small JSON `data` payload is pickled.
+"""
+import ctypes
+import gc
+import os
+import signal
+import tempfile
+import threading
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+# Extra time the parent waits beyond the task timeout before it gives up on
+# a worker that did not stop itself, and recycles the pool.
+_TIMEOUT_GRACE_SECONDS = 5
+
+# How often the parent checks whether a queued task has started
+_START_POLL_SECONDS = 0.05
+
+
+class RenderPoolError(Exception):
+    """Base exception for render pool errors."""
+    pass
+
+class RenderQueueFull(RenderPoolError):
+    """Raised when the pool already has its maximum number of queued renders."""
+    pass
+
+class RenderTimeout(RenderPoolError):
+    """Raised when a render runs longer than the task timeout."""
+    pass
+
+
+# --- Worker Process Side ---
+
+def _init_worker():
+    """Builds an app context in the child so S3 access works as in a request."""
+    # Shutdown is driven by the parent; don't die on the terminal's Ctrl-C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from app import create_app
+    create_app().app_context().push()
+    import app.services.pptx_service  # noqa: F401  (pay the import cost up front)
+
+
+def _raise_timeout(signum, frame):
+    raise RenderTimeout("Render exceeded the task timeout.")
+
+
+class _WorkerS3:
+    """Connects to S3 only once a render actually downloads an image."""
+    def download_file_as_stream(self, s3_key: str) -> BytesIO:
+        from app import get_s3
+        return get_s3().download_file_as_stream(s3_key)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_task(started_path: str, fn, *args):
+    """
+    Runs `fn(*args)` after creating `started_path`, whose modification
+    time tells the parent when the task left the queue and began running.
+    """
+    with open(started_path, 'w'):
+        pass
+    return fn(*args)
+
+
+def _status_bytes(field: str):
+    """Reads a memory field (e.g. VmRSS) of /proc/self/status in bytes, or None."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+_libc = None
+
+def _malloc_trim() -> bool:
+    """Returns freed heap memory to the OS (glibc only); False where unsupported."""
+    global _libc
+    if _libc is None:
+        try:
+            _libc = ctypes.CDLL('libc.so.6')
+            _libc.malloc_trim
+        except (OSError, AttributeError):
+            _libc = False
+    if not _libc:
+        return False
+    _libc.malloc_trim(0)
+    return True
+
+
+def _reset_peak_rss():
+    """
+    Resets the process's resident memory high-water mark (Linux only) and
+    returns the current resident size, or None where this is unsupported.
+
+    Memory freed by earlier tasks is handed back to the OS first. Otherwise
+    a warm worker would reuse it, and later renders would barely raise the
+    resident size however much they allocate.
+    """
+    gc.collect()
+    if not _malloc_trim():
+        return None
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        return None
+    return _status_bytes('VmRSS')
+
+
+def _render_task(template_path: str, output_path: str, data: dict,
+                 list_items_per_slide: int, fit_text: dict, timeout: float, measure_peak: bool):
+    """
+    Renders the template at `template_path` into `output_path`.
+    Runs in a pool process; with `measure_peak`, returns how far the
+    worker's resident memory rose above its starting point during the
+    render, otherwise (or if that cannot be measured) None. Measuring
+    costs a full GC and heap trim before the render, so it is sampled.
+    """
+    from app.services import pptx_service
+
+    baseline_rss = _reset_peak_rss() if measure_peak else None
+
+    # Tasks run in the worker's main thread, so an interval timer can
+    # interrupt a runaway render without killing the process
+    previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with open(template_path, 'rb') as template_file:
+            output_stream = pptx_service.generate_presentation(
+                template_file, data, _WorkerS3(), list_items_per_slide=list_items_per_slide,
+                fit_text=fit_text
+            )
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+    with open(output_path, 'wb') as output_file:
+        output_file.write(output_stream.getbuffer())
+    if baseline_rss is None:
+        return None
+    peak_rss = _status_bytes('VmHWM')
+    if peak_rss is None:
+        return None
+    return max(0, peak_rss - baseline_rss)
+
+
+def _prepare_task(template_path: str, options: dict, extract_placeholders: bool) -> dict:
+    """
+    Runs save-time processing on the template at `template_path`, writing
+    the processed file back in place. Returns the report and placeholders.
+    """
+    from app.services import template_pipeline
+    with open(template_path, 'rb') as template_file:
+        result = template_pipeline.prepare_template(template_file.read(), options, extract_placeholders)
+    with open(template_path, 'wb') as template_file:
+        template_file.write(result.pop('blob'))
+    return result
+
+
+# --- Parent Side ---
+
+def _default_temp_dir() -> str:
+    # tmpfs keeps the hand-off in memory instead of on disk
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def _mp_context():
+    # Server workers are multi-threaded, and forking a threaded process is
+    # unsafe; forkserver children fork from a clean single-threaded server
+    # that has already imported the renderer.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['app.services.pptx_service'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class RenderPool:
+    """
+    A bounded process pool for `generate_presentation`.
+
+    At most `workers + max_queue` renders are accepted at a time; further
+    submissions fail fast with RenderQueueFull instead of piling up.
+    """
+    def __init__(self, workers: int, max_queue: int, task_timeout: float, temp_dir: str = None,
+                 peak_sample_every: int = 0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.task_timeout = task_timeout
+        self.temp_dir = temp_dir or _default_temp_dir()
+        self.peak_sample_every = peak_sample_every
+        self._renders = 0
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.in_flight = 0
+        self.timeouts = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=_mp_context(), initializer=_init_worker
+                )
+            return self._executor
+
+    def _recycle(self, executor):
+        """Replaces a pool whose worker is stuck or dead."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # Another thread already replaced it
+            self._executor = None
+        # A worker stuck in native code never returns, so it is killed
+        # outright (ProcessPoolExecutor has no public API for this)
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self):
+        """Starts every worker process so the first renders don't pay for it."""
+        executor = self._get_executor()
+        futures = [executor.submit(_ping) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "timeouts": self.timeouts,
+        }
+
+    @staticmethod
+    def _wait_started(future, started_path: str) -> float:
+        """Waits for a queued task to start running; returns when it started (wall clock)."""
+        while not future.done():
+            try:
+                return os.stat(started_path).st_mtime
+            except FileNotFoundError:
+                wait([future], timeout=_START_POLL_SECONDS)
+        return time.time()
+
+    def _call(self, fn, *args):
+        """
+        Runs `fn(*args)` in a pool process, within the pool's slot limit.
+        The task timeout counts from when the task starts running in a
+        worker; time spent queued behind other tasks does not count.
+
+        Raises:
+            RenderQueueFull: If the pool is saturated.
+            RenderTimeout: If the task exceeds the task timeout.
+            RenderPoolError: If a pool process died during the task.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RenderQueueFull("Too many renders are already queued.")
+        with self._lock:
+            self.in_flight += 1
+        started_path = os.path.join(self.temp_dir, f"render-started-{uuid.uuid4().hex}")
+        try:
+            executor = self._get_executor()
+            future = executor.submit(_run_task, started_path, fn, *args)
+            try:
+                started = self._wait_started(future, started_path)
+                remaining = self.task_timeout + _TIMEOUT_GRACE_SECONDS - (time.time() - started)
+                return future.result(timeout=max(remaining, 0))
+            except RenderTimeout:
+                with self._lock:
+                    self.timeouts += 1
+                raise
+            except FutureTimeoutError:
+                # Only reached once this task has been running past the
+                # timeout and its worker ignored the in-process alarm
+                with self._lock:
+                    self.timeouts += 1
+                self._recycle(executor)
+                raise RenderTimeout("Render exceeded the task timeout.")
+            except BrokenProcessPool as e:
+                self._recycle(executor)
+                raise RenderPoolError(f"A render process died: {e}")
+        finally:
+            self._remove(started_path)
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def _write_temp(self, stream: BytesIO) -> str:
+        with tempfile.NamedTemporaryFile(dir=self.temp_dir, prefix='render-in-', delete=False) as temp_file:
+            temp_file.write(stream.getbuffer())
+            return temp_file.name
+
+    @staticmethod
+    def _remove(*paths):
+        for path in paths:
+            if path:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    def _should_measure(self, peak_known: bool) -> bool:
+        """Measures every render of a template without a known peak, and every Nth of the rest."""
+        if not peak_known:
+            return True
+        if not self.peak_sample_every:
+            return False
+        with self._lock:
+            self._renders += 1
+            return self._renders % self.peak_sample_every == 0
+
+    def render(self, template_stream: BytesIO, data: dict, list_items_per_slide: int = None,
+               fit_text: dict = None, peak_known: bool = False) -> tuple:
+        """
+        Renders a template in a pool process.
+
+        Args:
+            peak_known: Whether the template's peak memory has already been
+                measured, in which case it is only re-measured on a sample
+                of renders (see `peak_sample_every`).
+
+        Returns:
+            An (output_stream, peak_bytes) tuple: the .pptx stream and the
+            rise in the worker's resident memory during the render (None
+            where it was not or cannot be measured).
+
+        Raises:
+            RenderQueueFull: If the pool is saturated.
+            RenderTimeout: If the render exceeds the task timeout.
+            RenderPoolError: If a pool process died during the render.
+        """
+        template_path = output_path = None
+        try:
+            template_path = self._write_temp(template_stream)
+            output_path = template_path.replace('render-in-', 'render-out-')
+            peak_bytes = self._call(_render_task, template_path, output_path, data,
+                                    list_items_per_slide, fit_text, self.task_timeout,
+                                    self._should_measure(peak_known))
+            with open(output_path, 'rb') as output_file:
+                return BytesIO(output_file.read()), peak_bytes
+        finally:
+            self._remove(template_path, output_path)
+
+    def prepare(self, template_stream: BytesIO, options: dict, extract_placeholders: bool = False) -> dict:
+        """
+        Runs `template_pipeline.prepare_template` in a pool process.
+
+        Raises:
+            The same exceptions as `render`.
+        """
+        template_path = None
+        try:
+            template_path = self._write_temp(template_stream)
+            result = self._call(_prepare_task, template_path, options, extract_placeholders)
+            with open(template_path, 'rb') as template_file:
+                result['blob'] = template_file.read()
+            return result
+        finally:
+            self._remove(template_path)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_render_pool(app):
+    """
+    Returns the process-wide render pool, or None unless RENDER_MODE is
+    'process'. The pool is created on first use, after the server has forked.
+    """
+    global _pool
+    if app.config['RENDER_MODE'] != 'process':
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = app.config['RENDER_POOL_WORKERS'] or os.cpu_count() or 1
+                _pool = RenderPool(
+                    workers=workers,
+                    max_queue=app.config['RENDER_POOL_MAX_QUEUE'] or workers * 2,
+                    task_timeout=app.config['RENDER_TASK_TIMEOUT_SECONDS'],
+                    temp_dir=app.config['RENDER_POOL_TEMP_DIR'],
+                    peak_sample_every=app.config['RENDER_PEAK_SAMPLE_EVERY'],
+                )
+    return _pool
+
+
+def shutdown_render_pool():
+    """Stops the process-wide render pool, if one was started."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
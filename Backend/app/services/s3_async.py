@@ -0,0 +1,148 @@
+"""
+An asyncio counterpart of S3Service for the ASGI serving mode (see
+app/asgi_api). It covers the calls the async endpoints make, with the same
+settings, key conventions and exceptions as S3Service, on an aiobotocore
+client that is opened once per process and shared by every request.
+"""
+import contextlib
+import logging
+
+from app.lazy_imports import lazy_module
+from app.services.s3_service import (
+    S3Error, S3UploadError, S3ConfigError, s3_client_options, original_key_from_trash
+)
+
+# Imported on first use; see app/lazy_imports.py
+aiobotocore_session = lazy_module('aiobotocore.session')
+aiobotocore_config = lazy_module('aiobotocore.config')
+botocore_exceptions = lazy_module('botocore.exceptions')
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncS3Service:
+    """
+    Awaitable versions of the S3Service methods used by the async endpoints.
+    Create it with `open`, which also closes the client on exit.
+    """
+    def __init__(self, s3_client, bucket_name: str):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+
+    @classmethod
+    @contextlib.asynccontextmanager
+    async def open(cls, config):
+        """
+        Opens the client from an application config.
+
+        Raises:
+            S3ConfigError: If any required S3 configuration is missing.
+        """
+        bucket_name, client_kwargs, config_kwargs = s3_client_options(
+            config, config['ASYNC_S3_MAX_POOL_CONNECTIONS']
+        )
+        session = aiobotocore_session.get_session()
+        try:
+            client_context = session.create_client(
+                's3', config=aiobotocore_config.AioConfig(**config_kwargs), **client_kwargs
+            )
+        except Exception as e:
+            raise S3ConfigError(f"Failed to initialize the aiobotocore client: {e}")
+        async with client_context as s3_client:
+            yield cls(s3_client, bucket_name)
+
+    async def upload_bytes(self, data: bytes, s3_key: str, content_type: str) -> str:
+        """
+        Uploads bytes under a caller-chosen key (see S3Service.upload_bytes).
+
+        Raises:
+            S3UploadError: If the upload fails.
+        """
+        try:
+            await self.s3_client.put_object(
+                Bucket=self.bucket_name, Key=s3_key, Body=data, ContentType=content_type
+            )
+            return s3_key
+        except botocore_exceptions.ClientError as e:
+            logger.error(f"S3 Upload Error: {e}")
+            raise S3UploadError(f"Failed to upload '{s3_key}' to S3.")
+
+    async def file_exists(self, s3_key: str) -> bool:
+        """
+        Checks if a file exists with a HEAD request.
+
+        Raises:
+            S3Error: If any error other than a 404 occurs.
+        """
+        try:
+            await self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            return True
+        except botocore_exceptions.ClientError as e:
+            if e.response['Error']['Code'] == '404':
+                return False
+            logger.error(f"S3 head_object error for key {s3_key}: {e.response['Error']['Message']}")
+            raise S3Error(f"Error checking file existence: {e.response['Error']['Message']}")
+
+    async def create_presigned_url_for_download(self, s3_key: str) -> str:
+        """
+        Generates a pre-signed download URL, valid for 5 minutes.
+
+        Raises:
+            S3Error: If generating the URL fails.
+        """
+        try:
+            return await self.s3_client.generate_presigned_url(
+                'get_object', Params={'Bucket': self.bucket_name, 'Key': s3_key}, ExpiresIn=300
+            )
+        except botocore_exceptions.ClientError as e:
+            logger.error(f"S3 Presigned URL Error: {e}")
+            raise S3Error(f"Failed to create presigned URL for '{s3_key}'.")
+
+    async def _move(self, source_key: str, target_key: str):
+        # Copy first; the source is deleted only after the copy succeeds
+        await self.s3_client.copy_object(
+            CopySource={'Bucket': self.bucket_name, 'Key': source_key},
+            Bucket=self.bucket_name, Key=target_key
+        )
+        await self.s3_client.delete_object(Bucket=self.bucket_name, Key=source_key)
+
+    async def move_file_to_trash(self, s3_key: str) -> str:
+        """
+        Moves a file under 'trash/' (see S3Service.move_file_to_trash).
+
+        Returns:
+            The new key of the object in the trash directory.
+
+        Raises:
+            S3Error: If the copy or delete operation fails.
+        """
+        if 'trash/' in s3_key:
+            # Avoid re-trashing an already trashed file
+            return s3_key
+
+        trash_key = f"trash/{s3_key}"
+        try:
+            await self._move(s3_key, trash_key)
+            return trash_key
+        except botocore_exceptions.ClientError as e:
+            logger.error(f"S3 Trash Error: {e}")
+            raise S3Error(f"Failed to move file '{s3_key}' to trash.")
+
+    async def restore_file_from_trash(self, s3_key_in_trash: str) -> str:
+        """
+        Moves a file out of 'trash/' (see S3Service.restore_file_from_trash).
+
+        Returns:
+            The original key of the object.
+
+        Raises:
+            ValueError: If the provided key does not start with 'trash/'.
+            S3Error: If the copy or delete operation fails.
+        """
+        original_key = original_key_from_trash(s3_key_in_trash)
+        try:
+            await self._move(s3_key_in_trash, original_key)
+            return original_key
+        except botocore_exceptions.ClientError as e:
+            logger.error(f"S3 Restore Error for {s3_key_in_trash}: {e}")
+            raise S3Error(f"Failed to restore file '{s3_key_in_trash}' from trash.")
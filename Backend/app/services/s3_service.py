@@ -1,10 +1,17 @@
 import os
 import uuid
-import boto3
-import requests 
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from botocore.exceptions import ClientError
 from flask import current_app
+from app.lazy_imports import lazy_module
+
+# Imported on first use; see app/lazy_imports.py
+boto3 = lazy_module('boto3')
+botocore_exceptions = lazy_module('botocore.exceptions')
+botocore_config = lazy_module('botocore.config')
+
+# delete_objects accepts at most this many keys per call
+_DELETE_BATCH_SIZE = 1000
 
 # --- Custom Exception Classes ---
 
@@ -20,6 +27,66 @@ class S3ConfigError(S3Error):
     """Raised when S3 configuration is missing."""
     pass
 
+class S3NotFoundError(S3Error):
+    """Raised (or reported by bulk operations) when an object does not exist."""
+    pass
+
+
+# --- Shared Helpers ---
+# Used by both S3Service and the asyncio variant in s3_async.py
+
+def s3_client_options(config, max_pool_connections: int) -> tuple:
+    """
+    Reads the S3 settings from an application config.
+
+    Returns:
+        A (bucket name, client keyword arguments, botocore Config keyword
+        arguments) tuple.
+
+    Raises:
+        S3ConfigError: If any required S3 configuration is missing.
+    """
+    bucket_name = config.get('S3_BUCKET_NAME')
+    aws_access_key_id = config.get('AWS_ACCESS_KEY_ID')
+    aws_secret_access_key = config.get('AWS_SECRET_ACCESS_KEY')
+    aws_region = config.get('AWS_REGION')
+    endpoint_url = config.get('S3_ENDPOINT_URL')
+
+    # Validate that all required configuration variables are present
+    if not all([bucket_name, aws_access_key_id, aws_secret_access_key, aws_region]):
+        raise S3ConfigError("Missing required S3 configuration in the application.")
+
+    client_kwargs = {
+        'aws_access_key_id': aws_access_key_id,
+        'aws_secret_access_key': aws_secret_access_key,
+        'region_name': aws_region,
+        'endpoint_url': endpoint_url,
+    }
+    config_kwargs = {
+        # Bulk operations issue requests from several threads at once
+        'max_pool_connections': max_pool_connections,
+        # Local stand-ins (MinIO, LocalStack) don't serve bucket subdomains
+        's3': {'addressing_style': 'path'} if endpoint_url else None,
+    }
+    return bucket_name, client_kwargs, config_kwargs
+
+
+def original_key_from_trash(s3_key_in_trash: str) -> str:
+    """
+    Returns the key a trashed object is restored to.
+
+    Raises:
+        ValueError: If the key does not start with 'trash/'.
+    """
+    if not s3_key_in_trash.startswith('trash/'):
+        raise ValueError(f"Key '{s3_key_in_trash}' does not appear to be in the trash directory.")
+
+    # Calculate the original key by removing the prefix
+    original_key = s3_key_in_trash[len('trash/'):]
+    if not original_key: # Handle edge case of just "trash/"
+         raise ValueError("Invalid key provided for restoration.")
+    return original_key
+
 
 # --- S3 Service Class ---
 
@@ -37,23 +104,11 @@ class S3Service:
         Raises:
             S3ConfigError: If any required S3 configuration is missing.
         """
-        config = current_app.config
-        self.bucket_name = config.get('S3_BUCKET_NAME')
-        aws_access_key_id = config.get('AWS_ACCESS_KEY_ID')
-        aws_secret_access_key = config.get('AWS_SECRET_ACCESS_KEY')
-        aws_region = config.get('AWS_REGION')
-
-        # Validate that all required configuration variables are present
-        if not all([self.bucket_name, aws_access_key_id, aws_secret_access_key, aws_region]):
-            raise S3ConfigError("Missing required S3 configuration in the application.")
-
+        self.bucket_name, client_kwargs, config_kwargs = s3_client_options(
+            current_app.config, current_app.config.get('S3_MAX_POOL_CONNECTIONS', 10)
+        )
         try:
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key_id,
-                aws_secret_access_key=aws_secret_access_key,
-                region_name=aws_region
-            )
+            self.s3_client = boto3.client('s3', config=botocore_config.Config(**config_kwargs), **client_kwargs)
         except Exception as e:
             # Catch potential Boto3 initialization errors
             raise S3ConfigError(f"Failed to initialize Boto3 client: {e}")
@@ -82,15 +137,45 @@ class S3Service:
                 s3_key
             )
             return s3_key
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             # In a real app, you would log this error
             print(f"S3 Upload Error: {e}")
             raise S3UploadError(f"Failed to upload '{original_filename}' to S3.")
         
+    def upload_bytes(self, data: bytes, s3_key: str, content_type: str) -> str:
+        """
+        Uploads bytes under a caller-chosen key, overwriting any existing object.
+
+        Args:
+            data: The object's contents.
+            s3_key: The key to store the object under.
+            content_type: The Content-Type stored with the object.
+
+        Returns:
+            The s3_key.
+
+        Raises:
+            S3UploadError: If the upload fails.
+        """
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Body=data,
+                ContentType=content_type
+            )
+            return s3_key
+        except botocore_exceptions.ClientError as e:
+            print(f"S3 Upload Error: {e}")
+            raise S3UploadError(f"Failed to upload '{s3_key}' to S3.")
+
     def upload_file_from_url(self, image_url: str, prefix: str = "") -> str:
         """
         Downloads an image from a URL and uploads it to S3.
 
+        The download is capped at REMOTE_IMAGE_MAX_BYTES and its type is
+        taken from the image data (see services/remote_images.py).
+
         Args:
             image_url: The URL of the image to download.
             prefix: The prefix to add to the S3 key.
@@ -99,33 +184,17 @@ class S3Service:
             The unique s3_key for the uploaded file.
 
         Raises:
-            S3UploadError: If the download or upload fails.
+            S3UploadError: If the download is rejected or the upload fails.
         """
+        from app.services import remote_images
+        config = current_app.config
         try:
-            # It's good practice to use a timeout for external requests
-            response = requests.get(image_url, stream=True, timeout=10)
-            response.raise_for_status()  # Will raise an exception for 4xx/5xx responses
-
-            # Use a generic filename; the extension will be determined later
-            # A more robust solution could inspect the 'Content-Type' header
-            _, file_extension = os.path.splitext(image_url.split('?')[0]) # Basic extension extraction
-            if not file_extension:
-                file_extension = ".jpg" # Default if no extension found
-
-            s3_key = f"{prefix}{uuid.uuid4()}{file_extension}"
-
-            self.s3_client.upload_fileobj(
-                response.raw,
-                self.bucket_name,
-                s3_key
+            return remote_images.import_image(
+                self, remote_images.get_http_session(config['REMOTE_IMAGE_CONCURRENCY']), image_url,
+                config['REMOTE_IMAGE_MAX_BYTES'], config['REMOTE_IMAGE_TIMEOUT_SECONDS'], prefix
             )
-            return s3_key
-        except requests.exceptions.RequestException as e:
-            print(f"Image download error from URL {image_url}: {e}")
-            raise S3UploadError(f"Failed to download image from the provided URL.")
-        except ClientError as e:
-            print(f"S3 Upload Error from URL: {e}")
-            raise S3UploadError("Failed to upload the downloaded image to S3.")
+        except remote_images.RemoteImageError as e:
+            raise S3UploadError(str(e))
         
     def download_file_as_stream(self, s3_key: str) -> BytesIO:
         """Downloads an S3 object into an in-memory stream."""
@@ -134,7 +203,9 @@ class S3Service:
             self.s3_client.download_fileobj(self.bucket_name, s3_key, stream)
             stream.seek(0)  # Rewind the stream to the beginning for reading
             return stream
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                raise S3NotFoundError(f"File '{s3_key}' does not exist.")
             print(f"S3 Download Error: {e}")
             raise S3Error(f"Failed to download file '{s3_key}' from S3.")
     
@@ -157,7 +228,7 @@ class S3Service:
                 Key=s3_key
             )
             return True
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             if e.response['Error']['Code'] == '404':
                 # The file does not exist
                 return False
@@ -190,7 +261,7 @@ class S3Service:
                 ExpiresIn=300  # URL is valid for 5 minutes
             )
             return url
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             print(f"S3 Presigned URL Error: {e}")
             raise S3Error(f"Failed to create presigned URL for '{s3_key}'.")
 
@@ -231,7 +302,7 @@ class S3Service:
             )
             
             return trash_key
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             print(f"S3 Trash Error: {e}")
             raise S3Error(f"Failed to move file '{s3_key}' to trash.")
     
@@ -252,14 +323,7 @@ class S3Service:
             ValueError: If the provided key does not start with 'trash/'.
             S3Error: If the copy or delete operation fails.
         """
-        if not s3_key_in_trash.startswith('trash/'):
-            raise ValueError(f"Key '{s3_key_in_trash}' does not appear to be in the trash directory.")
-
-        # Calculate the original key by removing the prefix
-        original_key = s3_key_in_trash[len('trash/'):]
-        if not original_key: # Handle edge case of just "trash/"
-             raise ValueError("Invalid key provided for restoration.")
-
+        original_key = original_key_from_trash(s3_key_in_trash)
         copy_source = {'Bucket': self.bucket_name, 'Key': s3_key_in_trash}
 
         try:
@@ -279,7 +343,113 @@ class S3Service:
             )
 
             return original_key
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             current_app.logger.error(f"S3 Restore Error for {s3_key_in_trash}: {e}")
             # Consider more specific error handling if needed (e.g., if copy succeeds but delete fails)
-            raise S3Error(f"Failed to restore file '{s3_key_in_trash}' from trash.")
\ No newline at end of file
+            raise S3Error(f"Failed to restore file '{s3_key_in_trash}' from trash.")
+
+    def list_objects(self, prefix: str = "", delimiter: str = None) -> list:
+        """
+        Lists every object under a prefix, following pagination.
+
+        Args:
+            prefix: Only keys starting with this prefix are listed.
+            delimiter: If given, keys containing it after the prefix are
+                rolled up instead of listed (e.g. '/' lists one "directory").
+
+        Returns:
+            A list of dicts with 'Key', 'Size' and 'LastModified'.
+
+        Raises:
+            S3Error: If listing fails.
+        """
+        params = {'Bucket': self.bucket_name, 'Prefix': prefix}
+        if delimiter:
+            params['Delimiter'] = delimiter
+        try:
+            objects = []
+            for page in self.s3_client.get_paginator('list_objects_v2').paginate(**params):
+                objects.extend(
+                    {'Key': item['Key'], 'Size': item['Size'], 'LastModified': item['LastModified']}
+                    for item in page.get('Contents', [])
+                )
+            return objects
+        except botocore_exceptions.ClientError as e:
+            print(f"S3 List Error for prefix '{prefix}': {e}")
+            raise S3Error(f"Failed to list files under '{prefix}'.")
+
+    def copy_objects(self, key_pairs, max_workers: int = 8) -> dict:
+        """
+        Copies many objects within the bucket concurrently.
+
+        Unlike the single-object methods this does not raise per object,
+        not even for connection errors; failures are collected so the
+        caller can report them individually.
+
+        Args:
+            key_pairs: An iterable of (source_key, destination_key) tuples.
+            max_workers: The maximum number of copies in flight.
+
+        Returns:
+            A dict mapping each source key that failed to an S3Error
+            (S3NotFoundError if the source does not exist).
+        """
+        key_pairs = list(key_pairs)
+        if not key_pairs:
+            return {}
+
+        def copy(pair):
+            source_key, destination_key = pair
+            try:
+                self.s3_client.copy_object(
+                    CopySource={'Bucket': self.bucket_name, 'Key': source_key},
+                    Bucket=self.bucket_name,
+                    Key=destination_key
+                )
+                return None
+            except botocore_exceptions.ClientError as e:
+                code = e.response['Error']['Code']
+                if code in ('NoSuchKey', '404'):
+                    return S3NotFoundError(f"File '{source_key}' does not exist.")
+                print(f"S3 Copy Error for {source_key}: {e}")
+                return S3Error(f"Failed to copy file '{source_key}'.")
+            except botocore_exceptions.BotoCoreError as e:
+                # Connection and endpoint errors, which carry no response
+                print(f"S3 Copy Error for {source_key}: {e}")
+                return S3Error(f"Failed to copy file '{source_key}'.")
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(key_pairs)))) as executor:
+            errors = executor.map(copy, key_pairs)
+            return {source_key: error for (source_key, _), error in zip(key_pairs, errors) if error is not None}
+
+    def delete_objects(self, s3_keys) -> dict:
+        """
+        Deletes many objects using batched DeleteObjects requests.
+
+        Deleting a key that does not exist counts as a success, as it does
+        for S3 itself. Nothing is raised, not even for connection errors.
+
+        Args:
+            s3_keys: An iterable of object keys.
+
+        Returns:
+            A dict mapping each key that could not be deleted to an S3Error.
+        """
+        s3_keys = list(dict.fromkeys(s3_keys))
+        failed = {}
+        for start in range(0, len(s3_keys), _DELETE_BATCH_SIZE):
+            batch = s3_keys[start:start + _DELETE_BATCH_SIZE]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except (botocore_exceptions.ClientError, botocore_exceptions.BotoCoreError) as e:
+                print(f"S3 Batch Delete Error: {e}")
+                failed.update((key, S3Error(f"Failed to delete file '{key}'.")) for key in batch)
+                continue
+            # In quiet mode only the keys that failed are listed
+            for error in response.get('Errors', []):
+                print(f"S3 Delete Error for {error['Key']}: {error.get('Message')}")
+                failed[error['Key']] = S3Error(f"Failed to delete file '{error['Key']}'.")
+        return failed
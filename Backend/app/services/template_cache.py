@@ -0,0 +1,90 @@
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+
+class TemplateCache:
+    """
+    A process-wide, size-bounded LRU cache of template file bytes keyed by
+    S3 key.
+
+    Template keys are unique per upload (uuid-based) and the stored object
+    is never rewritten in place, so a cached entry never goes stale; at
+    worst it is evicted. Trash and restore change the key, which simply
+    misses the cache.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, s3_key: str):
+        """Returns the cached bytes for `s3_key`, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(s3_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(s3_key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, s3_key: str, blob, size: int = None):
+        """
+        Stores `blob`, evicting least recently used entries to stay in budget.
+        Values other than bytes can be cached by passing their `size`.
+        """
+        if size is None:
+            size = len(blob)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(s3_key, None)
+            if old is not None:
+                self._current_bytes -= old[1]
+            self._entries[s3_key] = (blob, size)
+            self._current_bytes += size
+            while self._current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+
+    def get_stream(self, s3_key: str, s3_service) -> BytesIO:
+        """
+        Returns a fresh stream over the template's bytes, downloading and
+        caching them from S3 on a miss.
+
+        Raises:
+            S3Error: If the template has to be downloaded and the download fails.
+        """
+        blob = self.get(s3_key)
+        if blob is None:
+            blob = s3_service.download_file_as_stream(s3_key).getvalue()
+            self.put(s3_key, blob)
+        return BytesIO(blob)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_template_cache(app) -> TemplateCache:
+    """Returns the process-wide template cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TemplateCache(app.config['TEMPLATE_CACHE_MAX_BYTES'])
+    return _cache
@@ -0,0 +1,135 @@
+"""
+Bulk import of templates from a ZIP archive of .pptx files.
+
+Each file in the archive gets an entry in the import report. Processing
+(see template_pipeline.py) and placeholder extraction run across a pool of
+processes and uploads run concurrently, so one slow or broken file never
+holds up or aborts the rest.
+"""
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from app.services import image_derivatives
+from app.services import template_pipeline
+from app.services.render_pool import RenderPool
+
+
+class ImportArchiveError(ValueError):
+    """Raised when the uploaded archive itself is unusable."""
+    pass
+
+
+def _is_junk(filename: str) -> bool:
+    """True for entries archivers add on their own (macOS metadata, lock files)."""
+    base = os.path.basename(filename)
+    return filename.startswith('__MACOSX/') or base.startswith('.') or base.startswith('~$')
+
+
+def read_archive(archive_stream, max_files: int, max_uncompressed_bytes: int) -> tuple:
+    """
+    Reads the .pptx files out of a ZIP archive.
+
+    Sizes are checked against the archive's central directory before any
+    entry is decompressed.
+
+    Args:
+        archive_stream: A file-like object containing the ZIP archive.
+        max_files: Maximum number of .pptx files accepted.
+        max_uncompressed_bytes: Maximum total uncompressed size of those files.
+
+    Returns:
+        A (files, skipped) tuple: `files` is a list of (filename, bytes) and
+        `skipped` a list of report entries for the entries that were ignored.
+
+    Raises:
+        ImportArchiveError: If the archive is invalid or exceeds a limit.
+    """
+    try:
+        archive = zipfile.ZipFile(archive_stream)
+    except zipfile.BadZipFile:
+        raise ImportArchiveError("The uploaded file is not a valid ZIP archive.")
+
+    with archive:
+        entries, skipped = [], []
+        for info in archive.infolist():
+            if info.is_dir() or _is_junk(info.filename):
+                continue
+            if not info.filename.lower().endswith('.pptx'):
+                skipped.append({"file": info.filename, "status": "skipped", "error": "Not a .pptx file."})
+                continue
+            entries.append(info)
+
+        if not entries:
+            raise ImportArchiveError("The archive does not contain any .pptx files.")
+        if len(entries) > max_files:
+            raise ImportArchiveError(f"The archive contains more than {max_files} .pptx files.")
+        if sum(info.file_size for info in entries) > max_uncompressed_bytes:
+            raise ImportArchiveError("The archive's uncompressed size exceeds the import limit.")
+
+        try:
+            files = [(info.filename, archive.read(info)) for info in entries]
+        except (zipfile.BadZipFile, OSError) as e:
+            raise ImportArchiveError(f"The archive could not be read: {e}")
+    return files, skipped
+
+
+def template_name_for(filename: str) -> str:
+    """Derives a template name from an archive entry name ('a/Sales Deck.pptx' -> 'Sales Deck')."""
+    return os.path.splitext(os.path.basename(filename))[0].strip()
+
+
+def prepare_all(blobs: list, options: dict, render_pool, workers: int,
+                task_timeout: float, temp_dir: str = None) -> list:
+    """
+    Runs save-time processing and placeholder extraction for every blob
+    across a pool of processes. The work is CPU-bound and would serialize
+    on the GIL in threads, so without a render pool (thread render mode)
+    one of `workers` processes is started for this import and shut down
+    afterwards. A single blob is processed in the calling thread.
+
+    Returns:
+        A list with, per blob, either the `template_pipeline.prepare_template`
+        result or the Exception raised while processing it.
+    """
+    def prepare(blob):
+        try:
+            return template_pipeline.run_prepare(blob, options, render_pool, extract_placeholders=True)
+        except Exception as e:
+            return e
+
+    own_pool = None
+    if render_pool is None and len(blobs) > 1:
+        workers = min(workers, len(blobs))
+        render_pool = own_pool = RenderPool(workers=workers, max_queue=len(blobs),
+                                            task_timeout=task_timeout, temp_dir=temp_dir)
+    try:
+        workers = render_pool.workers if render_pool is not None else 1
+        # These threads only hand blobs to the pool and wait for results
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(blobs)))) as executor:
+            return list(executor.map(prepare, blobs))
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+
+
+def upload_all(s3, files: list, max_workers: int) -> list:
+    """
+    Uploads (filename, bytes) pairs to S3 concurrently, along with the
+    thumbnail embedded in each file.
+
+    Returns:
+        A list with, per file, either an (s3_key, thumbnail_key) tuple or
+        the Exception raised. thumbnail_key is None if there is none.
+    """
+    def upload(item):
+        filename, blob = item
+        try:
+            thumbnail_key = image_derivatives.store_template_thumbnail(s3, BytesIO(blob))
+            return s3.upload_file(BytesIO(blob), filename), thumbnail_key
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor:
+        return list(executor.map(upload, files))
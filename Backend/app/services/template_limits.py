@@ -0,0 +1,116 @@
+"""
+Complexity limits for .pptx templates.
+
+A .pptx is a ZIP package, so its uncompressed size, part count and slide
+count can all be read from the ZIP central directory without decompressing
+anything, and image dimensions from the first bytes of each image. These
+checks run before a file is parsed with python-pptx (placeholder
+extraction, save-time processing, rendering), so a zip bomb or a
+5,000-slide deck is rejected in milliseconds instead of exhausting a
+worker's memory. Declared sizes can be trusted: zipfile refuses to
+decompress an entry past the size its directory entry declares.
+"""
+import re
+import warnings
+import zipfile
+from io import BytesIO
+
+from app.lazy_imports import lazy_module
+
+# Imported on first use; see app/lazy_imports.py
+Image = lazy_module('PIL.Image')
+
+_SLIDE_PART = re.compile(r'^ppt/slides/slide\d+\.xml$')
+_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff')
+
+
+class InvalidTemplateError(ValueError):
+    """Raised when a file is not a readable .pptx package; the message is safe to show to users."""
+    pass
+
+
+class TemplateLimitError(InvalidTemplateError):
+    """Raised when a template exceeds a complexity limit; the message is safe to show to users."""
+    pass
+
+
+def limits_from_config(config) -> dict:
+    """Reads the TEMPLATE_MAX_* limits; a limit of 0 is not checked."""
+    return {
+        "uncompressed_bytes": config['TEMPLATE_MAX_UNCOMPRESSED_BYTES'],
+        "parts": config['TEMPLATE_MAX_PARTS'],
+        "slides": config['TEMPLATE_MAX_SLIDES'],
+        "image_pixels": config['TEMPLATE_MAX_IMAGE_PIXELS'],
+    }
+
+
+def _image_pixels(archive, info, max_pixels: int) -> int:
+    """The pixel count of an image entry, read from its header only; 0 if it cannot be identified."""
+    with warnings.catch_warnings():
+        # Limits are enforced here, not by Pillow's own bomb warning
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            with archive.open(info) as entry, Image.open(entry) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            return max_pixels + 1
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return 0
+    return width * height
+
+
+def check_template(source, limits: dict) -> dict:
+    """
+    Checks a .pptx against `limits` without parsing it.
+
+    Args:
+        source: The file as bytes or a seekable file-like object. Streams
+            are rewound afterwards.
+        limits: As returned by `limits_from_config`.
+
+    Returns:
+        The measured values: uncompressed_bytes, parts, slides and
+        max_image_pixels (0 when image_pixels is not limited).
+
+    Raises:
+        InvalidTemplateError: If the file is not a ZIP package.
+        TemplateLimitError: If any limit is exceeded.
+    """
+    stream = BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    start = stream.tell()
+    try:
+        try:
+            archive = zipfile.ZipFile(stream)
+        except (zipfile.BadZipFile, OSError):
+            raise InvalidTemplateError("The file is not a valid .pptx presentation.")
+
+        with archive:
+            entries = [info for info in archive.infolist() if not info.is_dir()]
+            measured = {
+                "uncompressed_bytes": sum(info.file_size for info in entries),
+                "parts": len(entries),
+                "slides": sum(1 for info in entries if _SLIDE_PART.match(info.filename)),
+                "max_image_pixels": 0,
+            }
+            if limits['uncompressed_bytes'] and measured['uncompressed_bytes'] > limits['uncompressed_bytes']:
+                raise TemplateLimitError(
+                    f"The presentation is larger than {limits['uncompressed_bytes']} bytes uncompressed."
+                )
+            if limits['parts'] and measured['parts'] > limits['parts']:
+                raise TemplateLimitError(f"The presentation has more than {limits['parts']} parts.")
+            if limits['slides'] and measured['slides'] > limits['slides']:
+                raise TemplateLimitError(f"The presentation has more than {limits['slides']} slides.")
+
+            # Only once the cheap directory checks pass, read image headers
+            if limits['image_pixels']:
+                for info in entries:
+                    if info.filename.startswith('ppt/media/') and info.filename.lower().endswith(_IMAGE_EXTENSIONS):
+                        pixels = _image_pixels(archive, info, limits['image_pixels'])
+                        measured['max_image_pixels'] = max(measured['max_image_pixels'], pixels)
+                        if pixels > limits['image_pixels']:
+                            raise TemplateLimitError(
+                                f"An image in the presentation has more than {limits['image_pixels']} pixels."
+                            )
+        return measured
+    finally:
+        stream.seek(start)
@@ -0,0 +1,103 @@
+"""
+Save-time processing of uploaded templates.
+
+Both /api/save_template and the bulk import run each uploaded file through
+`prepare_template` before it is stored, so the stored (and later served and
+parsed) file is the processed one. The work is CPU-bound, so it runs on the
+render pool in process mode.
+"""
+from io import BytesIO
+
+from app.lazy_imports import lazy_module
+from app.services.render_pool import RenderQueueFull
+from app.services import template_stats
+
+# Imported on first use; see app/lazy_imports.py
+pptx = lazy_module('pptx')
+pptx_service = lazy_module('app.services.pptx_service')
+pptx_compaction = lazy_module('app.services.pptx_compaction')
+pptx_normalize = lazy_module('app.services.pptx_normalize')
+
+
+def pipeline_options(config, compact=None) -> dict:
+    """
+    Builds the (picklable) options for `prepare_template` from app config.
+
+    Args:
+        config: The Flask app config.
+        compact: Overrides TEMPLATE_COMPACTION_ENABLED when not None.
+    """
+    return {
+        "normalize": config['TEMPLATE_NORMALIZATION_ENABLED'],
+        "compact": config['TEMPLATE_COMPACTION_ENABLED'] if compact is None else compact,
+        "media_min_bytes": config['COMPACTION_MEDIA_MIN_BYTES'],
+        "media_max_dimension": config['COMPACTION_MEDIA_MAX_DIMENSION'],
+        "jpeg_quality": config['COMPACTION_JPEG_QUALITY'],
+    }
+
+
+def prepare_template(blob: bytes, options: dict, extract_placeholders: bool = False) -> dict:
+    """
+    Runs the save-time processing steps enabled in `options` on a template
+    and collects its file statistics.
+
+    If processing fails the error is recorded in the report and the file
+    is kept as uploaded; only placeholder extraction failures are raised.
+
+    Returns:
+        A dict with 'blob' (the bytes to store), 'report' (original and
+        stored size, a sub-report per step that ran and the file 'stats')
+        and 'placeholders' (None unless `extract_placeholders` is set).
+
+    Raises:
+        ValueError: If placeholders are extracted and the file is not a
+            readable presentation.
+    """
+    report = {"original_bytes": len(blob)}
+    steps = []
+    if options.get('normalize'):
+        steps.append(('normalization', pptx_normalize.normalize_presentation))
+    if options.get('compact'):
+        steps.append(('compaction', lambda prs: pptx_compaction.compact_presentation(
+            prs, options['media_min_bytes'], options['media_max_dimension'], options['jpeg_quality']
+        )))
+
+    try:
+        prs = pptx.Presentation(BytesIO(blob))
+        # Counted before normalization repairs them
+        split_tags = pptx_normalize.count_split_tags(prs)
+        changed = False
+        for name, step in steps:
+            report[name] = step(prs)
+            changed = changed or any(report[name].values())
+        report['stats'] = dict(template_stats.package_stats(prs), split_tags=split_tags)
+        # An untouched file is kept byte-for-byte rather than re-saved
+        if changed:
+            output = BytesIO()
+            prs.save(output)
+            blob = output.getvalue()
+    except Exception as e:
+        # A step that failed halfway may have left the presentation
+        # inconsistent, so nothing from any step is kept
+        print(f"Template processing failed, storing the original: {e}")
+        report['error'] = str(e)
+        report.pop('stats', None)
+    report['stored_bytes'] = len(blob)
+
+    placeholders = None
+    if extract_placeholders:
+        placeholders = pptx_service.extract_placeholders(BytesIO(blob))
+    return {"blob": blob, "report": report, "placeholders": placeholders}
+
+
+def run_prepare(blob: bytes, options: dict, render_pool, extract_placeholders: bool = False) -> dict:
+    """
+    Runs `prepare_template` on the render pool when there is one, falling
+    back to the calling thread when the pool is saturated.
+    """
+    if render_pool is not None:
+        try:
+            return render_pool.prepare(BytesIO(blob), options, extract_placeholders)
+        except RenderQueueFull:
+            pass
+    return prepare_template(blob, options, extract_placeholders)
@@ -0,0 +1,227 @@
+"""
+Live slide previews.
+
+A preview shows, per slide, the text each shape would contain once `data`
+is substituted, plus the geometry of image slots, without building a .pptx.
+Each template is parsed once into a small JSON-serializable model (shape
+kinds, geometry and raw text with tags) that is cached by S3 key; a preview
+is then pure string substitution over that model, which keeps it fast
+enough to run on every keystroke of the form.
+"""
+import json
+import threading
+from io import BytesIO
+
+from app.lazy_imports import lazy_module
+from app.services.template_cache import TemplateCache
+
+# Imported on first use; see app/lazy_imports.py
+pptx = lazy_module('pptx')
+pptx_service = lazy_module('app.services.pptx_service')
+pptx_charts = lazy_module('app.services.pptx_charts')
+
+
+def _base_model(kind: str, shape, name: str = None) -> dict:
+    """
+    The fields every shape model has: its kind, the shape's name, the
+    placeholder bound to it (if any) and its position and size in EMU.
+    """
+    return {
+        "kind": kind,
+        "shape": shape.name,
+        "name": name,
+        "geometry": {"left": shape.left, "top": shape.top, "width": shape.width, "height": shape.height},
+    }
+
+
+def _model_table(shape) -> dict:
+    table = shape.table
+    rows = [[cell.text for cell in row.cells] for row in table.rows]
+    model = _base_model("table", shape)
+    model["rows"] = rows
+    found = pptx_service.find_table_template_row(table)
+    if found is not None:
+        row_idx, name = found
+        model.update(name=name, template_row=row_idx,
+                     columns=pptx_service.table_columns(table, row_idx))
+    return model
+
+
+def _model_text(shape):
+    """Returns (shape model or None, repeat list name or None) for a text shape."""
+    paragraphs = [para.text for para in shape.text_frame.paragraphs]
+    text = '\n'.join(paragraphs)
+
+    repeat = pptx_service.REPEAT_PATTERN.search(text)
+    if repeat:
+        paragraphs = [pptx_service.REPEAT_PATTERN.sub('', para) for para in paragraphs]
+        text = '\n'.join(paragraphs)
+    if not text.strip():
+        return None, repeat and repeat.group(1)
+
+    image = pptx_service.IMAGE_PATTERN.search(text)
+    list_match = pptx_service.LIST_PATTERN.search(text)
+    if image:
+        model = _base_model("image", shape, image.group(1))
+    elif list_match:
+        model = _base_model("list", shape, list_match.group(1))
+    else:
+        model = _base_model("text", shape)
+    if not image:
+        model["paragraphs"] = paragraphs
+    return model, repeat and repeat.group(1)
+
+
+def build_preview_model(template_stream: BytesIO) -> dict:
+    """
+    Parses a template into the model previews are rendered from. Shapes are
+    read in the same order and with the same rules as `render_presentation`.
+    """
+    prs = pptx.Presentation(template_stream)
+    slides = []
+    for slide in prs.slides:
+        shapes, repeat = [], None
+        for shape in slide.shapes:
+            if shape.has_table:
+                shapes.append(_model_table(shape))
+            elif shape.has_chart:
+                name = pptx_charts.chart_placeholder_name(shape)
+                if name:
+                    shapes.append(_base_model("chart", shape, name))
+            elif shape.has_text_frame:
+                model, shape_repeat = _model_text(shape)
+                repeat = repeat or shape_repeat
+                if model is not None:
+                    shapes.append(model)
+        slides.append({"repeat": repeat, "shapes": shapes})
+    return {"slide_width": prs.slide_width, "slide_height": prs.slide_height, "slides": slides}
+
+
+def _substitute(text: str, data: dict, missing: set) -> str:
+    """Replaces text tags; tags with no value in `data` are kept and recorded in `missing`."""
+    def replace(match):
+        name = match.group(1)
+        if name not in data:
+            missing.add(name)
+            return match.group(0)
+        return str(data[name])
+    return pptx_service.TEXT_PATTERN.sub(replace, text) if '{{' in text else text
+
+
+def _preview_shape(shape: dict, data: dict, missing: set) -> dict:
+    kind = shape['kind']
+    preview = {key: value for key, value in shape.items() if key in ('kind', 'shape', 'name', 'geometry')}
+
+    if kind == 'image':
+        preview['value'] = data.get(shape['name']) or None
+    elif kind == 'chart':
+        preview['bound'] = shape['name'] in data
+    elif kind == 'list':
+        paragraphs = []
+        for para in shape['paragraphs']:
+            match = pptx_service.LIST_PATTERN.search(para)
+            if match is None:
+                paragraphs.append(para)
+            elif match.group(1) not in data:
+                missing.add(match.group(1))
+                paragraphs.append(para)
+            else:
+                paragraphs.extend(pptx_service.valid_list_items(data[match.group(1)]) or ["None"])
+        preview['paragraphs'] = paragraphs
+    elif kind == 'table':
+        rows = []
+        for row_idx, row in enumerate(shape['rows']):
+            if row_idx != shape.get('template_row'):
+                rows.append([_substitute(cell, data, missing) for cell in row])
+            elif shape['name'] not in data:
+                missing.add(shape['name'])
+                rows.append(row)
+            else:
+                columns = shape['columns']
+                rows.extend(pptx_service.normalize_table_rows(data[shape['name']], columns)
+                            or [[''] * len(columns)])
+        preview['rows'] = rows
+    else:
+        preview['paragraphs'] = [_substitute(para, data, missing) for para in shape['paragraphs']]
+    return preview
+
+
+def render_preview(model: dict, data: dict) -> dict:
+    """
+    Applies `data` to a preview model.
+
+    Slides marked with {{repeat:name}} are expanded once per row of
+    data[name]; while that list is missing, the slide is shown once with
+    the top-level data.
+
+    Returns:
+        A dict with the slide size, the previewed slides (each with the
+        index of the template slide it comes from) and the sorted names of
+        placeholders `data` has no value for yet.
+    """
+    missing = set()
+    slides = []
+    for index, slide in enumerate(model['slides'], start=1):
+        contexts = [data]
+        if slide['repeat']:
+            rows = data.get(slide['repeat'])
+            if isinstance(rows, list):
+                contexts = [pptx_service.row_context(data, row) for row in rows]
+            else:
+                missing.add(slide['repeat'])
+        for context in contexts:
+            slides.append({
+                "template_slide": index,
+                "shapes": [_preview_shape(shape, context, missing) for shape in slide['shapes']],
+            })
+    return {
+        "slide_width": model['slide_width'],
+        "slide_height": model['slide_height'],
+        "slides": slides,
+        "missing": sorted(missing),
+    }
+
+
+# --- Model Cache ---
+
+class PreviewModelCache:
+    """
+    A process-wide LRU of preview models keyed by template S3 key. Models
+    are cached parsed, so a hit costs no decoding, and are sized by the
+    length of their JSON encoding, measured once when stored. Callers must
+    treat a returned model as read-only. Like the template cache, entries
+    never go stale because keys are never reused.
+    """
+    def __init__(self, max_bytes: int):
+        self._cache = TemplateCache(max_bytes)
+
+    def get_model(self, s3_key: str, template_cache, s3_service) -> dict:
+        """
+        Returns the preview model for a template, building it from the
+        (cached) template file on a miss.
+
+        Raises:
+            S3Error: If the template has to be downloaded and the download fails.
+        """
+        model = self._cache.get(s3_key)
+        if model is None:
+            model = build_preview_model(template_cache.get_stream(s3_key, s3_service))
+            self._cache.put(s3_key, model, size=len(json.dumps(model, separators=(',', ':'))))
+        return model
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_preview_cache(app) -> PreviewModelCache:
+    """Returns the process-wide preview model cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PreviewModelCache(app.config['PREVIEW_CACHE_MAX_BYTES'])
+    return _cache
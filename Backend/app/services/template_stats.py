@@ -0,0 +1,42 @@
+"""
+Per-template statistics.
+
+Save-time statistics describe the stored file (slides, package parts,
+media bytes, placeholders by type) and how many tags the upload had split
+across runs. They are stored with the template row, next to the rolling
+render latency and peak memory written by the usage recorder, and are
+served by /api/templates/<id>/stats.
+"""
+from collections import Counter
+
+_MEDIA_CONTENT_PREFIXES = ('image/', 'video/', 'audio/')
+
+
+def package_stats(prs) -> dict:
+    """Returns the slide count, package part count and total media bytes of `prs`."""
+    part_count = media_bytes = 0
+    for part in prs.part.package.iter_parts():
+        part_count += 1
+        if part.content_type.startswith(_MEDIA_CONTENT_PREFIXES):
+            media_bytes += len(part.blob)
+    return {"slide_count": len(prs.slides), "part_count": part_count, "media_bytes": media_bytes}
+
+
+def placeholder_counts(placeholders) -> dict:
+    """Counts placeholder definitions (as stored with a template) by type."""
+    if not isinstance(placeholders, list):
+        return {}
+    return dict(Counter(
+        placeholder.get('type', 'text') for placeholder in placeholders if isinstance(placeholder, dict)
+    ))
+
+
+def save_stats(report: dict, placeholders) -> dict:
+    """
+    Builds the statistics stored with a template from its processing report
+    (see `template_pipeline.prepare_template`) and its placeholders. File
+    statistics are missing if processing failed.
+    """
+    stats = dict(report.get('stats') or {})
+    stats["placeholder_counts"] = placeholder_counts(placeholders)
+    return stats
@@ -0,0 +1,341 @@
+"""
+Server-side shrink-to-fit for substituted text.
+
+PowerPoint recomputes autofit when it opens a file, but other viewers
+(LibreOffice, browser previews, PDF converters) render the stored font
+sizes, so a long substituted value overflows its box. After substitution,
+each affected text frame is measured against its shape using real font
+metrics and, if it overflows, its run sizes are scaled down until it fits.
+
+Fonts are read from FIT_TEXT_FONTS_DIR. Font files are indexed once per
+process and glyph advances are cached per (font, size), so measuring is
+cheap enough to run on every text placeholder. A family with no file in the
+directory is measured with FIT_TEXT_DEFAULT_FONT, or Pillow's built-in font.
+"""
+import os
+import re
+import threading
+from functools import lru_cache
+
+from lxml import etree
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+
+from app.lazy_imports import lazy_module
+
+# Imported on first use; see app/lazy_imports.py
+ImageFont = lazy_module('PIL.ImageFont')
+
+_EMU_PER_PT = 12700
+# PowerPoint's single line spacing, as a multiple of the font size
+_LINE_SPACING = 1.2
+# Font size used when none is set anywhere in the inheritance chain
+_DEFAULT_SIZE_PT = 18
+# Shrinking stops once the size is within this fraction of the best fit
+_SEARCH_PRECISION = 0.01
+
+_FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc')
+_TOKEN_PATTERN = re.compile(r'\S+|\s+')
+_TITLE_PLACEHOLDERS = {'title', 'ctrTitle'}
+
+
+def fit_options(config):
+    """Returns the (picklable) fit-text options from app config, or None if disabled."""
+    if not config['FIT_TEXT_ENABLED']:
+        return None
+    return {
+        "fonts_dir": config['FIT_TEXT_FONTS_DIR'],
+        "default_font": config['FIT_TEXT_DEFAULT_FONT'],
+        "min_scale": config['FIT_TEXT_MIN_SCALE'],
+    }
+
+
+# --- Font Metrics ---
+
+class FontLibrary:
+    """Maps (family, bold, italic) to font files found under a directory."""
+    def __init__(self, fonts_dir: str):
+        self.fonts_dir = fonts_dir
+        self._files = None
+        self._lock = threading.Lock()
+
+    def _index(self) -> dict:
+        files = {}
+        for root, _, names in os.walk(self.fonts_dir or ''):
+            for name in sorted(names):
+                if not name.lower().endswith(_FONT_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    family, style = ImageFont.truetype(path, 12).getname()
+                except OSError:
+                    continue
+                style = (style or '').lower()
+                key = (family.lower(), 'bold' in style, 'italic' in style or 'oblique' in style)
+                files.setdefault(key, path)
+        return files
+
+    def find(self, family: str, bold: bool, italic: bool):
+        """Returns the best matching font file for `family`, or None."""
+        if self._files is None:
+            with self._lock:
+                if self._files is None:
+                    self._files = self._index()
+        if not family:
+            return None
+        family = family.lower()
+        for key in ((family, bold, italic), (family, bold, False), (family, False, False)):
+            if key in self._files:
+                return self._files[key]
+        return None
+
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+def get_font_library(fonts_dir: str) -> FontLibrary:
+    """Returns the process-wide library for `fonts_dir`."""
+    with _libraries_lock:
+        if fonts_dir not in _libraries:
+            _libraries[fonts_dir] = FontLibrary(fonts_dir)
+        return _libraries[fonts_dir]
+
+
+class FontMetrics:
+    """Glyph advances of one font at one size, filled in as characters are seen."""
+    def __init__(self, path, size: int):
+        self.font = ImageFont.truetype(path, size) if path else ImageFont.load_default(size)
+        self._widths = {}
+
+    def width(self, text: str) -> float:
+        widths = self._widths
+        total = 0.0
+        for char in text:
+            advance = widths.get(char)
+            if advance is None:
+                advance = widths[char] = self.font.getlength(char)
+            total += advance
+        return total
+
+
+@lru_cache(maxsize=1024)
+def font_metrics(path, size: int) -> FontMetrics:
+    """Returns the cached metrics for a font file (None: built-in font) at an integer size."""
+    return FontMetrics(path, size)
+
+
+def measure(path, size_pt: float, text: str) -> float:
+    """Width of `text` in points. Metrics are cached per whole point size and scaled."""
+    base = max(1, round(size_pt))
+    return font_metrics(path, base).width(text) * size_pt / base
+
+
+# --- Text Properties ---
+
+def _theme_fonts(master_part, cache: dict) -> dict:
+    """Returns {'+mj-lt': major latin typeface, '+mn-lt': minor latin typeface} for a master."""
+    if master_part not in cache:
+        fonts = {}
+        try:
+            theme = etree.fromstring(master_part.part_related_by(RT.THEME).blob)
+            for key, tag in (('+mj-lt', 'a:majorFont'), ('+mn-lt', 'a:minorFont')):
+                latin = theme.find(f".//{qn(tag)}/{qn('a:latin')}")
+                if latin is not None:
+                    fonts[key] = latin.get('typeface')
+        except (KeyError, etree.XMLSyntaxError):
+            pass
+        cache[master_part] = fonts
+    return cache[master_part]
+
+
+def _level_defaults(lst_style, level: int) -> dict:
+    """Reads sz/b/i/typeface from a list style's lvlNpPr/defRPr."""
+    if lst_style is None:
+        return {}
+    def_rpr = lst_style.find(f"{qn(f'a:lvl{level + 1}pPr')}/{qn('a:defRPr')}")
+    if def_rpr is None:
+        return {}
+    defaults = {}
+    if def_rpr.get('sz'):
+        defaults['size'] = int(def_rpr.get('sz')) / 100
+    if def_rpr.get('b') is not None:
+        defaults['bold'] = def_rpr.get('b') in ('1', 'true')
+    if def_rpr.get('i') is not None:
+        defaults['italic'] = def_rpr.get('i') in ('1', 'true')
+    latin = def_rpr.find(qn('a:latin'))
+    if latin is not None:
+        defaults['family'] = latin.get('typeface')
+    return defaults
+
+
+def _inherited_defaults(shape, level: int) -> dict:
+    """
+    Resolves run defaults for paragraphs at `level` of `shape`: its own list
+    style, then the layout and master placeholders it inherits from, then
+    the master's title/body/other text style.
+    """
+    defaults = {}
+    def inherit(lst_style):
+        for key, value in _level_defaults(lst_style, level).items():
+            defaults.setdefault(key, value)
+
+    source = shape
+    while source is not None:
+        tx_body = source._element.find(f".//{qn('p:txBody')}")
+        inherit(tx_body.find(qn('a:lstStyle')) if tx_body is not None else None)
+        source = getattr(source, '_base_placeholder', None) if source.is_placeholder else None
+
+    master = shape.part.slide_layout.slide_master if hasattr(shape.part, 'slide_layout') else None
+    if master is not None:
+        if shape.is_placeholder:
+            ph_type = shape._element.ph.get('type', 'body') if shape._element.ph is not None else 'body'
+            style = 'p:titleStyle' if ph_type in _TITLE_PLACEHOLDERS else 'p:bodyStyle'
+        else:
+            style = 'p:otherStyle'
+        inherit(master._element.find(f"{qn('p:txStyles')}/{qn(style)}"))
+    return defaults
+
+
+def _paragraph_level(p_element) -> int:
+    p_pr = p_element.find(qn('a:pPr'))
+    return int(p_pr.get('lvl', 0)) if p_pr is not None else 0
+
+
+# --- Layout Model ---
+
+def _collect_paragraphs(shape, library: FontLibrary, options: dict, theme_cache: dict) -> list:
+    """
+    Returns, per paragraph, a list of [kind, text, font_path, size_pt, r_element]
+    pieces; kind is 'text' or 'break'.
+    """
+    master_part = None
+    if hasattr(shape.part, 'slide_layout'):
+        master_part = shape.part.slide_layout.slide_master.part
+    theme_fonts = _theme_fonts(master_part, theme_cache) if master_part is not None else {}
+    default_path = library.find(options['default_font'], False, False)
+
+    paragraphs = []
+    for p_element in shape.text_frame._txBody.iter(qn('a:p')):
+        inherited = _inherited_defaults(shape, _paragraph_level(p_element))
+        pieces = []
+        for child in p_element:
+            if child.tag == qn('a:br'):
+                pieces.append(['break', '', None, 0, None])
+                continue
+            if child.tag not in (qn('a:r'), qn('a:fld')):
+                continue
+            r_pr = child.find(qn('a:rPr'))
+            get = (lambda attr: r_pr.get(attr)) if r_pr is not None else (lambda attr: None)
+            size = int(get('sz')) / 100 if get('sz') else inherited.get('size', _DEFAULT_SIZE_PT)
+            bold = get('b') in ('1', 'true') if get('b') is not None else inherited.get('bold', False)
+            italic = get('i') in ('1', 'true') if get('i') is not None else inherited.get('italic', False)
+            latin = r_pr.find(qn('a:latin')) if r_pr is not None else None
+            family = latin.get('typeface') if latin is not None else inherited.get('family', '+mn-lt')
+            family = theme_fonts.get(family, family)
+            path = library.find(family, bold, italic) or default_path
+            t = child.find(qn('a:t'))
+            pieces.append(['text', (t.text or '') if t is not None else '', path, size, child])
+        if not pieces:
+            inherited_size = inherited.get('size', _DEFAULT_SIZE_PT)
+            pieces.append(['text', '', default_path, inherited_size, None])
+        paragraphs.append(pieces)
+    return paragraphs
+
+
+def _text_height(paragraphs: list, scale: float, width: float, wrap: bool) -> tuple:
+    """
+    Lays the paragraphs out greedily at `scale` and returns (height, widest
+    line) in points.
+    """
+    height = widest = 0.0
+    for pieces in paragraphs:
+        line_width = line_size = 0.0
+        pending_space = 0.0
+        lines = []
+        for kind, text, path, size, _ in pieces:
+            size *= scale
+            if kind == 'break':
+                lines.append((line_width, line_size or size))
+                line_width = line_size = pending_space = 0.0
+                continue
+            line_size = max(line_size, size)
+            for token in _TOKEN_PATTERN.findall(text):
+                token_width = measure(path, size, token)
+                if token.isspace():
+                    pending_space += token_width
+                    continue
+                if wrap and line_width and line_width + pending_space + token_width > width:
+                    lines.append((line_width, line_size))
+                    line_width, pending_space = 0.0, 0.0
+                    line_size = size
+                line_width += pending_space + token_width
+                pending_space = 0.0
+                if wrap and line_width > width:
+                    # A single word wider than the box wraps mid-word
+                    extra_lines = int(line_width // width)
+                    lines.extend([(width, size)] * extra_lines)
+                    line_width -= extra_lines * width
+        lines.append((line_width, line_size))
+        for line_width, line_size in lines:
+            height += line_size * _LINE_SPACING
+            widest = max(widest, line_width)
+    return height, widest
+
+
+def _fits(paragraphs, scale, width, height, wrap) -> bool:
+    text_height, widest = _text_height(paragraphs, scale, width, wrap)
+    return text_height <= height and (wrap or widest <= width)
+
+
+def fit_text_frame(shape, options: dict, theme_cache: dict = None):
+    """
+    Shrinks the runs of `shape`'s text frame so the text fits the shape.
+    Text that already fits is left alone, and sizes never drop below
+    `min_scale` times their original size.
+
+    Args:
+        shape: A shape with a text frame.
+        options: The result of `fit_options`.
+        theme_cache: Optional dict shared between calls on one presentation.
+
+    Returns:
+        The scale applied, or None if the text was left unchanged.
+    """
+    text_frame = shape.text_frame
+    body_pr = text_frame._txBody.find(qn('a:bodyPr'))
+    if body_pr is not None and body_pr.get('vert') not in (None, 'horz'):
+        return None  # Vertical text is not measured
+    if not shape.width or not shape.height:
+        return None
+
+    width = (shape.width - text_frame.margin_left - text_frame.margin_right) / _EMU_PER_PT
+    height = (shape.height - text_frame.margin_top - text_frame.margin_bottom) / _EMU_PER_PT
+    if width <= 0 or height <= 0:
+        return None
+    wrap = text_frame.word_wrap is not False
+
+    library = get_font_library(options['fonts_dir'])
+    paragraphs = _collect_paragraphs(shape, library, options, theme_cache if theme_cache is not None else {})
+    if _fits(paragraphs, 1.0, width, height, wrap):
+        return None
+
+    low, high = options['min_scale'], 1.0
+    if _fits(paragraphs, low, width, height, wrap):
+        while high - low > _SEARCH_PRECISION:
+            middle = (low + high) / 2
+            if _fits(paragraphs, middle, width, height, wrap):
+                low = middle
+            else:
+                high = middle
+    scale = low
+
+    for pieces in paragraphs:
+        for kind, _, _, size, r_element in pieces:
+            if kind == 'text' and r_element is not None:
+                r_pr = r_element.find(qn('a:rPr'))
+                if r_pr is None:
+                    r_pr = etree.Element(qn('a:rPr'))
+                    r_element.insert(0, r_pr)
+                # Font sizes are stored in hundredths of a point
+                r_pr.set('sz', str(max(100, int(size * scale * 100))))
+    return scale
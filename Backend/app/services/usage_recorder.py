@@ -0,0 +1,177 @@
+"""
+Batched recording of template usage counters.
+
+Bumping `generation_count` inline costs a database round trip per
+generation. Counts are instead accumulated in memory and written by a
+background thread in one statement every USAGE_FLUSH_INTERVAL_SECONDS.
+Counts still pending when a worker is killed are lost, which is acceptable
+for a warm-up popularity signal.
+
+Render latency and peak memory samples are batched the same way and fold
+into per-template exponentially weighted averages (render_ms_avg,
+render_peak_bytes). The recorder also keeps those averages in memory, so
+admission control can predict a template's cost as soon as this process
+has rendered it once.
+"""
+import threading
+from collections import Counter
+
+from app.lazy_imports import lazy_module
+
+# Imported on first use; see app/lazy_imports.py
+psycopg2 = lazy_module('psycopg2')
+psycopg2_extras = lazy_module('psycopg2.extras')
+
+
+class UsageRecorder:
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config['USAGE_FLUSH_INTERVAL_SECONDS']
+        self._lock = threading.Lock()
+        self.smoothing = app.config['RENDER_STATS_SMOOTHING']
+        self._pending = Counter()
+        # template_id -> [samples, total milliseconds, peak bytes samples, total peak bytes]
+        self._pending_renders = {}
+        # template_id -> (render_ms_avg, render_peak_bytes) seen by this process
+        self._rolling = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def record(self, template_ids):
+        """Counts one generation for each id in `template_ids`."""
+        with self._lock:
+            self._pending.update(template_ids)
+            self._ensure_thread()
+
+    def record_render(self, template_id: int, seconds: float, peak_bytes: int = None):
+        """Adds a render latency (and, when measured, peak memory) sample for a template."""
+        milliseconds = seconds * 1000
+        with self._lock:
+            pending = self._pending_renders.setdefault(template_id, [0, 0.0, 0, 0])
+            pending[0] += 1
+            pending[1] += milliseconds
+            if peak_bytes is not None:
+                pending[2] += 1
+                pending[3] += peak_bytes
+
+            average_ms, average_peak = self._rolling.get(template_id, (None, None))
+            average_ms = self._smooth(average_ms, milliseconds)
+            if peak_bytes is not None:
+                average_peak = self._smooth(average_peak, peak_bytes)
+            self._rolling[template_id] = (average_ms, average_peak)
+            self._ensure_thread()
+
+    def _smooth(self, average, sample):
+        return sample if average is None else average + self.smoothing * (sample - average)
+
+    def predicted_peak_bytes(self, template_id: int):
+        """Returns this process's rolling peak memory for a template, or None if unknown."""
+        with self._lock:
+            return self._rolling.get(template_id, (None, None))[1]
+
+    def _ensure_thread(self):
+        # Called with the lock held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='usage-recorder', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """Writes the pending counts; on failure they are kept for the next flush."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            renders, self._pending_renders = self._pending_renders, {}
+        if not pending and not renders:
+            return
+
+        from app import get_db_pool
+        try:
+            with self.app.app_context():
+                pool = get_db_pool()
+                conn = pool.getconn()
+                try:
+                    with conn.cursor() as cur:
+                        if pending:
+                            psycopg2_extras.execute_values(
+                                cur,
+                                """
+                                UPDATE templates AS t
+                                SET generation_count = t.generation_count + v.uses,
+                                    last_generated_at = CURRENT_TIMESTAMP
+                                FROM (VALUES %s) AS v(id, uses)
+                                WHERE t.id = v.id
+                                """,
+                                list(pending.items())
+                            )
+                        if renders:
+                            self._flush_renders(cur, renders)
+                    conn.commit()
+                finally:
+                    conn.rollback()
+                    pool.putconn(conn)
+        except Exception as e:
+            self.app.logger.warning(f"Could not record template usage, will retry: {e}")
+            with self._lock:
+                self._pending.update(pending)
+                for template_id, sample in renders.items():
+                    merged = self._pending_renders.setdefault(template_id, [0, 0.0, 0, 0])
+                    for index, value in enumerate(sample):
+                        merged[index] += value
+
+    def _flush_renders(self, cur, renders: dict):
+        """
+        Folds each template's batch of render samples into its stored
+        averages. A batch counts as one sample of its mean, which keeps the
+        update to a single statement.
+        """
+        rows = [
+            (template_id, samples, total_ms / samples, round(total_peak / peak_samples) if peak_samples else None)
+            for template_id, (samples, total_ms, peak_samples, total_peak) in renders.items()
+        ]
+        alpha = float(self.smoothing)
+        psycopg2_extras.execute_values(
+            cur,
+            f"""
+            UPDATE templates AS t
+            SET render_samples = t.render_samples + v.samples,
+                render_ms_avg = CASE WHEN t.render_ms_avg IS NULL THEN v.ms
+                                     ELSE t.render_ms_avg + {alpha} * (v.ms - t.render_ms_avg) END,
+                render_peak_bytes = CASE WHEN v.peak IS NULL THEN t.render_peak_bytes
+                                         WHEN t.render_peak_bytes IS NULL THEN v.peak
+                                         ELSE round(t.render_peak_bytes + {alpha} * (v.peak - t.render_peak_bytes)) END
+            FROM (VALUES %s) AS v(id, samples, ms, peak)
+            WHERE t.id = v.id
+            """,
+            rows,
+            template="(%s, %s, %s::float8, %s::bigint)"
+        )
+
+    def stop(self):
+        """Stops the background thread and writes whatever is pending."""
+        self._stop.set()
+        self.flush()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+def get_usage_recorder(app) -> UsageRecorder:
+    """Returns the process-wide usage recorder."""
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = UsageRecorder(app)
+    return _recorder
+
+
+def shutdown_usage_recorder():
+    """Flushes and stops the process-wide recorder, if one was started."""
+    global _recorder
+    with _recorder_lock:
+        recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.stop()
@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+from app import get_db, get_s3
+from app.lazy_imports import preload_heavy_modules
+from app.services.template_cache import get_template_cache
+
+
+def warm_connections():
+    """
+    Opens the DB pool and the S3 client so the first request does not pay
+    for connection setup. Must run inside an application context.
+    """
+    try:
+        db = get_db()
+        with db.cursor() as cur:
+            cur.execute("SELECT 1")
+        current_app.logger.info("[warmup] Database pool ready.")
+    except Exception as e:
+        current_app.logger.warning(f"[warmup] Database warm-up failed: {e}")
+
+    try:
+        s3 = get_s3()
+        # A cheap authenticated call that also establishes the TLS connection
+        s3.s3_client.head_bucket(Bucket=s3.bucket_name)
+        current_app.logger.info("[warmup] S3 client ready.")
+    except Exception as e:
+        current_app.logger.warning(f"[warmup] S3 warm-up failed: {e}")
+
+
+def warm_template_cache(template_count: int) -> int:
+    """
+    Downloads the `template_count` most frequently generated templates into
+    the process-wide template cache. Must run inside an application context.
+
+    Returns:
+        The number of templates loaded into the cache.
+    """
+    if template_count <= 0:
+        return 0
+
+    try:
+        db = get_db()
+        with db.cursor() as cur:
+            cur.execute(
+                """
+                SELECT s3_key FROM templates
+                WHERE deleted_at IS NULL
+                ORDER BY generation_count DESC, created_at DESC
+                LIMIT %s
+                """,
+                (template_count,)
+            )
+            s3_keys = [row[0] for row in cur.fetchall()]
+        s3 = get_s3()
+    except Exception as e:
+        current_app.logger.warning(f"[warmup] Could not list templates to warm: {e}")
+        return 0
+
+    cache = get_template_cache(current_app)
+
+    def _load(s3_key):
+        try:
+            cache.get_stream(s3_key, s3)
+            return True
+        except Exception as e:
+            current_app.logger.warning(f"[warmup] Failed to cache template {s3_key}: {e}")
+            return False
+
+    app = current_app._get_current_object()
+
+    def _load_in_context(s3_key):
+        with app.app_context():
+            return _load(s3_key)
+
+    with ThreadPoolExecutor(max_workers=min(8, len(s3_keys) or 1)) as executor:
+        loaded = sum(executor.map(_load_in_context, s3_keys))
+
+    current_app.logger.info(f"[warmup] Cached {loaded}/{len(s3_keys)} templates.")
+    return loaded
+
+
+def warm_up(app, template_count: int = None):
+    """
+    Runs the full warm-up sequence for `app`: imports the lazily loaded
+    heavy modules, opens connections and fills the template cache.
+    """
+    if template_count is None:
+        template_count = app.config['WARMUP_TEMPLATE_COUNT']
+    preload_heavy_modules()
+    with app.app_context():
+        warm_connections()
+        warm_template_cache(template_count)
+
+
+def start_worker(app):
+    """
+    Prepares a freshly started server worker: opens its connections, starts
+    its metadata cache listener and spawns its render pool. Used by both
+    gunicorn (post_fork) and the ASGI app's startup.
+    """
+    from app.services.metadata_cache import get_metadata_cache
+    from app.services.render_pool import get_render_pool
+
+    with app.app_context():
+        warm_connections()
+        # Starts this worker's LISTEN thread for metadata invalidations
+        get_metadata_cache(app)
+
+    render_pool = get_render_pool(app)
+    if render_pool is not None:
+        render_pool.warm()
+
+
+def stop_worker():
+    """Shuts down a worker's render pool and flushes its usage counters."""
+    from app.services.render_pool import shutdown_render_pool
+    from app.services.usage_recorder import shutdown_usage_recorder
+
+    shutdown_render_pool()
+    shutdown_usage_recorder()
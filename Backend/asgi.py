@@ -0,0 +1,12 @@
+# ASGI entry point, an alternative to gunicorn for I/O-heavy deployments.
+#
+# Usage: uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers N
+#
+# The I/O-bound endpoints run on the event loop; everything else is served
+# by the Flask app on a thread pool. See app/asgi_api/__init__.py.
+
+from app import create_app
+from app.asgi_api import create_asgi_app
+
+flask_app = create_app()
+app = create_asgi_app(flask_app)
@@ -24,7 +24,198 @@ class Config:
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
     AWS_REGION = os.environ.get('AWS_REGION') or 'us-east-1' # Default region
+    # Optional S3-compatible endpoint (e.g. MinIO or LocalStack for local runs)
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
     
     # image api
     # Pexels API Configuration
-    PEXELS_API_KEY = os.environ.get('PEXELS_API_KEY')
\ No newline at end of file
+    PEXELS_API_KEY = os.environ.get('PEXELS_API_KEY')
+    
+    # Image Search Configuration
+    # Comma-separated providers queried by /api/images/search, in the order
+    # their results are interleaved: pexels, picsum, library (images under
+    # ASSET_LIBRARY_PREFIX in the S3 bucket) and stub (canned results, no
+    # network). Providers that have not answered within
+    # IMAGE_SEARCH_TIMEOUT_SECONDS are left out of the response.
+    IMAGE_SEARCH_PROVIDERS_STR = os.environ.get('IMAGE_SEARCH_PROVIDERS') or 'pexels'
+    IMAGE_SEARCH_PROVIDERS = [name.strip() for name in IMAGE_SEARCH_PROVIDERS_STR.split(',') if name.strip()]
+    IMAGE_SEARCH_TIMEOUT_SECONDS = float(os.environ.get('IMAGE_SEARCH_TIMEOUT_SECONDS', 3))
+    IMAGE_SEARCH_RESULTS = int(os.environ.get('IMAGE_SEARCH_RESULTS', 15))
+    ASSET_LIBRARY_PREFIX = os.environ.get('ASSET_LIBRARY_PREFIX', 'library/')
+    ASSET_LIBRARY_LISTING_TTL_SECONDS = float(os.environ.get('ASSET_LIBRARY_LISTING_TTL_SECONDS', 300))
+    
+    # On-demand Profiling Configuration
+    # Profiling hooks are only registered when this is enabled AND an admin
+    # token is set. Requests opt in with the X-Profile-Request header.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_ADMIN_TOKEN = os.environ.get('PROFILING_ADMIN_TOKEN')
+    PROFILING_MIN_INTERVAL_SECONDS = float(os.environ.get('PROFILING_MIN_INTERVAL_SECONDS', 60))
+    PROFILING_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILING_SAMPLE_INTERVAL_MS', 5))
+    PROFILING_OUTPUT_DIR = os.environ.get('PROFILING_OUTPUT_DIR') or '/tmp/pptx_profiles'
+    
+    # Memory Reporting Configuration
+    # When enabled, tracemalloc runs for the life of each worker and every
+    # response carries X-Memory-Peak-Bytes (the request's allocation peak)
+    # and X-Memory-Peak-Scope ('request'; 'shared' when it overlapped
+    # other requests; 'unreliable' when the peak was reset during it, by a
+    # profiled request or a new window). Overlapping requests share a
+    # window that is reset once it is MEMORY_REPORT_WINDOW_SECONDS old, so
+    # a busy worker's peak does not stay at its all-time high (0 disables
+    # this). Requests peaking at MEMORY_REPORT_LOG_BYTES or more
+    # are logged (0 disables logging). tracemalloc slows allocation-heavy
+    # code severalfold, so leave this off unless investigating memory.
+    MEMORY_REPORT_ENABLED = os.environ.get('MEMORY_REPORT_ENABLED', 'false').lower() == 'true'
+    MEMORY_REPORT_LOG_BYTES = int(os.environ.get('MEMORY_REPORT_LOG_BYTES', 256 * 1024 * 1024))
+    MEMORY_REPORT_WINDOW_SECONDS = float(os.environ.get('MEMORY_REPORT_WINDOW_SECONDS', 30))
+    
+    # Template Limits Configuration
+    # Checked from the .pptx ZIP directory (and image headers) before a
+    # template is parsed on upload, save, import and generation; files over
+    # a limit are rejected with a 413. 0 disables a limit.
+    TEMPLATE_MAX_UNCOMPRESSED_BYTES = int(os.environ.get('TEMPLATE_MAX_UNCOMPRESSED_BYTES', 256 * 1024 * 1024))
+    TEMPLATE_MAX_PARTS = int(os.environ.get('TEMPLATE_MAX_PARTS', 5000))
+    TEMPLATE_MAX_SLIDES = int(os.environ.get('TEMPLATE_MAX_SLIDES', 500))
+    TEMPLATE_MAX_IMAGE_PIXELS = int(os.environ.get('TEMPLATE_MAX_IMAGE_PIXELS', 50_000_000))
+    
+    # Database Connection Pool Configuration
+    # Keep the maximum at or above the number of threads per worker.
+    DB_POOL_MIN_CONNECTIONS = int(os.environ.get('DB_POOL_MIN_CONNECTIONS', 1))
+    DB_POOL_MAX_CONNECTIONS = int(os.environ.get('DB_POOL_MAX_CONNECTIONS', 10))
+    
+    # Template Cache Configuration
+    # In-process LRU of template file bytes, warmed at boot with the
+    # WARMUP_TEMPLATE_COUNT most frequently generated templates.
+    TEMPLATE_CACHE_MAX_BYTES = int(os.environ.get('TEMPLATE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    WARMUP_TEMPLATE_COUNT = int(os.environ.get('WARMUP_TEMPLATE_COUNT', 10))
+    
+    # List Rendering Configuration
+    # Maximum items per slide for {{list:...}} placeholders; overflow items go
+    # onto duplicated continuation slides. 0 disables splitting. Can be
+    # overridden per request with 'listItemsPerSlide'.
+    LIST_ITEMS_PER_SLIDE = int(os.environ.get('LIST_ITEMS_PER_SLIDE', 0))
+    
+    # Live Preview Configuration
+    # Byte budget for the per-process cache of parsed template preview models
+    # used by /api/templates/<id>/preview.
+    PREVIEW_CACHE_MAX_BYTES = int(os.environ.get('PREVIEW_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    
+    # Text Fitting Configuration
+    # When enabled, text frames that received substituted text are measured
+    # with the fonts in FIT_TEXT_FONTS_DIR and shrunk (down to
+    # FIT_TEXT_MIN_SCALE of their size) so they fit their shapes in viewers
+    # that do not apply autofit. Families with no font file are measured
+    # with FIT_TEXT_DEFAULT_FONT.
+    FIT_TEXT_ENABLED = os.environ.get('FIT_TEXT_ENABLED', 'false').lower() == 'true'
+    FIT_TEXT_FONTS_DIR = os.environ.get('FIT_TEXT_FONTS_DIR', '/usr/share/fonts')
+    FIT_TEXT_DEFAULT_FONT = os.environ.get('FIT_TEXT_DEFAULT_FONT', 'Carlito')
+    FIT_TEXT_MIN_SCALE = float(os.environ.get('FIT_TEXT_MIN_SCALE', 0.5))
+    
+    # Deck Assembly Configuration
+    # Maximum number of (template, data) sections accepted by /api/generate/deck.
+    MAX_DECK_SECTIONS = int(os.environ.get('MAX_DECK_SECTIONS', 50))
+    
+    # Render Execution Configuration
+    # 'thread' renders inside the request thread. 'process' hands renders to a
+    # per-worker process pool so throughput scales with cores instead of
+    # serializing on the GIL. Pool size 0 means one process per CPU; queue
+    # size 0 means twice the pool size. Template bytes are handed to the pool
+    # through files in RENDER_POOL_TEMP_DIR (defaults to /dev/shm).
+    # Measuring a render's peak memory costs a full GC and heap trim in the
+    # pool process first, so a template is measured on every render until
+    # its peak is known and then on one render in RENDER_PEAK_SAMPLE_EVERY
+    # (0 stops re-measuring).
+    RENDER_MODE = os.environ.get('RENDER_MODE', 'thread').lower()
+    RENDER_POOL_WORKERS = int(os.environ.get('RENDER_POOL_WORKERS', 0))
+    RENDER_POOL_MAX_QUEUE = int(os.environ.get('RENDER_POOL_MAX_QUEUE', 0))
+    RENDER_TASK_TIMEOUT_SECONDS = float(os.environ.get('RENDER_TASK_TIMEOUT_SECONDS', 60))
+    RENDER_POOL_TEMP_DIR = os.environ.get('RENDER_POOL_TEMP_DIR') or None
+    RENDER_PEAK_SAMPLE_EVERY = int(os.environ.get('RENDER_PEAK_SAMPLE_EVERY', 20))
+    
+    # Admission Control Configuration
+    # Generation requests are admitted against both a concurrent job limit
+    # and an estimated-bytes-in-flight limit (template size x memory factor,
+    # raised to the template's measured peak x headroom once renders of it
+    # have been measured in process mode). Measurement is one-directional:
+    # it can only raise an estimate, never lower it below the size-based
+    # one, so ADMISSION_MEMORY_FACTOR alone sets the floor and must suit
+    # your own templates (8 was tuned on a single workload). Requests that
+    # don't fit wait in a short queue, then get a 503 with Retry-After.
+    # ADMISSION_MAX_JOBS 0
+    # means the render pool size in process mode, or 2 in thread mode.
+    ADMISSION_MAX_JOBS = int(os.environ.get('ADMISSION_MAX_JOBS', 0))
+    ADMISSION_MAX_BYTES_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_BYTES_IN_FLIGHT', 1024 * 1024 * 1024))
+    ADMISSION_MEMORY_FACTOR = float(os.environ.get('ADMISSION_MEMORY_FACTOR', 8))
+    ADMISSION_MEASURED_HEADROOM = float(os.environ.get('ADMISSION_MEASURED_HEADROOM', 1.25))
+    ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', 8))
+    ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get('ADMISSION_MAX_WAIT_SECONDS', 2))
+    ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', 2))
+    
+    # Template Metadata Cache Configuration
+    # Template rows are cached per worker and invalidated through Postgres
+    # LISTEN/NOTIFY (see the trigger in db_setup.py). Usage counters are
+    # written in batches every USAGE_FLUSH_INTERVAL_SECONDS.
+    TEMPLATE_METADATA_CACHE_ENABLED = os.environ.get('TEMPLATE_METADATA_CACHE_ENABLED', 'true').lower() == 'true'
+    TEMPLATE_METADATA_CACHE_MAX_ENTRIES = int(os.environ.get('TEMPLATE_METADATA_CACHE_MAX_ENTRIES', 10000))
+    USAGE_FLUSH_INTERVAL_SECONDS = float(os.environ.get('USAGE_FLUSH_INTERVAL_SECONDS', 10))
+    # Weight of each new batch in the rolling render latency/peak memory
+    # averages kept per template
+    RENDER_STATS_SMOOTHING = float(os.environ.get('RENDER_STATS_SMOOTHING', 0.2))
+    
+    # Bulk Template Operations Configuration
+    # Maximum ids per bulk trash/restore/purge request, and how many S3
+    # copies each request runs at once. The S3 client's connection pool
+    # must be at least as large as the copy concurrency.
+    BULK_MAX_IDS = int(os.environ.get('BULK_MAX_IDS', 1000))
+    BULK_S3_CONCURRENCY = int(os.environ.get('BULK_S3_CONCURRENCY', 16))
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 32))
+    
+    # Bulk Import Configuration
+    # Limits for ZIP archives posted to /api/templates/import. Analysis runs
+    # on the render pool in process mode, otherwise on this many threads
+    # (0 means one per CPU).
+    IMPORT_MAX_FILES = int(os.environ.get('IMPORT_MAX_FILES', 100))
+    IMPORT_MAX_UNCOMPRESSED_BYTES = int(os.environ.get('IMPORT_MAX_UNCOMPRESSED_BYTES', 500 * 1024 * 1024))
+    IMPORT_ANALYSIS_WORKERS = int(os.environ.get('IMPORT_ANALYSIS_WORKERS', 0))
+    
+    # Remote Image Import Configuration
+    # Images imported from URLs (/api/assets/upload_from_url[s]) are streamed
+    # with a byte ceiling and a per-request timeout. Multi-URL imports accept
+    # up to REMOTE_IMAGE_MAX_URLS URLs and fetch REMOTE_IMAGE_CONCURRENCY at
+    # once over a shared, pooled HTTP session.
+    REMOTE_IMAGE_MAX_BYTES = int(os.environ.get('REMOTE_IMAGE_MAX_BYTES', 20 * 1024 * 1024))
+    REMOTE_IMAGE_TIMEOUT_SECONDS = float(os.environ.get('REMOTE_IMAGE_TIMEOUT_SECONDS', 10))
+    REMOTE_IMAGE_MAX_URLS = int(os.environ.get('REMOTE_IMAGE_MAX_URLS', 20))
+    REMOTE_IMAGE_CONCURRENCY = int(os.environ.get('REMOTE_IMAGE_CONCURRENCY', 10))
+    
+    # ASGI Serving Configuration
+    # Used when serving asgi:app with uvicorn. The I/O-bound endpoints
+    # (image search, URL imports, asset view URLs, single-template trash
+    # and restore) run on the event loop over these connection pools, so
+    # one worker can hold many requests waiting on Pexels, S3 or Postgres;
+    # every other endpoint runs on ASGI_WSGI_THREADS threads of the Flask app.
+    ASYNC_DB_POOL_MIN_CONNECTIONS = int(os.environ.get('ASYNC_DB_POOL_MIN_CONNECTIONS', 1))
+    ASYNC_DB_POOL_MAX_CONNECTIONS = int(os.environ.get('ASYNC_DB_POOL_MAX_CONNECTIONS', 20))
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get('ASYNC_HTTP_MAX_CONNECTIONS', 200))
+    ASYNC_S3_MAX_POOL_CONNECTIONS = int(os.environ.get('ASYNC_S3_MAX_POOL_CONNECTIONS', 100))
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 16))
+    
+    # Image Derivative Configuration
+    # Per-worker LRU of resized asset previews and template thumbnails,
+    # in front of the copies stored under derivatives/ in S3.
+    DERIVATIVE_CACHE_MAX_BYTES = int(os.environ.get('DERIVATIVE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    
+    # Template Normalization Configuration
+    # Saved templates get adjacent runs with identical formatting merged and
+    # tags split across runs moved into a single run, so generation can
+    # always replace tags run by run.
+    TEMPLATE_NORMALIZATION_ENABLED = os.environ.get('TEMPLATE_NORMALIZATION_ENABLED', 'true').lower() == 'true'
+    
+    # Template Compaction Configuration
+    # When enabled, saved templates lose unused layouts/masters and
+    # unreferenced media, and JPEG/PNG media of at least
+    # COMPACTION_MEDIA_MIN_BYTES is downscaled to COMPACTION_MEDIA_MAX_DIMENSION
+    # pixels and re-encoded. Can be overridden per save with the 'compact' field.
+    TEMPLATE_COMPACTION_ENABLED = os.environ.get('TEMPLATE_COMPACTION_ENABLED', 'false').lower() == 'true'
+    COMPACTION_MEDIA_MIN_BYTES = int(os.environ.get('COMPACTION_MEDIA_MIN_BYTES', 512 * 1024))
+    COMPACTION_MEDIA_MAX_DIMENSION = int(os.environ.get('COMPACTION_MEDIA_MAX_DIMENSION', 2560))
+    COMPACTION_JPEG_QUALITY = int(os.environ.get('COMPACTION_JPEG_QUALITY', 85))
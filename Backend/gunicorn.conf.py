@@ -0,0 +1,69 @@
+# Gunicorn configuration for production deployments.
+#
+# Usage: gunicorn -c gunicorn.conf.py main:app
+#
+# The app is imported once in the master process (preload_app) and the
+# template cache is warmed there, so every forked worker starts with the
+# most used templates already in memory. Sockets (DB pool, S3 client) are
+# closed in the master before forking and re-opened in each worker.
+
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+
+# --- Worker Sizing ---
+# gthread workers: processes for CPU-bound rendering, threads for the
+# I/O waits on S3 and Postgres.
+_cpu_count = multiprocessing.cpu_count()
+if os.environ.get('RENDER_MODE', 'thread').lower() == 'process':
+    # Rendering runs in each worker's process pool, so a couple of worker
+    # processes with more threads is enough to keep every core busy. The
+    # cores are split between the workers' pools.
+    workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+    threads = int(os.environ.get('GUNICORN_THREADS', 16))
+    os.environ.setdefault('RENDER_POOL_WORKERS', str(max(1, _cpu_count // workers)))
+else:
+    workers = int(os.environ.get('WEB_CONCURRENCY', _cpu_count * 2 + 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth from large decks
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before workers fork."""
+    from main import app
+    from app import reset_process_resources
+    from app.services.warmup import warm_up
+
+    server.log.info("Warming template cache before forking workers...")
+    warm_up(app)
+    # Connections opened during warm-up must not leak into the workers
+    reset_process_resources()
+
+
+def post_fork(server, worker):
+    """Runs in each worker right after it is forked."""
+    from main import app
+    from app.services.warmup import start_worker
+
+    start_worker(app)
+
+
+def worker_exit(server, worker):
+    """Runs in each worker as it shuts down."""
+    from app.services.warmup import stop_worker
+
+    stop_worker()
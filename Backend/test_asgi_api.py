@@ -0,0 +1,140 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+# The ASGI serving mode's dependencies are optional for the WSGI deployment
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+httpx = pytest.importorskip('httpx')
+asyncpg = pytest.importorskip('asyncpg')
+
+from starlette.testclient import TestClient
+
+from app import create_app
+from app.asgi_api import create_asgi_app
+from app.asgi_api.resources import AsyncResources
+from app.services import image_search_service
+from app.services.s3_service import S3Error, S3UploadError
+from config import Config
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+class AsgiTestConfig(Config):
+    IMAGE_SEARCH_PROVIDERS = ['stub']
+    TEMPLATE_METADATA_CACHE_ENABLED = False
+
+
+def serve_image(request):
+    if request.url.path == '/missing.png':
+        return httpx.Response(404)
+    if request.url.path == '/page.html':
+        return httpx.Response(200, content=b'<html></html>')
+    return httpx.Response(200, content=PNG)
+
+
+@pytest.fixture
+def resources():
+    s3 = AsyncMock()
+    s3.upload_bytes.side_effect = lambda data, s3_key, content_type: s3_key
+    return AsyncResources(http=httpx.AsyncClient(transport=httpx.MockTransport(serve_image)),
+                          db=AsyncMock(), s3=s3)
+
+
+@pytest.fixture
+def client(monkeypatch, resources):
+    monkeypatch.setattr(image_search_service, '_providers', None)
+    asgi_app = create_asgi_app(create_app(AsgiTestConfig))
+    # Not entered as a context manager: the lifespan would open real
+    # connections, so the mocked clients are installed directly
+    asgi_app.state.resources = resources
+    return TestClient(asgi_app)
+
+
+def test_search_images_with_stub_provider(client):
+    response = client.get('/api/images/search', params={'q': 'cat'})
+    assert response.status_code == 200
+    assert response.headers['X-Image-Providers'] == 'stub=ok'
+    assert response.json()[0]['id'] == 'stub-0'
+
+    assert client.get('/api/images/search').status_code == 400
+
+
+def test_upload_from_url(client, resources):
+    response = client.post('/api/assets/upload_from_url', json={'url': 'https://img.test/a.png'})
+    assert response.status_code == 201
+    assert response.json()['s3_key'].startswith('temp/')
+    data, s3_key, content_type = resources.s3.upload_bytes.await_args.args
+    assert data == PNG and s3_key.endswith('.png') and content_type == 'image/png'
+
+    assert client.post('/api/assets/upload_from_url', json={}).status_code == 400
+    response = client.post('/api/assets/upload_from_url', json={'url': 'https://img.test/missing.png'})
+    assert response.status_code == 500
+
+
+def test_upload_from_urls_reports_per_url(client, resources):
+    resources.s3.upload_bytes.side_effect = [S3UploadError("Failed to upload file to S3."), 'temp/b.png']
+    urls = ['https://img.test/a.png', 'https://img.test/page.html', 'https://img.test/b.png']
+    response = client.post('/api/assets/upload_from_urls', json={'urls': urls})
+    body = response.json()
+    assert response.status_code == 200
+    assert (body['uploaded'], body['failed']) == (1, 2)
+    assert [result['url'] for result in body['results']] == urls
+    assert 'error' in body['results'][1]
+
+    assert client.post('/api/assets/upload_from_urls', json={'urls': []}).status_code == 400
+
+
+def test_asset_view_url(client, resources):
+    resources.s3.create_presigned_url_for_download.return_value = 'https://s3.test/temp/a.png?sig'
+    response = client.get('/api/assets/view-url', params={'key': 'temp/a.png'})
+    assert response.status_code == 200
+    assert response.json() == {'url': 'https://s3.test/temp/a.png?sig'}
+
+    assert client.get('/api/assets/view-url').status_code == 400
+    assert client.get('/api/assets/view-url', params={'key': 'a.pptx'}).status_code == 403
+    resources.s3.create_presigned_url_for_download.side_effect = S3Error("Could not generate download URL.")
+    assert client.get('/api/assets/view-url', params={'key': 'temp/a.png'}).status_code == 500
+
+
+def test_trashed_templates(client, resources):
+    resources.db.fetch.return_value = [{'id': 1, 'name': 'Sales', 'created_at': None, 'deleted_at': None}]
+    response = client.get('/api/templates/trash')
+    assert response.status_code == 200
+    assert response.json()[0]['name'] == 'Sales'
+
+    resources.db.fetch.side_effect = asyncpg.PostgresError('down')
+    assert client.get('/api/templates/trash').status_code == 500
+
+
+def test_delete_template(client, resources):
+    resources.db.fetchrow.return_value = {'s3_key': 'a.pptx'}
+    resources.s3.move_file_to_trash.return_value = 'trash/a.pptx'
+    response = client.delete('/api/templates/5')
+    assert response.status_code == 200
+    resources.s3.move_file_to_trash.assert_awaited_once_with('a.pptx')
+    assert resources.db.execute.await_args.args[1:] == ('trash/a.pptx', 5)
+
+    resources.db.fetchrow.return_value = None
+    assert client.delete('/api/templates/5').status_code == 404
+
+
+def test_restore_template(client, resources):
+    resources.db.fetchrow.return_value = {'id': 5, 's3_key': 'trash/a.pptx'}
+    resources.s3.file_exists.return_value = True
+    resources.s3.restore_file_from_trash.return_value = 'a.pptx'
+    assert client.post('/api/templates/5/restore').status_code == 200
+    assert resources.db.execute.await_args.args[1:] == ('a.pptx', 5)
+
+    # The file was purged, so the orphaned row is removed
+    resources.s3.file_exists.return_value = False
+    assert client.post('/api/templates/5/restore').status_code == 410
+    assert resources.db.execute.await_args.args[0].startswith('DELETE')
+
+
+def test_other_paths_fall_through_to_flask(client, resources):
+    # Not a native route: answered by the Flask app's own validation
+    response = client.post('/api/generate', json={})
+    assert response.status_code == 400
+    assert response.json() == {"error": "Missing templateId or data in request body"}
+    resources.db.fetchrow.assert_not_awaited()
@@ -0,0 +1,58 @@
+import pytest
+
+from app import create_app
+from app.services import image_search_service
+from app.services.image_search_service import StubProvider, ImageSearchError
+from config import Config
+
+
+class StubSearchConfig(Config):
+    IMAGE_SEARCH_PROVIDERS = ['stub']
+    IMAGE_SEARCH_TIMEOUT_SECONDS = 0.5
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Providers are cached per process; build them from this app's config
+    monkeypatch.setattr(image_search_service, '_providers', None)
+    return create_app(StubSearchConfig).test_client()
+
+
+def test_stub_provider_needs_no_network():
+    results, statuses = image_search_service.search_images([StubProvider()], 'cat', 3, timeout=1)
+    assert [result['id'] for result in results] == ['stub-0', 'stub-1', 'stub-2']
+    assert statuses == {'stub': 'ok'}
+
+
+def test_results_are_interleaved_and_deduplicated():
+    first = StubProvider('first', results=[{'id': 'a', 'url': 'https://x.test/1.jpg'},
+                                           {'id': 'b', 'url': 'https://x.test/2.jpg'}])
+    second = StubProvider('second', results=[{'id': 'c', 'url': 'https://x.test/1.jpg?w=200'},
+                                             {'id': 'd', 'url': 'https://x.test/3.jpg'}])
+    results, _ = image_search_service.search_images([first, second], 'cat', 10, timeout=1)
+    assert [result['id'] for result in results] == ['a', 'b', 'd']
+
+
+def test_slow_and_failing_providers_are_dropped():
+    providers = [StubProvider('fast'), StubProvider('slow', delay=1), StubProvider('broken', error=RuntimeError('down'))]
+    results, statuses = image_search_service.search_images(providers, 'cat', 2, timeout=0.2)
+    assert len(results) == 2
+    assert statuses == {'fast': 'ok', 'slow': 'timeout', 'broken': 'error'}
+
+    with pytest.raises(ImageSearchError):
+        image_search_service.search_images([StubProvider(error=RuntimeError('down'))], 'cat', 2, timeout=0.2)
+
+
+def test_search_endpoint_with_stub_provider(client):
+    response = client.get('/api/images/search?q=cat')
+    assert response.status_code == 200
+    assert response.headers['X-Image-Providers'] == 'stub=ok'
+    assert len(response.get_json()) == StubSearchConfig.IMAGE_SEARCH_RESULTS
+
+    assert client.get('/api/images/search').status_code == 400
+
+
+def test_search_endpoint_when_every_provider_fails(client, monkeypatch):
+    monkeypatch.setattr(image_search_service, '_providers', [StubProvider(error=RuntimeError('down'))])
+    response = client.get('/api/images/search?q=cat')
+    assert response.status_code == 503
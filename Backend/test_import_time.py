@@ -0,0 +1,75 @@
+import os
+import re
+import sys
+import subprocess
+
+# Heavy dependencies that must stay lazily imported (see app/lazy_imports.py).
+# Importing and creating the app should never pull any of these in.
+LAZY_MODULES = ('boto3', 'botocore', 'pptx', 'psycopg2', 'requests', 'lxml', 'PIL', 'numpy', 'httpx')
+
+# Budget in milliseconds for everything `create_app()` imports, measured at
+# about 250 ms. The best of BUDGET_RUNS runs is compared, since noise only
+# ever adds time. Override with IMPORT_TIME_BUDGET_MS on slow CI machines.
+IMPORT_TIME_BUDGET_MS = float(os.environ.get('IMPORT_TIME_BUDGET_MS', 300))
+BUDGET_RUNS = 3
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def run_importtime():
+    """
+    Imports and creates the app in a fresh interpreter under `-X importtime`.
+
+    Returns:
+        A ({module_name: cumulative_microseconds}, boot_microseconds) tuple.
+        boot_microseconds sums every top-level import made after the
+        interpreter's own startup (which ends with 'site'), so modules that
+        create_app() imports outside the 'app' package count too.
+    """
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'from app import create_app; create_app()'],
+        cwd=backend_dir, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    boot_micros = 0
+    started = False
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        name, micros = match.group(4), int(match.group(2))
+        timings[name] = micros
+        top_level = len(match.group(3)) == 1
+        if top_level and started:
+            boot_micros += micros
+        elif top_level and name == 'site':
+            started = True
+    return timings, boot_micros
+
+
+def best_boot_ms(runs: int = BUDGET_RUNS) -> float:
+    return min(run_importtime()[1] for _ in range(runs)) / 1000.0
+
+
+def test_heavy_modules_are_lazy():
+    timings, _ = run_importtime()
+    eager = sorted(name for name in timings if name.split('.')[0] in LAZY_MODULES)
+    assert not eager, f"Heavy modules imported at startup: {', '.join(eager)}"
+
+
+def test_app_import_within_budget():
+    boot_ms = best_boot_ms()
+    assert boot_ms <= IMPORT_TIME_BUDGET_MS, (
+        f"create_app() imports took {boot_ms:.0f} ms, over the {IMPORT_TIME_BUDGET_MS:.0f} ms budget"
+    )
+
+
+if __name__ == '__main__':
+    timings, boot_micros = run_importtime()
+    print(f"create_app() import time: {boot_micros / 1000.0:.1f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    for name, micros in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:15]:
+        print(f"  {micros / 1000.0:8.1f} ms  {name}")
+    test_heavy_modules_are_lazy()
+    test_app_import_within_budget()
+    print("✅ [SUCCESS] Import-time budget respected.")
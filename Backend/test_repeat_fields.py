@@ -0,0 +1,28 @@
+from app.api.routes import find_missing_placeholder
+from app.services.pptx_service import repeat_row_fields
+
+REPEAT_TEMPLATE = [
+    {'name': 'clients', 'type': 'repeat'},
+    {'name': 'item', 'type': 'text'},
+    {'name': 'company', 'type': 'text'},
+]
+
+
+def test_scalar_rows_supply_item():
+    assert repeat_row_fields({'clients': ['a', 'b']}, ['clients']) == {'item'}
+    data = {'clients': ['a', 'b'], 'company': 'Acme'}
+    assert find_missing_placeholder(REPEAT_TEMPLATE, data) is None
+
+
+def test_dict_rows_supply_their_keys():
+    assert repeat_row_fields({'clients': [{'company': 'Acme'}]}, ['clients']) == {'company'}
+    data = {'clients': [{'company': 'Acme'}, {'company': 'Initech'}], 'item': 'x'}
+    assert find_missing_placeholder(REPEAT_TEMPLATE, data) is None
+    # 'item' only comes from rows that are not dicts
+    data = {'clients': [{'company': 'Acme'}]}
+    assert find_missing_placeholder(REPEAT_TEMPLATE, data) == 'item'
+
+
+def test_lists_that_are_not_repeat_lists_are_ignored():
+    data = {'clients': [], 'rows': ['a'], 'company': 'Acme'}
+    assert find_missing_placeholder(REPEAT_TEMPLATE, data) == 'item'